@@ -4,10 +4,11 @@ import firebase_admin
 from firebase_admin import credentials, db, storage
 import os
 import threading
+from collections import OrderedDict
 import time as _time
 from werkzeug.utils import secure_filename
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import sys
 import re
 import secrets
@@ -81,7 +82,11 @@ if not os.path.exists(firebase_json):
     sys.exit(1)
 
 cred = credentials.Certificate(firebase_json)
-firebase_admin.initialize_app(cred, get_firebase_options())
+try:
+    # Maintenance scripts import this module after initializing Firebase themselves.
+    firebase_admin.get_app()
+except ValueError:
+    firebase_admin.initialize_app(cred, get_firebase_options())
 bucket = storage.bucket()
 
 # ---------------- REFERENCES ---------------- #
@@ -317,82 +322,440 @@ def get_school_options():
     return deduped
 
 
-def resolve_user_from_any(identity):
-    """Resolve a user from userId, username, adminId, or registererId."""
-    if not identity:
+# ---- login index: Platform1/loginIndex/<USERNAME> -> {schoolCode, userId} ----
+LOGIN_INDEX_NODE = "loginIndex"
+_LOGIN_INDEX_CACHE: dict = {}
+_LOGIN_INDEX_LOCK = threading.Lock()
+_LOGIN_INDEX_TTL = 10 * 60  # seconds
+
+
+def _login_index_key(username):
+    # RTDB keys cannot contain . # $ [ ] /
+    return re.sub(r"[.#$\[\]/]", "_", _norm_text(username).upper())
+
+
+def _login_index_get(username):
+    key = _login_index_key(username)
+    if not key:
         return None
 
-    users = get_users_snapshot()
+    with _LOGIN_INDEX_LOCK:
+        entry = _LOGIN_INDEX_CACHE.get(key)
+        if entry and (_time.monotonic() - entry["ts"]) < _LOGIN_INDEX_TTL:
+            return entry["data"]
+
+    try:
+        stored = platform_ref(f"{LOGIN_INDEX_NODE}/{key}").get()
+    except Exception:
+        stored = None
+
+    # Entries written before userKey was stored are ignored and rewritten on the next lookup.
+    if not isinstance(stored, dict) or not stored.get("schoolCode") or not stored.get("userKey"):
+        return None
 
-    # Direct userId key lookup
-    direct_user = users.get(str(identity))
-    if direct_user:
-        return direct_user
+    data = {"schoolCode": str(stored.get("schoolCode")), "userKey": str(stored.get("userKey"))}
+    with _LOGIN_INDEX_LOCK:
+        _LOGIN_INDEX_CACHE[key] = {"data": data, "ts": _time.monotonic()}
+    return data
 
-    # Match by userId or username
-    for user in users.values():
-        if str(user.get("userId")) == str(identity) or str(user.get("username")) == str(identity):
-            return user
 
-    # Primary mapping: Schools/<schoolCode>/School_Admins/<adminId> -> userId
-    schools_node = all_schools_snapshot()
-    for school in schools_node.values():
-        if not isinstance(school, dict):
-            continue
-        school_admins = school.get("School_Admins") or {}
-        admin = school_admins.get(str(identity)) if isinstance(school_admins, dict) else None
-        if admin and admin.get("userId"):
-            mapped = users.get(admin.get("userId"))
-            if mapped:
-                return mapped
+def _login_index_put(username, school_code, user_key):
+    """Point loginIndex/<USERNAME> at Users/<user_key> (the node key, not the userId field)."""
+    key = _login_index_key(username)
+    code = _norm_text(school_code)
+    uid = _norm_text(user_key)
+    if not key or not code or not uid:
+        return
 
-        if isinstance(school_admins, dict):
-            for admin_item in school_admins.values():
-                if str(admin_item.get("adminId")) == str(identity) and admin_item.get("userId"):
-                    mapped = users.get(admin_item.get("userId"))
-                    if mapped:
-                        return mapped
-
-    # New structure mapping: Registerers/<registererId>
-    registerers = get_registerers_snapshot()
-    reg = registerers.get(str(identity))
-    if reg and reg.get("userId"):
-        mapped = users.get(reg.get("userId"))
-        if mapped:
-            return mapped
-
-    for reg_item in registerers.values():
-        if str(reg_item.get("registererId")) == str(identity) and reg_item.get("userId"):
-            mapped = users.get(reg_item.get("userId"))
-            if mapped:
-                return mapped
+    data = {"schoolCode": code, "userKey": uid}
+    with _LOGIN_INDEX_LOCK:
+        _LOGIN_INDEX_CACHE[key] = {"data": data, "ts": _time.monotonic()}
+    try:
+        platform_ref(f"{LOGIN_INDEX_NODE}/{key}").set(data)
+    except Exception:
+        pass  # Index is a hint; login falls back to indexed Users queries.
 
-    return None
+
+def _login_index_drop(username):
+    key = _login_index_key(username)
+    if not key:
+        return
+    with _LOGIN_INDEX_LOCK:
+        _LOGIN_INDEX_CACHE.pop(key, None)
+    try:
+        platform_ref(f"{LOGIN_INDEX_NODE}/{key}").delete()
+    except Exception:
+        pass
+
+
+def _login_index_forget_user(school_code, user_key):
+    """Drop in-process entries for a user whose Users record was rewritten."""
+    code = _norm_text(school_code)
+    uid = _norm_text(user_key)
+    with _LOGIN_INDEX_LOCK:
+        for key, entry in list(_LOGIN_INDEX_CACHE.items()):
+            data = entry.get("data") or {}
+            if data.get("schoolCode") == code and data.get("userKey") == uid:
+                _LOGIN_INDEX_CACHE.pop(key, None)
+
+
+def _note_user_write(school_code, user_id, user_data):
+    """Keep the login index and identity graph in step with a Users/<userId> write."""
+    _login_index_forget_user(school_code, user_id)
+    invalidate_identity_cache(school_code=school_code)
+    if isinstance(user_data, dict) and user_data.get("username"):
+        _login_index_put(user_data.get("username"), school_code, user_id)
+
+
+def _note_users_path_write(school_code, path, value):
+    """Route a generic school-node write under Users/ to the login index."""
+    parts = [part for part in str(path or "").strip("/").split("/") if part]
+    if not parts or parts[0] != "Users":
+        return
+    if len(parts) == 1:
+        for user_id, user_data in (value.items() if isinstance(value, dict) else []):
+            _note_user_write(school_code, user_id, user_data)
+        return
+    user_id = parts[1]
+    if len(parts) == 2:
+        _note_user_write(school_code, user_id, value)
+    elif parts[2] == "username":
+        _note_user_write(school_code, user_id, {"username": value})
+    else:
+        _login_index_forget_user(school_code, user_id)
+        invalidate_identity_cache(school_code=school_code, user_id=user_id)
+
+
+def _school_codes_from_username_hint(username):
+    """Map the username prefix (e.g. GMIA_0001_26 -> GMI) through schoolCodeIndex."""
+    first_token = _norm_text(username).upper().split("_", 1)[0]
+    letters_only = "".join(ch for ch in first_token if ch.isalpha())
+    if not letters_only:
+        return []
+
+    # Admin ids append an "A" role letter to the short name; try both forms.
+    candidates = [letters_only]
+    if len(letters_only) > 1 and letters_only[-1] in ("A", "R", "T"):
+        candidates.insert(0, letters_only[:-1])
+
+    codes = []
+    for short_name in candidates:
+        try:
+            mapped = platform_ref(f"schoolCodeIndex/{short_name}").get()
+        except Exception:
+            mapped = None
+        code = _norm_text(mapped) if isinstance(mapped, str) else ""
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
+
+def _list_school_codes():
+    try:
+        school_keys = platform_ref("Schools").get(shallow=True) or {}
+    except Exception:
+        school_keys = {}
+    if not isinstance(school_keys, dict):
+        return []
+    return [str(code) for code in school_keys.keys() if str(code).strip()]
+
+
+def _read_school_user(school_code, user_id):
+    try:
+        user = school_node_ref(school_code, f"Users/{user_id}").get()
+    except Exception:
+        user = None
+    if not isinstance(user, dict):
+        return None
+    normalized = _normalize_users_node({str(user_id): user}).get(str(user_id)) or {}
+    normalized.setdefault("schoolCode", _norm_text(school_code))
+    return normalized
+
+
+def _query_school_user_by_username(school_code, username):
+    """Indexed Users lookup inside one school; returns (Users key, user) or ("", None).
+
+    An exact match wins over case-insensitive. When the query is rejected (no
+    ".indexOn": "username" rule for this school yet) the school's Users node is
+    scanned once instead.
+    """
+    target = _norm_text(username)
+    target_upper = target.upper()
+    users_ref = school_node_ref(school_code, "Users")
+
+    for candidate in dict.fromkeys([target, target_upper, target.lower()]):
+        scanned = False
+        try:
+            matches = users_ref.order_by_child("username").equal_to(candidate).limit_to_first(5).get() or {}
+        except Exception:
+            try:
+                matches = users_ref.get() or {}
+            except Exception:
+                matches = {}
+            scanned = True
+        normalized = _normalize_users_node(matches)
+        for user_key, user in normalized.items():
+            if _norm_text(user.get("username")).upper() == target_upper:
+                user.setdefault("schoolCode", _norm_text(school_code))
+                return user_key, user
+        if scanned:
+            break
+    return "", None
+
+
+def _password_matches(user, password):
+    return _norm_text((user or {}).get("password")) == _norm_text(password)
 
 
 def find_user_for_login(username, password):
-    """Find user by username/password with one pass over users."""
+    """Find user by username/password through the login index.
+
+    Order: loginIndex entry -> schoolCodeIndex prefix hint -> per-school
+    Users.order_by_child('username') queries (a Users scan where the index
+    rule is missing). The first two paths cost a fixed number of small reads
+    regardless of how many schools exist; scripts/backfill_login_index.py
+    seeds loginIndex for existing users.
+    """
     target_username = _norm_text(username)
     target_password = _norm_text(password)
     if not target_username or not target_password:
         return None
 
     target_upper = target_username.upper()
-    case_insensitive_match = None
 
-    users = get_users_snapshot()
-    for user in users.values():
-        if _norm_text(user.get("password")) != target_password:
+    indexed = _login_index_get(target_username)
+    if indexed:
+        user = _read_school_user(indexed["schoolCode"], indexed["userKey"])
+        if user and _norm_text(user.get("username")).upper() == target_upper:
+            return user if _password_matches(user, target_password) else None
+        # Stale entry (user deleted or renamed); rebuild it below.
+        _login_index_drop(target_username)
+
+    hinted_codes = _school_codes_from_username_hint(target_username)
+    for school_code in hinted_codes:
+        user_key, user = _query_school_user_by_username(school_code, target_username)
+        if user:
+            _login_index_put(user.get("username") or target_username, school_code, user_key)
+            return user if _password_matches(user, target_password) else None
+
+    for school_code in _list_school_codes():
+        if school_code in hinted_codes:
+            continue
+        user_key, user = _query_school_user_by_username(school_code, target_username)
+        if user:
+            _login_index_put(user.get("username") or target_username, school_code, user_key)
+            return user if _password_matches(user, target_password) else None
+
+    return None
+
+
+# ---- identity graph: userId / username / adminId / registererId -> school ----
+_IDENTITY_TTL = 10 * 60  # seconds
+_IDENTITY_MISS_TTL = 60  # seconds
+_IDENTITY_MISS_MAX = 512
+_IDENTITY_RESOLVED_MAX = 2048
+_IDENTITY_LOCK = threading.Lock()
+_IDENTITY_SCHOOLS: dict = {}
+_IDENTITY_RESOLVED: "OrderedDict[str, dict]" = OrderedDict()
+_IDENTITY_MISSES: "OrderedDict[str, float]" = OrderedDict()
+
+
+def _identity_links(records, id_field):
+    """Map record keys and id fields -> userId, and userId -> normalized id."""
+    to_user = {}
+    by_user = {}
+    if not isinstance(records, dict):
+        return to_user, by_user
+
+    for record_key, record in records.items():
+        if not isinstance(record, dict):
+            continue
+        user_id = _norm_text(record.get("userId"))
+        if not user_id:
+            continue
+        record_id = _norm_text(record.get(id_field)) or _norm_text(record_key)
+        to_user[_norm_text(record_key)] = user_id
+        to_user[record_id] = user_id
+        by_user.setdefault(user_id, record_id)
+    return to_user, by_user
+
+
+def _identity_school_graph(school_code):
+    """Per-school identity graph from a shallow Users read plus the small admin nodes."""
+    code = _norm_text(school_code)
+    if not code:
+        return None
+
+    with _IDENTITY_LOCK:
+        entry = _IDENTITY_SCHOOLS.get(code)
+        if entry and (_time.monotonic() - entry["ts"]) < _IDENTITY_TTL:
+            return entry["data"]
+
+    try:
+        user_keys = school_node_ref(code, "Users").get(shallow=True) or {}
+    except Exception:
+        user_keys = {}
+    admins_to_user, admin_by_user = _identity_links(get_school_admins_snapshot_for_school(code), "adminId")
+    try:
+        registerers = school_node_ref(code, "Registerers").get() or {}
+    except Exception:
+        registerers = {}
+    registerers_to_user, registerer_by_user = _identity_links(registerers, "registererId")
+
+    data = {
+        "userIds": set(user_keys.keys()) if isinstance(user_keys, dict) else set(),
+        "adminsToUser": admins_to_user,
+        "adminByUser": admin_by_user,
+        "registerersToUser": registerers_to_user,
+        "registererByUser": registerer_by_user,
+    }
+    with _IDENTITY_LOCK:
+        _IDENTITY_SCHOOLS[code] = {"data": data, "ts": _time.monotonic()}
+    return data
+
+
+def invalidate_identity_cache(school_code=None, user_id=None):
+    """Drop cached identity state for one user, one school, or everything."""
+    code = _norm_text(school_code)
+    uid = _norm_text(user_id)
+    with _IDENTITY_LOCK:
+        _IDENTITY_MISSES.clear()
+        if not code and not uid:
+            _IDENTITY_SCHOOLS.clear()
+            _IDENTITY_RESOLVED.clear()
+            return
+        if code and not uid:
+            _IDENTITY_SCHOOLS.pop(code, None)
+        for identity, entry in list(_IDENTITY_RESOLVED.items()):
+            data = entry.get("data") or {}
+            if uid and data.get("userId") != uid:
+                continue
+            if code and not uid and data.get("schoolCode") != code:
+                continue
+            _IDENTITY_RESOLVED.pop(identity, None)
+
+
+def _identity_cached_miss(identity):
+    with _IDENTITY_LOCK:
+        ts = _IDENTITY_MISSES.get(identity)
+        if ts is None:
+            return False
+        if (_time.monotonic() - ts) >= _IDENTITY_MISS_TTL:
+            _IDENTITY_MISSES.pop(identity, None)
+            return False
+        _IDENTITY_MISSES.move_to_end(identity)
+        return True
+
+
+def _identity_remember_miss(identity):
+    with _IDENTITY_LOCK:
+        _IDENTITY_MISSES[identity] = _time.monotonic()
+        _IDENTITY_MISSES.move_to_end(identity)
+        while len(_IDENTITY_MISSES) > _IDENTITY_MISS_MAX:
+            _IDENTITY_MISSES.popitem(last=False)
+
+
+def _identity_admin_id(school_code, user_id):
+    graph = _identity_school_graph(school_code) or {}
+    return (graph.get("adminByUser") or {}).get(user_id) or ""
+
+
+def _identity_registerer_id(school_code, user_id):
+    graph = _identity_school_graph(school_code) or {}
+    return (graph.get("registererByUser") or {}).get(user_id) or ""
+
+
+def _query_school_user_key_by_user_id(school_code, user_id):
+    """Users node key whose userId field is user_id, for rows keyed by something else."""
+    try:
+        matches = school_node_ref(school_code, "Users").order_by_child("userId").equal_to(user_id).limit_to_first(1).get() or {}
+    except Exception:
+        return ""
+    return _norm_text(next(iter(matches), "")) if isinstance(matches, dict) else ""
+
+
+def _school_user_key(school_code, user_id, graph=None):
+    if not user_id or user_id in (graph or _identity_school_graph(school_code) or {}).get("userIds", ()):
+        return user_id
+    return _query_school_user_key_by_user_id(school_code, user_id) or user_id
+
+
+def _locate_identity_in_school(school_code, identity):
+    """Users key for identity inside one school (graph, then username and userId queries), or ""."""
+    graph = _identity_school_graph(school_code) or {}
+    if identity in graph.get("userIds", ()):
+        return identity
+    mapped = (graph.get("adminsToUser") or {}).get(identity) or (graph.get("registerersToUser") or {}).get(identity)
+    if mapped:
+        return _school_user_key(school_code, mapped, graph)
+
+    user_key, user = _query_school_user_by_username(school_code, identity)
+    if user:
+        _login_index_put(user.get("username") or identity, school_code, user_key)
+        return user_key
+
+    # Rows whose Users key differs from their userId field.
+    return _query_school_user_key_by_user_id(school_code, identity)
+
+
+def _locate_identity(identity):
+    """Return (schoolCode, Users key) for any known identifier, or ("", "").
+
+    loginIndex and the schoolCodeIndex prefix hint are tried first; only an
+    identifier neither of them places walks the remaining schools.
+    """
+    indexed = _login_index_get(identity)
+    if indexed:
+        return indexed["schoolCode"], indexed["userKey"]
+
+    hinted_codes = _school_codes_from_username_hint(identity)
+    for school_code in hinted_codes:
+        user_key = _locate_identity_in_school(school_code, identity)
+        if user_key:
+            return school_code, user_key
+
+    for school_code in _list_school_codes():
+        if school_code in hinted_codes:
             continue
+        user_key = _locate_identity_in_school(school_code, identity)
+        if user_key:
+            return school_code, user_key
+
+    return "", ""
+
+
+def _resolve_identity(identity):
+    key = _norm_text(identity)
+    if not key:
+        return None
+
+    with _IDENTITY_LOCK:
+        entry = _IDENTITY_RESOLVED.get(key)
+        if entry and (_time.monotonic() - entry["ts"]) < _IDENTITY_TTL:
+            _IDENTITY_RESOLVED.move_to_end(key)
+            return entry["data"]
+    if _identity_cached_miss(key):
+        return None
+
+    school_code, user_id = _locate_identity(key)
+    user = _read_school_user(school_code, user_id) if school_code and user_id else None
+    if not user:
+        _identity_remember_miss(key)
+        return None
 
-        current_username = _norm_text(user.get("username"))
-        if current_username == target_username:
-            return user
+    data = {"user": user, "userId": _norm_text(user.get("userId")) or user_id, "schoolCode": school_code}
+    with _IDENTITY_LOCK:
+        _IDENTITY_RESOLVED[key] = {"data": data, "ts": _time.monotonic()}
+        _IDENTITY_RESOLVED.move_to_end(key)
+        while len(_IDENTITY_RESOLVED) > _IDENTITY_RESOLVED_MAX:
+            _IDENTITY_RESOLVED.popitem(last=False)
+    return data
 
-        if case_insensitive_match is None and current_username.upper() == target_upper:
-            case_insensitive_match = user
 
-    return case_insensitive_match
+def resolve_user_from_any(identity):
+    """Resolve a user from userId, username, adminId, or registererId."""
+    resolved = _resolve_identity(identity)
+    return dict(resolved["user"]) if resolved else None
 
 
 def resolve_admin_identifiers_from_user(user):
@@ -406,34 +769,23 @@ def resolve_admin_identifiers_from_user(user):
     admin_id = ""
     school_code = str(user.get("schoolCode") or "")
     if school_code:
-        school_admins = get_school_admins_snapshot_for_school(school_code)
-        for a in school_admins.values():
-            if str(a.get("userId")) == user_id:
-                admin_id = str(a.get("adminId") or "")
-                break
+        admin_id = _identity_admin_id(school_code, user_id)
 
     if not admin_id:
-        schools_node = all_schools_snapshot()
-        for code, school in schools_node.items():
-            if not isinstance(school, dict):
+        for code in _list_school_codes():
+            if code == school_code:
                 continue
-            school_admins = school.get("School_Admins") or {}
-            if not isinstance(school_admins, dict):
-                continue
-            for a in school_admins.values():
-                if str(a.get("userId")) == user_id:
-                    admin_id = str(a.get("adminId") or "")
-                    school_code = str(code)
-                    break
+            admin_id = _identity_admin_id(code, user_id)
             if admin_id:
+                school_code = code
                 break
 
     # Backward fallback: Registerers mapping
     if not admin_id:
-        registerers = get_registerers_snapshot()
-        for r in registerers.values():
-            if str(r.get("userId")) == user_id:
-                admin_id = str(r.get("registererId") or "")
+        for code in ([school_code] if school_code else []) + _list_school_codes():
+            admin_id = _identity_registerer_id(code, user_id)
+            if admin_id:
+                school_code = school_code or code
                 break
 
     if not admin_id:
@@ -450,7 +802,11 @@ def resolve_admin_identifiers_from_user(user):
 
 def resolve_admin_identifiers(identity):
     """Return normalized IDs preferring School_Admins mapping."""
-    user = resolve_user_from_any(identity)
+    resolved = _resolve_identity(identity)
+    if not resolved:
+        return None
+    user = dict(resolved["user"])
+    user.setdefault("schoolCode", resolved.get("schoolCode"))
     return resolve_admin_identifiers_from_user(user)
 
 
@@ -541,6 +897,7 @@ def upload_profile_image():
                 matches = users_ref.order_by_child("userId").equal_to(user_id).limit_to_first(1).get()
                 for push_key in (matches or {}).keys():
                     users_ref.child(push_key).update({"profileImage": public_url})
+            invalidate_identity_cache(school_code=school_code, user_id=user_id)
         except Exception:
             pass  # Don't fail the upload if the RTDB patch fails
 
@@ -655,6 +1012,7 @@ def register_admin():
         "isActive": True,
     }
     new_user.set(user_data)
+    _note_user_write(school_code, new_user.key, user_data)
 
     admins_ref.child(admin_id).set({
         "adminId": admin_id,
@@ -667,6 +1025,7 @@ def register_admin():
         "status": "active",
         "createdAt": datetime.utcnow().isoformat(),
     })
+    invalidate_identity_cache(school_code=school_code)
 
     return jsonify({
         "success": True,
@@ -1113,6 +1472,9 @@ def put_school_node_value():
 
     value = body.get("value")
     school_node_ref(resolved_school_code, normalized_path).set(value)
+    _note_users_path_write(resolved_school_code, normalized_path, value)
+    if normalized_path.startswith("School_Admins") or normalized_path.startswith("Registerers"):
+        invalidate_identity_cache(school_code=resolved_school_code)
 
     if normalized_path.startswith("GradeManagement/grades"):
         _pc_invalidate(f"grade_management_grades:{resolved_school_code}")
@@ -1122,6 +1484,8 @@ def put_school_node_value():
         _pc_invalidate(f"student_directory:{resolved_school_code}")
     if normalized_path.startswith("AcademicYears") or normalized_path.startswith("schoolInfo/currentAcademicYear"):
         _pc_invalidate(f"academic_years:{resolved_school_code}")
+        # Lets the Teacher portal's cached academic year notice the change.
+        school_node_ref(resolved_school_code, "schoolInfo/academicYearVersion").set(int(_time.time() * 1000))
 
     return jsonify({"success": True})
 
@@ -1547,6 +1911,95 @@ def like_post():
 
 # ---------------- CHAT ENDPOINTS ---------------- #
 
+CHAT_SUMMARY_NODE = "Chat_Summaries"
+CHAT_PAGE_DEFAULT = 50
+CHAT_PAGE_MAX = 200
+# Newest messages checked for receipts when the "seen" query is rejected (no index rule).
+CHAT_MARK_READ_SCAN_MAX = 500
+# (schoolCode, participants) pairs with no flat pre-migration messages left.
+_CHAT_LEGACY_EMPTY = set()
+
+
+def chat_conversation_id(user_a, user_b):
+    """Conversation key shared with the frontends: sorted participant ids joined by "_"."""
+    return "_".join(sorted([_norm_text(user_a), _norm_text(user_b)]))
+
+
+def _resolve_chat_conversation_id(school_code, user_a, user_b):
+    """Prefer an existing Chats/<a_b> or Chats/<b_a> node, else the sorted key."""
+    left, right = _norm_text(user_a), _norm_text(user_b)
+    sorted_key = chat_conversation_id(left, right)
+    for candidate in dict.fromkeys([sorted_key, f"{left}_{right}", f"{right}_{left}"]):
+        try:
+            if school_node_ref(school_code, f"Chats/{candidate}/messages").order_by_key().limit_to_last(1).get():
+                return candidate
+        except Exception:
+            continue
+    return sorted_key
+
+
+def _chat_time_ms(value):
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = _norm_text(value)
+    if not text:
+        return 0
+    if text.isdigit():
+        return int(text)
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return 0
+    # Older admin builds stored naive utcnow() strings; never read them as host-local time.
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def _chat_message_payload(message_id, msg):
+    """Response shape: legacy admin fields plus the shared Chats/<id>/messages fields."""
+    msg = msg if isinstance(msg, dict) else {}
+    time_ms = _chat_time_ms(msg.get("timeStamp") or msg.get("time"))
+    seen = bool(msg.get("seen") if "seen" in msg else msg.get("read"))
+    text = msg.get("text") if msg.get("text") is not None else msg.get("message")
+    return {
+        "messageId": str(msg.get("messageId") or message_id),
+        "senderId": msg.get("senderId"),
+        "receiverId": msg.get("receiverId"),
+        "message": text,
+        "text": text,
+        "type": msg.get("type") or "text",
+        "time": msg.get("time") or (datetime.utcfromtimestamp(time_ms / 1000).isoformat() if time_ms else ""),
+        "timeStamp": time_ms,
+        "read": seen,
+        "seen": seen,
+    }
+
+
+def _legacy_flat_chat_messages(school_code, user_a, user_b):
+    """Messages still stored flat under Chats/<pushId> (pre-migration), via indexed senderId queries."""
+    participants = {_norm_text(user_a), _norm_text(user_b)}
+    legacy_key = (_norm_text(school_code), tuple(sorted(participants)))
+    if legacy_key in _CHAT_LEGACY_EMPTY:
+        return {}
+
+    chats_ref = school_node_ref(school_code, "Chats")
+    found = {}
+    for sender_id in participants:
+        try:
+            matches = chats_ref.order_by_child("senderId").equal_to(sender_id).get() or {}
+        except Exception:
+            matches = {}
+        for key, msg in (matches.items() if isinstance(matches, dict) else []):
+            if isinstance(msg, dict) and _norm_text(msg.get("receiverId")) in participants:
+                found[key] = msg
+
+    # New messages never land flat, so an empty result stays empty until restart.
+    if not found:
+        _CHAT_LEGACY_EMPTY.add(legacy_key)
+    return found
+
+
 # Send a message
 @app.route("/api/send_message", methods=["POST"])
 def send_message():
@@ -1563,32 +2016,88 @@ def send_message():
         if not sender_resolved or not sender_resolved.get("schoolCode"):
             return jsonify({"success": False, "message": "Sender school not found"}), 400
 
-        msg_ref = school_node_ref(sender_resolved.get("schoolCode"), "Chats").push()
-        msg_ref.set({
-            "messageId": msg_ref.key,
-            "senderId": senderId,
-            "receiverId": receiverId,
-            "message": message,
-            "time": datetime.now().isoformat(),
-            "read": False
-        })
-        _pc_invalidate(f"unread_messages:{sender_resolved.get('schoolCode')}:{receiverId}")
-        return jsonify({"success": True, "message": "Message sent"})
+        school_code = sender_resolved.get("schoolCode")
+        sender_id = _norm_text(senderId)
+        receiver_id = _norm_text(receiverId)
+        conversation_id = _resolve_chat_conversation_id(school_code, sender_id, receiver_id)
+        message_id = school_node_ref(school_code, f"Chats/{conversation_id}/messages").push().key
+        now = datetime.now(timezone.utc)
+        time_ms = int(now.timestamp() * 1000)
+        now_text = now.isoformat().replace("+00:00", "Z")
+
+        last_message = {
+            "messageId": message_id,
+            "senderId": sender_id,
+            "receiverId": receiver_id,
+            "text": message,
+            "type": "text",
+            "timeStamp": time_ms,
+            "seen": False,
+        }
+        summary_fields = {
+            "chatId": conversation_id,
+            "lastMessageText": message,
+            "lastMessageType": "text",
+            "lastMessageTime": time_ms,
+            "lastSenderId": sender_id,
+            "updatedAt": now_text,
+        }
+        updates = {
+            f"Chats/{conversation_id}/messages/{message_id}": {**last_message, "message": message, "time": now_text, "read": False},
+            f"Chats/{conversation_id}/participants/{sender_id}": True,
+            f"Chats/{conversation_id}/participants/{receiver_id}": True,
+            f"Chats/{conversation_id}/lastMessage": last_message,
+            f"Chats/{conversation_id}/unread/{sender_id}": 0,
+            f"{CHAT_SUMMARY_NODE}/{sender_id}/{conversation_id}/otherUserId": receiver_id,
+            f"{CHAT_SUMMARY_NODE}/{sender_id}/{conversation_id}/unreadCount": 0,
+            f"{CHAT_SUMMARY_NODE}/{receiver_id}/{conversation_id}/otherUserId": sender_id,
+        }
+        for field_name, field_value in summary_fields.items():
+            updates[f"{CHAT_SUMMARY_NODE}/{sender_id}/{conversation_id}/{field_name}"] = field_value
+            updates[f"{CHAT_SUMMARY_NODE}/{receiver_id}/{conversation_id}/{field_name}"] = field_value
+        platform_ref(f"Schools/{school_code}").update(updates)
+
+        # Counter increments cannot ride in a multi-path update without racing.
+        unread_count = school_node_ref(
+            school_code, f"{CHAT_SUMMARY_NODE}/{receiver_id}/{conversation_id}/unreadCount"
+        ).transaction(lambda current: int(current or 0) + 1)
+        school_node_ref(school_code, f"Chats/{conversation_id}/unread/{receiver_id}").set(int(unread_count or 0))
+
+        _pc_invalidate(f"unread_messages:{school_code}:{receiverId}")
+        return jsonify({"success": True, "message": "Message sent", "messageId": message_id, "chatId": conversation_id})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)})
 
 # Get chat between two users
 @app.route("/api/chat/<adminId>/<userId>", methods=["GET"])
 def get_chat(adminId, userId):
+    """Newest page of a conversation, oldest first. Pass the first returned
+    messageId as ?before= to load the previous page."""
     resolved = resolve_admin_identifiers(adminId)
     if not resolved or not resolved.get("schoolCode"):
         return jsonify([])
 
-    all_msgs = school_node_ref(resolved.get("schoolCode"), "Chats").get() or {}
-    chat = [msg for key, msg in all_msgs.items()
-            if (msg.get("senderId") in [adminId, userId]) and
-               (msg.get("receiverId") in [adminId, userId])]
-    chat_sorted = sorted(chat, key=lambda x: x['time'])
+    school_code = resolved.get("schoolCode")
+    limit = parse_positive_int(request.args.get("limit"), CHAT_PAGE_DEFAULT, 1, CHAT_PAGE_MAX)
+    before = _norm_text(request.args.get("before"))
+    conversation_id = _resolve_chat_conversation_id(school_code, adminId, userId)
+
+    query = school_node_ref(school_code, f"Chats/{conversation_id}/messages").order_by_key()
+    if before:
+        query = query.end_at(before)
+    page = query.limit_to_last(limit + 1 if before else limit).get() or {}
+    if not isinstance(page, dict):
+        page = {}
+    page.pop(before, None)
+
+    # Until scripts/migrate_flat_chats.py has run, flat messages older than the
+    # cursor (push keys sort by time) are merged into each page.
+    for key, msg in _legacy_flat_chat_messages(school_code, adminId, userId).items():
+        if not before or key < before:
+            page.setdefault(key, msg)
+
+    chat = [_chat_message_payload(key, msg) for key, msg in page.items() if isinstance(msg, dict)]
+    chat_sorted = sorted(chat, key=lambda x: (x["timeStamp"], x["messageId"]))[-limit:]
     return jsonify(chat_sorted)
 
 # Mark messages as read
@@ -1601,15 +2110,51 @@ def mark_messages_read():
     if not resolved or not resolved.get("schoolCode"):
         return jsonify({"success": False, "message": "Unknown admin school"}), 400
 
-    chats_ref = school_node_ref(resolved.get("schoolCode"), "Chats")
-    all_msgs = chats_ref.get() or {}
+    school_code = resolved.get("schoolCode")
+    reader_id = _norm_text(adminId)
+    sender_id = _norm_text(senderId)
+    conversation_id = _resolve_chat_conversation_id(school_code, reader_id, sender_id)
 
-    for key, msg in all_msgs.items():
-        if msg.get("receiverId") == adminId and msg.get("senderId") == senderId:
-            chats_ref.child(key).update({"read": True})
+    messages_ref = school_node_ref(school_code, f"Chats/{conversation_id}/messages")
+    try:
+        # end_at(False) also returns messages with no "seen" field (nulls sort first),
+        # i.e. migrated rows that only carry "read".
+        unseen = messages_ref.order_by_child("seen").end_at(False).get() or {}
+    except Exception:
+        try:
+            unseen = messages_ref.order_by_key().limit_to_last(CHAT_MARK_READ_SCAN_MAX).get() or {}
+        except Exception as exc:
+            # Receipts could not be read; leave the counters alone so they keep matching them.
+            return jsonify({"success": False, "message": str(exc)}), 500
+    unseen = {
+        key: msg
+        for key, msg in (unseen.items() if isinstance(unseen, dict) else [])
+        if isinstance(msg, dict) and not (msg.get("seen") if "seen" in msg else msg.get("read"))
+    }
 
-    _pc_invalidate(f"unread_messages:{resolved.get('schoolCode')}:{adminId}")
-    return jsonify({"success": True})
+    updates = {
+        f"Chats/{conversation_id}/unread/{reader_id}": 0,
+        f"{CHAT_SUMMARY_NODE}/{reader_id}/{conversation_id}/unreadCount": 0,
+        f"{CHAT_SUMMARY_NODE}/{sender_id}/{conversation_id}/lastMessageSeen": True,
+    }
+    marked = 0
+    for key, msg in unseen.items():
+        if _norm_text(msg.get("receiverId")) == reader_id:
+            updates[f"Chats/{conversation_id}/messages/{key}/seen"] = True
+            updates[f"Chats/{conversation_id}/messages/{key}/read"] = True
+            marked += 1
+
+    if not unseen:
+        for key, msg in _legacy_flat_chat_messages(school_code, reader_id, sender_id).items():
+            if _norm_text(msg.get("receiverId")) == reader_id and not msg.get("read"):
+                updates[f"Chats/{key}/read"] = True
+                marked += 1
+
+    # One multi-path write: message receipts and both unread counters together.
+    platform_ref(f"Schools/{school_code}").update(updates)
+
+    _pc_invalidate(f"unread_messages:{school_code}:{adminId}")
+    return jsonify({"success": True, "marked": marked})
 
 # Get unread messages for admin
 @app.route("/api/unread_messages/<adminId>", methods=["GET"])
@@ -0,0 +1,96 @@
+"""Populate Platform1/loginIndex from every school's Users node.
+
+find_user_for_login reads loginIndex/<USERNAME> = {schoolCode, userKey} first
+and only then queries Users by username. Those queries need an index rule in
+the database rules, otherwise RTDB rejects them and login falls back to
+scanning each school's Users node:
+
+    "Platform1": {"Schools": {"$schoolCode": {"Users": {".indexOn": ["username", "userId"]}}}}
+
+Run this once after deploying the loginIndex change (and whenever users were
+imported without going through the admin app):
+
+    python scripts/backfill_login_index.py --dry-run
+    python scripts/backfill_login_index.py --school-code ET-ORO-ADA-GMI
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+
+
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+WORKSPACE_ROOT = PROJECT_ROOT.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+
+UPDATE_CHUNK_SIZE = 400
+
+
+def load_admin_app():
+    """Import school_admin_app, which initializes Firebase, for its loginIndex key rules."""
+    import school_admin_app
+
+    return school_admin_app
+
+
+def build_school_entries(admin_app, school_code, users):
+    """Return {loginIndex key: entry} for one school's Users node."""
+    entries = {}
+    for user_key, user in (users.items() if isinstance(users, dict) else []):
+        if not isinstance(user, dict):
+            continue
+        index_key = admin_app._login_index_key(user.get("username"))
+        if index_key:
+            entries.setdefault(index_key, {"schoolCode": school_code, "userKey": str(user_key)})
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill Platform1/loginIndex from Users.")
+    parser.add_argument("--school-code", help="Backfill one school instead of every school.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be written without writing.")
+    parser.add_argument("--chunk-size", type=int, default=UPDATE_CHUNK_SIZE, help="Entries per multi-path update.")
+    args = parser.parse_args()
+
+    admin_app = load_admin_app()
+    school_codes = [args.school_code] if args.school_code else sorted(admin_app._list_school_codes())
+    if not school_codes:
+        print("No schools found under Platform1/Schools.")
+        return
+
+    chunk_size = max(1, args.chunk_size)
+    owners = {}
+    total = collisions = 0
+    for school_code in school_codes:
+        users = admin_app.school_node_ref(school_code, "Users").get() or {}
+        entries = {}
+        for index_key, entry in build_school_entries(admin_app, school_code, users).items():
+            if index_key in owners:
+                # Usernames are unique per school only; the first school keeps the entry.
+                collisions += 1
+                print(f"  {index_key}: already indexed for {owners[index_key]}, skipped in {school_code}")
+                continue
+            owners[index_key] = school_code
+            entries[index_key] = entry
+
+        if not args.dry_run:
+            items = list(entries.items())
+            for start in range(0, len(items), chunk_size):
+                admin_app.platform_ref(admin_app.LOGIN_INDEX_NODE).update(dict(items[start:start + chunk_size]))
+
+        total += len(entries)
+        action = "Would index" if args.dry_run else "Indexed"
+        print(f"{school_code}: {action} {len(entries)} usernames")
+
+    print(f"Done: {total} usernames across {len(school_codes)} schools ({collisions} cross-school collisions skipped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Benchmark admin login lookup against a synthetic multi-school RTDB tree.
+
+Compares the legacy full-platform scan (get_users_snapshot) with the
+loginIndex / schoolCodeIndex / indexed Users query path used by
+find_user_for_login. Firebase is replaced by an in-memory tree that counts
+reads and payload bytes, so the script runs offline:
+
+    python scripts/benchmark_login_lookup.py --schools 50 --users 400
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import sys
+import time
+import types
+from pathlib import Path
+from unittest import mock
+
+
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+class MemoryRTDB:
+    def __init__(self, tree):
+        self.tree = tree
+        self.reads = 0
+        self.bytes = 0
+        self._push_seq = 0
+
+    def reset_counters(self):
+        self.reads = 0
+        self.bytes = 0
+
+    def reference(self, path="", **_kwargs):
+        return MemoryRef(self, path)
+
+
+class MemoryRef:
+    def __init__(self, store, path, query=None):
+        self._store = store
+        self._parts = [part for part in str(path or "").strip("/").split("/") if part]
+        self._query = dict(query or {})
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    def _with(self, **changes):
+        return MemoryRef(self._store, "/".join(self._parts), {**self._query, **changes})
+
+    def _node(self):
+        node = self._store.tree
+        for part in self._parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _parent(self, create=True):
+        node = self._store.tree
+        for part in self._parts[:-1]:
+            if part not in node or not isinstance(node[part], dict):
+                if not create:
+                    return None
+                node[part] = {}
+            node = node[part]
+        return node
+
+    def child(self, path):
+        return MemoryRef(self._store, "/".join(self._parts + [str(path).strip("/")]))
+
+    def order_by_child(self, field):
+        return self._with(order_by=("child", field))
+
+    def order_by_key(self):
+        return self._with(order_by=("key", None))
+
+    def equal_to(self, value):
+        return self._with(equal_to=value)
+
+    def limit_to_first(self, limit):
+        return self._with(limit_first=limit)
+
+    def limit_to_last(self, limit):
+        return self._with(limit_last=limit)
+
+    def _apply_query(self, value):
+        if not self._query or not isinstance(value, dict):
+            return value
+
+        kind, field = self._query.get("order_by", ("key", None))
+
+        def sort_value(item):
+            if kind != "child":
+                return item[0]
+            current = item[1]
+            for part in str(field).split("/"):
+                current = current.get(part) if isinstance(current, dict) else None
+            return current
+
+        items = list(value.items())
+        if "equal_to" in self._query:
+            items = [item for item in items if sort_value(item) == self._query["equal_to"]]
+        items.sort(key=lambda item: (str(sort_value(item)), item[0]))
+        if "limit_first" in self._query:
+            items = items[: self._query["limit_first"]]
+        if "limit_last" in self._query:
+            items = items[-self._query["limit_last"]:]
+        return dict(items)
+
+    def get(self, shallow=False):
+        value = self._apply_query(self._node())
+        if shallow and isinstance(value, dict):
+            value = {key: True for key in value}
+        self._store.reads += 1
+        self._store.bytes += len(json.dumps(value)) if value is not None else 0
+        return copy.deepcopy(value)
+
+    def set(self, value):
+        parent = self._parent()
+        if value is None:
+            parent.pop(self._parts[-1], None)
+        else:
+            parent[self._parts[-1]] = copy.deepcopy(value)
+
+    def update(self, values):
+        for path, value in (values or {}).items():
+            self.child(path).set(value)
+
+    def delete(self):
+        parent = self._parent(create=False)
+        if isinstance(parent, dict):
+            parent.pop(self._parts[-1], None)
+
+    def push(self, value=None):
+        self._store._push_seq += 1
+        ref = self.child(f"-N{self._store._push_seq:012d}")
+        if value is not None:
+            ref.set(value)
+        return ref
+
+    def transaction(self, update_fn):
+        new_value = update_fn(self._node())
+        self.set(new_value)
+        return new_value
+
+
+def build_synthetic_tree(school_count, users_per_school):
+    schools = {}
+    code_index = {}
+    for school_number in range(1, school_count + 1):
+        short_name = "S" + "".join(chr(ord("A") + int(digit)) for digit in f"{school_number:02d}")
+        school_code = f"ET-SYN-{school_number:03d}-{short_name}"
+        code_index[short_name] = school_code
+
+        users = {}
+        admins = {}
+        students = {}
+        for user_number in range(users_per_school):
+            user_id = f"-U{school_number:03d}{user_number:05d}"
+            is_admin = user_number < 2
+            username = f"{short_name}A_{user_number + 1:04d}_26" if is_admin else f"{short_name}S_{user_number:04d}_26"
+            users[user_id] = {
+                "userId": user_id,
+                "username": username,
+                "password": "secret",
+                "name": f"User {school_number}-{user_number}",
+                "role": "school_admins" if is_admin else "student",
+                "schoolCode": school_code,
+                "profileImage": "https://example.invalid/profile.png",
+            }
+            if is_admin:
+                admins[username] = {"adminId": username, "userId": user_id, "schoolCode": school_code}
+            else:
+                students[username] = {
+                    "studentId": username,
+                    "userId": user_id,
+                    "grade": str(1 + user_number % 12),
+                    "section": "ABC"[user_number % 3],
+                    "basicStudentInformation": {"notes": "x" * 200},
+                }
+
+        schools[school_code] = {
+            "schoolInfo": {"shortName": short_name, "name": f"Synthetic {school_number}"},
+            "Users": users,
+            "School_Admins": admins,
+            "Students": students,
+            "Posts": {f"-P{index:05d}": {"message": "y" * 300, "adminId": "x"} for index in range(100)},
+            "Chats": {f"-C{index:05d}": {"message": "z" * 120, "senderId": "a", "receiverId": "b"} for index in range(300)},
+        }
+
+    return {"Platform1": {"Schools": schools, "schoolCodeIndex": code_index}}
+
+
+def load_app(store):
+    fake_config = types.ModuleType("firebase_config")
+    fake_config.FIREBASE_CREDENTIALS = __file__
+    fake_config.get_firebase_options = lambda *args, **kwargs: {}
+    fake_config.require_firebase_credentials = lambda *args, **kwargs: __file__
+    sys.modules["firebase_config"] = fake_config
+
+    patches = [
+        mock.patch("firebase_admin.credentials.Certificate", lambda *args, **kwargs: object()),
+        mock.patch("firebase_admin.initialize_app", lambda *args, **kwargs: None),
+        mock.patch("firebase_admin.storage.bucket", lambda *args, **kwargs: None),
+        mock.patch("firebase_admin.db.reference", store.reference),
+    ]
+    for patcher in patches:
+        patcher.start()
+
+    import school_admin_app  # noqa: E402
+
+    return school_admin_app
+
+
+def legacy_find_user_for_login(app_module, username, password):
+    target_username = str(username).strip()
+    target_upper = target_username.upper()
+    case_insensitive_match = None
+    for user in app_module.get_users_snapshot().values():
+        if str(user.get("password") or "").strip() != password:
+            continue
+        current_username = str(user.get("username") or "").strip()
+        if current_username == target_username:
+            return user
+        if case_insensitive_match is None and current_username.upper() == target_upper:
+            case_insensitive_match = user
+    return case_insensitive_match
+
+
+def measure(store, label, fn, repeat):
+    store.reset_counters()
+    started = time.perf_counter()
+    result = None
+    for _ in range(repeat):
+        result = fn()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+    print(
+        f"{label:<38} {elapsed_ms:>9.2f} ms  {store.reads / repeat:>7.1f} reads  "
+        f"{store.bytes / repeat / 1024:>10.1f} KiB  found={bool(result)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schools", type=int, default=50)
+    parser.add_argument("--users", type=int, default=400, help="users per school")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    store = MemoryRTDB(build_synthetic_tree(args.schools, args.users))
+    app_module = load_app(store)
+
+    last_school = sorted(store.tree["Platform1"]["Schools"].items())[-1][1]
+    username = next(iter(last_school["School_Admins"]))
+
+    print(f"{args.schools} schools x {args.users} users, target {username}")
+    measure(store, "legacy full-platform scan", lambda: legacy_find_user_for_login(app_module, username, "secret"), args.repeat)
+
+    def cold():
+        store.tree["Platform1"].pop(app_module.LOGIN_INDEX_NODE, None)
+        app_module._LOGIN_INDEX_CACHE.clear()
+        return app_module.find_user_for_login(username, "secret")
+
+    def warm():
+        app_module._LOGIN_INDEX_CACHE.clear()
+        return app_module.find_user_for_login(username, "secret")
+
+    def unhinted():
+        store.tree["Platform1"].pop(app_module.LOGIN_INDEX_NODE, None)
+        app_module._LOGIN_INDEX_CACHE.clear()
+        return app_module.find_user_for_login(username.lower().replace("_", "-", 1), "secret")
+
+    measure(store, "index miss, schoolCodeIndex hint", cold, args.repeat)
+    measure(store, "loginIndex hit (RTDB)", warm, args.repeat)
+    measure(store, "loginIndex hit (in-process)", lambda: app_module.find_user_for_login(username, "secret"), args.repeat)
+    measure(store, "unknown username, per-school queries", unhinted, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
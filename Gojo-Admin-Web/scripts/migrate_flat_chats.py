@@ -0,0 +1,222 @@
+"""Move legacy flat Chats/<pushId> messages into Chats/<conversationId>/messages.
+
+Older admin builds wrote every message directly under Schools/<code>/Chats.
+The conversation layout (shared with the other portals) keys messages by the
+sorted participant ids, keeps participants/lastMessage/unread on the
+conversation node and mirrors unread counts into Chat_Summaries/<owner>.
+
+    python scripts/migrate_flat_chats.py --dry-run
+    python scripts/migrate_flat_chats.py --school-code ET-ORO-ADA-GMI
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+import sys
+
+import firebase_admin
+from firebase_admin import credentials, db
+
+
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+WORKSPACE_ROOT = PROJECT_ROOT.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from firebase_config import get_firebase_options, require_firebase_credentials  # noqa: E402
+
+
+PLATFORM_ROOT = "Platform1"
+CHAT_SUMMARY_NODE = "Chat_Summaries"
+UPDATE_CHUNK_SIZE = 400
+
+
+def init_firebase():
+    if firebase_admin._apps:
+        return
+
+    credential_path = require_firebase_credentials()
+    cred = credentials.Certificate(credential_path)
+    firebase_admin.initialize_app(cred, get_firebase_options())
+
+
+def platform_ref(path: str = ""):
+    clean = str(path or "").strip("/")
+    full_path = f"{PLATFORM_ROOT}/{clean}" if clean else PLATFORM_ROOT
+    return db.reference(full_path)
+
+
+def school_node_ref(school_code: str, node_name: str):
+    code = str(school_code or "").strip()
+    return platform_ref(f"Schools/{code}/{node_name}")
+
+
+def list_school_codes():
+    schools = platform_ref("Schools").get(shallow=True) or {}
+    return sorted(str(code).strip() for code in schools.keys() if str(code).strip())
+
+
+def safe_text(value):
+    return str(value).strip() if value is not None else ""
+
+
+def load_admin_app():
+    """Import school_admin_app only after init_firebase, so it reuses that Firebase app."""
+    import school_admin_app
+
+    return school_admin_app
+
+
+def time_ms(value):
+    """Same parsing as live messages: naive ISO strings are UTC, not host-local time."""
+    return load_admin_app()._chat_time_ms(value)
+
+
+def conversation_id(user_a, user_b):
+    return "_".join(sorted([safe_text(user_a), safe_text(user_b)]))
+
+
+def is_flat_message(value):
+    return (
+        isinstance(value, dict)
+        and "messages" not in value
+        and safe_text(value.get("senderId"))
+        and safe_text(value.get("receiverId"))
+    )
+
+
+def build_school_updates(chats):
+    """Return (multi-path updates, conversation count, message count)."""
+    conversations = {}
+    for message_key, message in chats.items():
+        if not is_flat_message(message):
+            continue
+        sender_id = safe_text(message.get("senderId"))
+        receiver_id = safe_text(message.get("receiverId"))
+        conversations.setdefault(conversation_id(sender_id, receiver_id), []).append((message_key, message))
+
+    updates = {}
+    summary_time = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    message_count = 0
+
+    for chat_id, messages in conversations.items():
+        messages.sort(key=lambda item: (time_ms(item[1].get("timeStamp") or item[1].get("time")), item[0]))
+        unread_by_user = {}
+        participants = set()
+
+        for message_key, message in messages:
+            sender_id = safe_text(message.get("senderId"))
+            receiver_id = safe_text(message.get("receiverId"))
+            seen = bool(message.get("seen") if "seen" in message else message.get("read"))
+            text = message.get("text") if message.get("text") is not None else message.get("message")
+            participants.update([sender_id, receiver_id])
+            if not seen:
+                unread_by_user[receiver_id] = unread_by_user.get(receiver_id, 0) + 1
+
+            updates[f"Chats/{chat_id}/messages/{message_key}"] = {
+                **message,
+                "messageId": safe_text(message.get("messageId")) or message_key,
+                "text": text,
+                "message": text,
+                "type": message.get("type") or "text",
+                "timeStamp": time_ms(message.get("timeStamp") or message.get("time")),
+                "seen": seen,
+                "read": seen,
+            }
+            updates[f"Chats/{message_key}"] = None
+            message_count += 1
+
+        # Conversations the other portals already write to keep their newer lastMessage.
+        existing = chats.get(chat_id) if isinstance(chats.get(chat_id), dict) else {}
+        existing_unread = existing.get("unread") if isinstance(existing.get("unread"), dict) else {}
+        last_key, last_message = messages[-1]
+        last_payload = updates[f"Chats/{chat_id}/messages/{last_key}"]
+        keep_existing_last = time_ms((existing.get("lastMessage") or {}).get("timeStamp")) > last_payload["timeStamp"]
+
+        for owner_id in participants:
+            unread_by_user[owner_id] = unread_by_user.get(owner_id, 0) + int(existing_unread.get(owner_id) or 0)
+            updates[f"Chats/{chat_id}/participants/{owner_id}"] = True
+            updates[f"Chats/{chat_id}/unread/{owner_id}"] = unread_by_user[owner_id]
+
+        if keep_existing_last:
+            for owner_id in participants:
+                updates[f"{CHAT_SUMMARY_NODE}/{owner_id}/{chat_id}/unreadCount"] = unread_by_user[owner_id]
+            continue
+
+        updates[f"Chats/{chat_id}/lastMessage"] = {
+            "messageId": last_payload["messageId"],
+            "senderId": safe_text(last_message.get("senderId")),
+            "receiverId": safe_text(last_message.get("receiverId")),
+            "text": last_payload["text"],
+            "type": last_payload["type"],
+            "timeStamp": last_payload["timeStamp"],
+            "seen": last_payload["seen"],
+        }
+
+        for owner_id in participants:
+            other_id = next((user_id for user_id in participants if user_id != owner_id), "")
+            updates[f"{CHAT_SUMMARY_NODE}/{owner_id}/{chat_id}"] = {
+                "chatId": chat_id,
+                "otherUserId": other_id,
+                "unreadCount": unread_by_user[owner_id],
+                "lastMessageText": last_payload["text"] or "",
+                "lastMessageType": last_payload["type"],
+                "lastMessageTime": last_payload["timeStamp"],
+                "lastSenderId": safe_text(last_message.get("senderId")),
+                "updatedAt": summary_time,
+            }
+
+    return updates, len(conversations), message_count
+
+
+def apply_updates(school_code, updates, chunk_size=UPDATE_CHUNK_SIZE):
+    """Write new conversation paths first, then delete the flat originals."""
+    writes = [(path, value) for path, value in updates.items() if value is not None]
+    deletes = [(path, value) for path, value in updates.items() if value is None]
+    school_ref = platform_ref(f"Schools/{school_code}")
+
+    for batch_source in (writes, deletes):
+        for start in range(0, len(batch_source), chunk_size):
+            school_ref.update(dict(batch_source[start:start + chunk_size]))
+
+
+def migrate_school(school_code, dry_run=False, chunk_size=UPDATE_CHUNK_SIZE):
+    chats = school_node_ref(school_code, "Chats").get() or {}
+    if not isinstance(chats, dict):
+        chats = {}
+
+    updates, conversation_count, message_count = build_school_updates(chats)
+    if updates and not dry_run:
+        apply_updates(school_code, updates, chunk_size)
+
+    action = "Would migrate" if dry_run else "Migrated"
+    print(f"{school_code}: {action} {message_count} messages into {conversation_count} conversations ({len(updates)} paths)")
+    return message_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate flat Chats messages into conversation nodes.")
+    parser.add_argument("--school-code", help="Migrate one school instead of every school.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+    parser.add_argument("--chunk-size", type=int, default=UPDATE_CHUNK_SIZE, help="Paths per multi-path update.")
+    args = parser.parse_args()
+
+    init_firebase()
+    school_codes = [args.school_code] if args.school_code else list_school_codes()
+    if not school_codes:
+        print("No schools found under Platform1/Schools.")
+        return
+
+    total = 0
+    for school_code in school_codes:
+        total += migrate_school(school_code, dry_run=args.dry_run, chunk_size=max(1, args.chunk_size))
+    print(f"Done: {total} messages across {len(school_codes)} schools.")
+
+
+if __name__ == "__main__":
+    main()
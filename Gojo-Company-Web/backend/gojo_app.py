@@ -9,6 +9,7 @@ from io import BytesIO
 import re
 import secrets
 import string
+import threading
 import time
 from urllib.parse import quote, urlparse
 from uuid import uuid4
@@ -28,6 +29,8 @@ DEFAULT_STORAGE_BUCKET = "gojo-education.firebasestorage.app"
 DEFAULT_PLATFORM_ROOT = "Platform1"
 DEFAULT_SCHOOLS_ROOT = "Schools"
 LOCAL_UPLOAD_ROOT = os.path.join(BASE_DIR, "uploaded_assets")
+READINESS_CACHE_TTL_SECONDS = 30
+HEALTH_STATS_CACHE_TTL_SECONDS = 5 * 60
 DEFAULT_CORS_ORIGIN_PATTERNS = (
     r"http://localhost:\d+",
     r"http://127\.0\.0\.1:\d+",
@@ -3121,24 +3124,85 @@ def index():
     )
 
 
+_HEALTH_CACHE = {}
+# One lock per entry so a slow stats refresh never holds up readiness probes.
+_HEALTH_CACHE_LOCKS = {"readiness": threading.Lock(), "stats": threading.Lock()}
+
+
+def _cached_health_value(cache_key, ttl_seconds, loader):
+    """Return loader() memoized for ttl_seconds; concurrent probes share one refresh."""
+    with _HEALTH_CACHE_LOCKS[cache_key]:
+        cached = _HEALTH_CACHE.get(cache_key)
+        if cached and time.time() - cached["ts"] < ttl_seconds:
+            return cached["value"]
+
+        value = loader()
+        _HEALTH_CACHE[cache_key] = {"value": value, "ts": time.time()}
+        return value
+
+
+def _shallow_key_set(*refs):
+    keys = set()
+    for ref in refs:
+        snapshot = ref.get(shallow=True)
+        if isinstance(snapshot, dict):
+            keys.update(snapshot.keys())
+    return keys
+
+
+def _readiness_counts():
+    # Shallow reads return keys only, so counting never downloads school, exam or question data.
+    return {
+        "schoolCount": len(_shallow_key_set(schools_ref())),
+        "companyExamCount": len(_shallow_key_set(
+            legacy_company_exams_ref().child("exams"),
+            company_exams_ref().child("exams"),
+        )),
+        "questionBankCount": len(_shallow_key_set(legacy_question_banks_ref(), question_banks_ref())),
+        "checkedAt": int(time.time() * 1000),
+    }
+
+
+def _company_health_stats():
+    dashboard = _company_exam_dashboard()
+    return {
+        **dashboard["stats"],
+        "schoolCount": len(_shallow_key_set(schools_ref())),
+        "generatedAt": int(time.time() * 1000),
+    }
+
+
+@app.get("/livez")
+@app.get("/api/livez")
+def liveness_check():
+    return jsonify({"status": "ok"})
+
+
+@app.get("/readyz")
+@app.get("/api/readyz")
 @app.get("/api/health")
 def health_check():
-    schools_snapshot = schools_ref().get() or {}
-    school_count = len(schools_snapshot) if isinstance(schools_snapshot, dict) else 0
-    dashboard = _company_exam_dashboard()
+    try:
+        counts = _cached_health_value("readiness", READINESS_CACHE_TTL_SECONDS, _readiness_counts)
+    except Exception as error:
+        return jsonify({"status": "unavailable", "database": "unreachable", "error": str(error)}), 503
 
     return jsonify(
         {
             "status": "ok",
             "database": "connected",
             "bucket": storage_bucket().name,
-            "schoolCount": school_count,
-            "companyExamCount": dashboard["stats"]["examCount"],
-            "questionBankCount": dashboard["stats"]["questionBankCount"],
+            **counts,
         }
     )
 
 
+@app.get("/api/health/stats")
+def health_stats():
+    stats = _cached_health_value("stats", HEALTH_STATS_CACHE_TTL_SECONDS, _company_health_stats)
+    return jsonify({"status": "ok", "stats": stats, "ttlSeconds": HEALTH_STATS_CACHE_TTL_SECONDS})
+
+
 @app.get("/api/schools")
 def list_schools():
     schools_snapshot = _deep_merge_dicts(
@@ -3243,6 +3307,8 @@ def update_school(school_code):
         return jsonify({"error": str(error)}), 400
 
     updated_school_info["updatedAt"] = updated_at_iso
+    # schoolInfo is rewritten whole; bump the stamp the Teacher portal caches the academic year against.
+    updated_school_info["academicYearVersion"] = int(time.time() * 1000)
     academic_years_node = school_data.get("AcademicYears") if isinstance(school_data.get("AcademicYears"), dict) else {}
 
     base_path = f"{str(os.getenv('PLATFORM_ROOT', DEFAULT_PLATFORM_ROOT)).strip('/')}/Schools/{school_code}" if scope == "platform" else f"Schools/{school_code}"
@@ -2,10 +2,16 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import firebase_admin
 from firebase_admin import credentials, db
+import gzip
+import hashlib
+import json
 import os
 import sys
 import threading
 import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from firebase_config import FIREBASE_CREDENTIALS, get_firebase_options, require_firebase_credentials
 
@@ -27,7 +33,24 @@ _NODE_CACHE = {}
 _NODE_CACHE_LOCK = threading.Lock()
 NODE_CACHE_TTL = 30 * 60
 _PLATFORM_LOOKUP_CACHE = {}
+_PLATFORM_LOOKUP_REFRESH_LOCK = threading.Lock()
 PLATFORM_LOOKUP_TTL = 5 * 60
+PLATFORM_LOOKUP_FETCH_WORKERS = 8
+PLATFORM_LOOKUP_MISS_REFRESH_SECONDS = 30
+# Usernames whose failed login already re-checked RTDB, so repeats stay index-only (LRU).
+_PLATFORM_LOOKUP_MISSES = OrderedDict()
+PLATFORM_LOOKUP_MISS_MAX_ENTRIES = 4096
+# Unknown usernames fan out to one query per school, so those probes share one token
+# bucket across all usernames: a burst of made-up names cannot multiply RTDB reads.
+PLATFORM_LOOKUP_UNKNOWN_PROBE_BURST = 10
+PLATFORM_LOOKUP_UNKNOWN_PROBES_PER_SECOND = 0.5
+_PLATFORM_LOOKUP_UNKNOWN_PROBE_BUCKET = {"tokens": float(PLATFORM_LOOKUP_UNKNOWN_PROBE_BURST), "ts": time.monotonic()}
+# Same IdCounters/<PREFIX>_<YY> counters the Register portal allocates from.
+ID_COUNTERS_NODE = "IdCounters"
+# Only these Users fields are kept in the lookup index (login needs password/role).
+PLATFORM_LOOKUP_USER_FIELDS = (
+    "userId", "username", "password", "name", "profileImage", "role", "employeeId", "phone", "Phone",
+)
 
 
 def schools_data():
@@ -63,69 +86,346 @@ def invalidate_cached_node(school_code, node):
         _NODE_CACHE.pop(_cache_key(school_code, node), None)
 
 
-def get_platform_lookup_index():
+# Named field presets for /api/nodes/<node>?fields=<preset>; a comma-separated
+# list of dot paths works too. Projected bodies are cached on the node cache entry.
+_STUDENT_CONTACT_FIELDS = (
+    "userId", "use", "user", "name", "username", "email", "phone", "profileImage", "grade", "section", "parents",
+    "basicStudentInformation.name", "basicStudentInformation.email", "basicStudentInformation.phone",
+    "basicStudentInformation.studentPhoto", "basicStudentInformation.profileImage",
+    "basicStudentInformation.grade", "basicStudentInformation.section",
+)
+NODE_FIELD_PRESETS = {
+    "Students": {"contacts": _STUDENT_CONTACT_FIELDS},
+    "Parents": {"contacts": ("userId", "name", "username", "email", "phone", "profileImage", "children")},
+    "Users": {"contacts": ("userId", "name", "username", "email", "phone", "phoneNumber", "profileImage", "role")},
+}
+# Ad-hoc fields= lists may only pick from the paths some preset of the node already exposes.
+NODE_PROJECTABLE_FIELDS = {
+    node: frozenset(path for preset in presets.values() for path in preset)
+    for node, presets in NODE_FIELD_PRESETS.items()
+}
+PROJECTION_BLOCKED_FIELDS = {"password"}
+NODE_RESPONSE_GZIP_MIN_BYTES = 1024
+# Rendered bodies kept per node cache entry (full node plus projections).
+NODE_RESPONSE_CACHE_MAX_ENTRIES = 8
+
+
+def _resolve_node_fields(node, fields_param):
+    text = str(fields_param or "").strip()
+    if not text:
+        return None
+    preset = (NODE_FIELD_PRESETS.get(node) or {}).get(text)
+    if preset is not None:
+        return tuple(preset)
+    requested = {part.strip() for part in text.split(",") if part.strip()}
+    unknown = requested - NODE_PROJECTABLE_FIELDS.get(node, frozenset())
+    if not requested or unknown:
+        raise ValueError(f"Unsupported fields for {node}: {', '.join(sorted(unknown)) or text}")
+    return tuple(sorted(requested))
+
+
+def _project_node_record(record, field_paths):
+    if not field_paths:
+        return True
+    if not isinstance(record, dict):
+        return record
+
+    projected = {}
+    for path in field_paths:
+        parts = path.split(".")
+        if parts[-1] in PROJECTION_BLOCKED_FIELDS:
+            continue
+        value = record
+        for part in parts:
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is None:
+            continue
+        target = projected
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return projected
+
+
+def cached_node_response(school_code, node, fields_param=None):
+    """Serve a cached node, projected by fields=, as pre-serialized JSON with gzip and ETag revalidation."""
+    data = get_school_node_cached(school_code, node)
+    try:
+        field_paths = _resolve_node_fields(node, fields_param)
+    except ValueError as exc:
+        return jsonify({"success": False, "message": str(exc)}), 400
+    key = _cache_key(school_code, node)
+
     with _NODE_CACHE_LOCK:
-        entry = _PLATFORM_LOOKUP_CACHE.get("platform_lookup")
-        if entry and (time.monotonic() - entry["ts"]) < PLATFORM_LOOKUP_TTL:
-            return entry["data"]
+        entry = _NODE_CACHE.get(key)
+        rendered = (entry.get("responses") or {}).get(field_paths) if entry and entry["data"] is data else None
+
+    if rendered is None:
+        payload = data
+        if field_paths is not None and isinstance(data, dict):
+            payload = {child_key: _project_node_record(record, field_paths) for child_key, record in data.items()}
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        rendered = {"body": body, "etag": hashlib.sha1(body).hexdigest(), "gzip": None}
+        with _NODE_CACHE_LOCK:
+            entry = _NODE_CACHE.get(key)
+            if entry and entry["data"] is data:
+                responses = entry.setdefault("responses", {})
+                if field_paths not in responses and len(responses) >= NODE_RESPONSE_CACHE_MAX_ENTRIES:
+                    responses.pop(next(iter(responses)))
+                responses[field_paths] = rendered
+
+    body = rendered["body"]
+    etag = rendered["etag"]
+    use_gzip = len(body) >= NODE_RESPONSE_GZIP_MIN_BYTES and "gzip" in request.accept_encodings
+    if use_gzip:
+        if rendered["gzip"] is None:
+            rendered["gzip"] = gzip.compress(body, compresslevel=6)
+        body = rendered["gzip"]
+        etag = f"{etag}-gzip"
+
+    response = app.response_class(body, mimetype="application/json")
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def _project_lookup_user(user_row):
+    return {
+        field: user_row[field]
+        for field in PLATFORM_LOOKUP_USER_FIELDS
+        if user_row.get(field) is not None
+    }
+
+
+def _load_school_lookup_nodes(school_code):
+    node = school_ref(school_code)
+    return school_code, node.child("Users").get() or {}, node.child("Finance").get() or {}
 
-    all_schools = schools_data()
-    finance_id_to_school = {}
-    user_id_to_school = {}
-    login_candidates_by_username = {}
-    finance_record_by_user_id = {}
-
-    for school_code, school_node in (all_schools or {}).items():
-        school_node = school_node or {}
-        users_map = school_node.get("Users") or {}
-        finance_map = school_node.get("Finance") or {}
-
-        for finance_id, finance_row in finance_map.items():
-            finance_row = finance_row or {}
-            finance_id_to_school[str(finance_id)] = school_code
-
-            finance_user_id = str(finance_row.get("userId") or "").strip()
-            if finance_user_id:
-                user_id_to_school[finance_user_id] = school_code
-                finance_record_by_user_id[finance_user_id] = {
-                    "financeId": finance_id,
-                    **finance_row,
-                }
-
-        for uid, user_row in users_map.items():
-            user_row = user_row or {}
-            user_key = str(uid or "").strip()
-            user_id = str(user_row.get("userId") or user_key).strip()
-            username = str(user_row.get("username") or "").strip().lower()
-
-            if user_key:
-                user_id_to_school[user_key] = school_code
-            if user_id:
-                user_id_to_school[user_id] = school_code
-
-            if username:
-                login_candidates_by_username.setdefault(username, []).append({
-                    "schoolCode": school_code,
-                    "userId": user_key or user_id,
-                    "user": user_row,
-                })
 
+def _index_finance_row(index, school_code, finance_id, finance_row):
+    finance_row = finance_row or {}
+    index["finance_id_to_school"][str(finance_id)] = school_code
+
+    finance_user_id = str(finance_row.get("userId") or "").strip()
+    if finance_user_id:
+        index["user_id_to_school"][finance_user_id] = school_code
+        index["finance_record_by_user_id"][finance_user_id] = {
+            "financeId": finance_id,
+            **finance_row,
+        }
+
+
+def _index_user_row(index, school_code, uid, user_row):
+    user_row = _project_lookup_user(user_row or {})
+    user_key = str(uid or "").strip()
+    user_id = str(user_row.get("userId") or user_key).strip()
+    username = str(user_row.get("username") or "").strip().lower()
+
+    if user_key:
+        index["user_id_to_school"][user_key] = school_code
+    if user_id:
+        index["user_id_to_school"][user_id] = school_code
+
+    if username:
+        candidates = index["login_candidates_by_username"].setdefault(username, [])
+        candidates[:] = [
+            candidate for candidate in candidates
+            if not (candidate.get("schoolCode") == school_code and candidate.get("userId") == (user_key or user_id))
+        ]
+        candidates.append({
+            "schoolCode": school_code,
+            "userId": user_key or user_id,
+            "user": user_row,
+        })
+
+
+def _build_platform_lookup_index():
+    """Read Users and Finance for each school in parallel; never the whole Platform1/Schools tree."""
+    school_codes = [
+        str(code).strip()
+        for code in (db.reference(PLATFORM_SCHOOLS_REF).get(shallow=True) or {}).keys()
+        if str(code).strip()
+    ]
     index = {
-        "finance_id_to_school": finance_id_to_school,
-        "user_id_to_school": user_id_to_school,
-        "login_candidates_by_username": login_candidates_by_username,
-        "finance_record_by_user_id": finance_record_by_user_id,
+        "finance_id_to_school": {},
+        "user_id_to_school": {},
+        "login_candidates_by_username": {},
+        "finance_record_by_user_id": {},
     }
 
-    with _NODE_CACHE_LOCK:
-        _PLATFORM_LOOKUP_CACHE["platform_lookup"] = {"data": index, "ts": time.monotonic()}
+    worker_count = max(1, min(PLATFORM_LOOKUP_FETCH_WORKERS, len(school_codes)))
+    with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="platform-lookup") as executor:
+        for school_code, users_map, finance_map in executor.map(_load_school_lookup_nodes, school_codes):
+            for finance_id, finance_row in (finance_map or {}).items():
+                _index_finance_row(index, school_code, finance_id, finance_row)
+            for uid, user_row in (users_map or {}).items():
+                _index_user_row(index, school_code, uid, user_row)
 
     return index
 
 
-def invalidate_platform_lookup_cache():
+def _refresh_platform_lookup_index():
+    try:
+        index = _build_platform_lookup_index()
+        with _NODE_CACHE_LOCK:
+            _PLATFORM_LOOKUP_CACHE["platform_lookup"] = {"data": index, "ts": time.monotonic()}
+        return index
+    finally:
+        _PLATFORM_LOOKUP_REFRESH_LOCK.release()
+
+
+def _start_platform_lookup_refresh():
+    if not _PLATFORM_LOOKUP_REFRESH_LOCK.acquire(blocking=False):
+        return
+    threading.Thread(target=_refresh_platform_lookup_index, name="platform-lookup-refresh", daemon=True).start()
+
+
+def get_platform_lookup_index():
     with _NODE_CACHE_LOCK:
-        _PLATFORM_LOOKUP_CACHE.pop("platform_lookup", None)
+        entry = _PLATFORM_LOOKUP_CACHE.get("platform_lookup")
+
+    if entry:
+        # Serve the existing index while a single background refresh rebuilds it.
+        if (time.monotonic() - entry["ts"]) >= PLATFORM_LOOKUP_TTL:
+            _start_platform_lookup_refresh()
+        return entry["data"]
+
+    _PLATFORM_LOOKUP_REFRESH_LOCK.acquire()
+    with _NODE_CACHE_LOCK:
+        entry = _PLATFORM_LOOKUP_CACHE.get("platform_lookup")
+    if entry:
+        _PLATFORM_LOOKUP_REFRESH_LOCK.release()
+        return entry["data"]
+    return _refresh_platform_lookup_index()
+
+
+def update_platform_lookup_user(school_code, user_id, user_row):
+    """Apply one Users write to the cached index instead of rebuilding it."""
+    with _NODE_CACHE_LOCK:
+        entry = _PLATFORM_LOOKUP_CACHE.get("platform_lookup")
+        if entry:
+            _index_user_row(entry["data"], school_code, user_id, user_row)
+
+
+def update_platform_lookup_finance(school_code, finance_id, finance_row):
+    with _NODE_CACHE_LOCK:
+        entry = _PLATFORM_LOOKUP_CACHE.get("platform_lookup")
+        if entry:
+            _index_finance_row(entry["data"], school_code, finance_id, finance_row)
+
+
+def invalidate_platform_lookup_cache(min_age_seconds=0):
+    """Mark the index stale; the next lookup serves it once more and refreshes in the background."""
+    with _NODE_CACHE_LOCK:
+        entry = _PLATFORM_LOOKUP_CACHE.get("platform_lookup")
+        if entry and (time.monotonic() - entry["ts"]) >= min_age_seconds:
+            entry["ts"] = float("-inf")
+
+
+def _match_login_candidate(username, password):
+    candidates = get_platform_lookup_index()["login_candidates_by_username"].get(str(username).strip().lower(), [])
+    for candidate in candidates:
+        user_row = candidate.get("user") or {}
+        if user_row.get("password") == password:
+            return {"userId": candidate.get("userId") or user_row.get("userId"), **user_row}, candidate.get("schoolCode")
+    return None, None
+
+
+def _take_unknown_username_probe(now):
+    """Take one token from the shared unknown-username bucket; call with _NODE_CACHE_LOCK held."""
+    bucket = _PLATFORM_LOOKUP_UNKNOWN_PROBE_BUCKET
+    bucket["tokens"] = min(
+        float(PLATFORM_LOOKUP_UNKNOWN_PROBE_BURST),
+        bucket["tokens"] + (now - bucket["ts"]) * PLATFORM_LOOKUP_UNKNOWN_PROBES_PER_SECOND,
+    )
+    bucket["ts"] = now
+    if bucket["tokens"] < 1:
+        return False
+    bucket["tokens"] -= 1
+    return True
+
+
+def _claim_login_miss_probe(username):
+    """True at most once per PLATFORM_LOOKUP_MISS_REFRESH_SECONDS for a given username.
+
+    Usernames missing from the index additionally need a token from the shared
+    bucket; when it is empty the miss is not remembered, so a retry can probe later.
+    """
+    key = str(username).strip().lower()
+    known = bool(get_platform_lookup_index()["login_candidates_by_username"].get(key))
+    now = time.monotonic()
+    with _NODE_CACHE_LOCK:
+        last_probe = _PLATFORM_LOOKUP_MISSES.get(key)
+        if last_probe is not None and now - last_probe < PLATFORM_LOOKUP_MISS_REFRESH_SECONDS:
+            _PLATFORM_LOOKUP_MISSES.move_to_end(key)
+            return False
+        if not known and not _take_unknown_username_probe(now):
+            return False
+        _PLATFORM_LOOKUP_MISSES[key] = now
+        _PLATFORM_LOOKUP_MISSES.move_to_end(key)
+        while len(_PLATFORM_LOOKUP_MISSES) > PLATFORM_LOOKUP_MISS_MAX_ENTRIES:
+            _PLATFORM_LOOKUP_MISSES.popitem(last=False)
+    return True
+
+
+def _fold_login_user(school_code, user_key, user_row):
+    """Apply one freshly read Users row (and its Finance record) to the lookup index."""
+    update_platform_lookup_user(school_code, user_key, user_row)
+    user_id = str(user_row.get("userId") or user_key).strip()
+    try:
+        finance_rows = school_ref(school_code).child("Finance").order_by_child("userId").equal_to(user_id).limit_to_first(1).get() or {}
+    except Exception:
+        finance_rows = {}
+    for finance_id, finance_row in (finance_rows.items() if isinstance(finance_rows, dict) else []):
+        update_platform_lookup_finance(school_code, finance_id, finance_row)
+
+
+def _recheck_login_username(username):
+    """After a failed login, re-read only what could have changed in RTDB since the index was built.
+
+    Known usernames get a point read per candidate row (e.g. a password changed
+    by another portal); unknown ones get one indexed username query per school
+    (an account created elsewhere). The index is never rebuilt for a miss.
+    """
+    candidates = get_platform_lookup_index()["login_candidates_by_username"].get(str(username).strip().lower(), [])
+    if candidates:
+        for candidate in list(candidates):
+            user_key = str(candidate.get("userId") or "").strip()
+            if not user_key:
+                continue
+            user_row = school_ref(candidate.get("schoolCode")).child("Users").child(user_key).get()
+            if isinstance(user_row, dict):
+                _fold_login_user(candidate.get("schoolCode"), user_key, user_row)
+        return
+
+    school_codes = [
+        str(code).strip()
+        for code in (db.reference(PLATFORM_SCHOOLS_REF).get(shallow=True) or {}).keys()
+        if str(code).strip()
+    ]
+    target = str(username).strip()
+
+    def query_school(school_code):
+        users_ref = school_ref(school_code).child("Users")
+        matches = {}
+        for candidate in dict.fromkeys([target, target.upper(), target.lower()]):
+            try:
+                rows = users_ref.order_by_child("username").equal_to(candidate).limit_to_first(5).get() or {}
+            except Exception:
+                rows = {}
+            if isinstance(rows, dict):
+                matches.update(rows)
+        return school_code, matches
+
+    worker_count = max(1, min(PLATFORM_LOOKUP_FETCH_WORKERS, len(school_codes)))
+    with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="platform-lookup") as executor:
+        for school_code, matches in executor.map(query_school, school_codes):
+            for user_key, user_row in matches.items():
+                if isinstance(user_row, dict):
+                    _fold_login_user(school_code, user_key, user_row)
 
 
 def find_school_code_for_user(user_id=None, finance_id=None):
@@ -144,27 +444,47 @@ def find_school_code_for_user(user_id=None, finance_id=None):
     return None
 
 
-def generate_parent_id(school_code):
-    parents = school_ref(school_code).child("Parents").get(shallow=True) or {}
-    year_suffix = datetime.utcnow().strftime("%y")
-    prefix = "GPR"
+def _max_scoped_sequence(school_code, node_name, prefix, year_suffix):
+    node = school_ref(school_code).child(node_name).get(shallow=True) or {}
     max_seq = 0
 
-    for pid in parents.keys():
-        text = str(pid or "")
-        parts = text.split("_")
-        if len(parts) == 3 and parts[0] == prefix and parts[2] == year_suffix:
-            try:
-                seq = int(parts[1])
-                if seq > max_seq:
-                    max_seq = seq
-            except Exception:
-                continue
+    if isinstance(node, dict):
+        for key in node.keys():
+            parts = str(key or "").split("_")
+            if len(parts) == 3 and parts[0] == prefix and parts[2] == year_suffix:
+                try:
+                    max_seq = max(max_seq, int(parts[1]))
+                except Exception:
+                    continue
+
+    return max_seq
+
+
+def _allocate_scoped_id(school_code, node_name, prefix):
+    """Reserve the next <prefix>_<seq>_<YY> id from IdCounters/<prefix>_<YY> in one transaction.
 
-    next_seq = max_seq + 1
+    The counter is seeded from a shallow key scan of node_name only the first
+    time it is used, so registrations no longer list every key.
+    """
+    year_suffix = datetime.utcnow().strftime("%y")
+    counter_ref = school_ref(school_code).child(f"{ID_COUNTERS_NODE}/{prefix}_{year_suffix}")
+    seed = {}
+
+    def reserve(current):
+        if current is None:
+            if "value" not in seed:
+                seed["value"] = _max_scoped_sequence(school_code, node_name, prefix, year_suffix)
+            current = seed["value"]
+        return int(current) + 1
+
+    next_seq = int(counter_ref.transaction(reserve))
     return f"{prefix}_{str(next_seq).zfill(4)}_{year_suffix}"
 
 
+def generate_parent_id(school_code):
+    return _allocate_scoped_id(school_code, "Parents", "GPR")
+
+
 @app.route("/register/parent", methods=["POST"])
 @app.route("/api/register/parent", methods=["POST"])
 def register_parent():
@@ -255,7 +575,7 @@ def register_parent():
                 "linkedAt": datetime.utcnow().isoformat(),
             })
 
-        invalidate_platform_lookup_cache()
+        update_platform_lookup_user(school_code, user_id, user_payload)
         invalidate_cached_node(school_code, "Users")
         invalidate_cached_node(school_code, "Parents")
         invalidate_cached_node(school_code, "Students")
@@ -275,19 +595,11 @@ def login_finance():
         if not username or not password:
             return jsonify({"success": False, "message": "Missing credentials"}), 400
 
-        lookup = get_platform_lookup_index()
-        matched_user = None
-        matched_school_code = None
-
-        candidates = lookup["login_candidates_by_username"].get(str(username).strip().lower(), [])
-        for candidate in candidates:
-            user_row = candidate.get("user") or {}
-            if user_row.get("password") != password:
-                continue
-
-            matched_user = {"userId": candidate.get("userId") or user_row.get("userId"), **user_row}
-            matched_school_code = candidate.get("schoolCode")
-            break
+        matched_user, matched_school_code = _match_login_candidate(username, password)
+        if not matched_user and _claim_login_miss_probe(username):
+            # Accounts created or changed by other portals since the index was built.
+            _recheck_login_username(username)
+            matched_user, matched_school_code = _match_login_candidate(username, password)
 
         if not matched_user:
             return jsonify({"success": False, "message": "Invalid username or password"}), 401
@@ -297,7 +609,7 @@ def login_finance():
             return jsonify({"success": False, "message": "User is not finance"}), 403
 
         # Find finance record by userId
-        finance_record = lookup["finance_record_by_user_id"].get(str(matched_user.get("userId") or ""))
+        finance_record = get_platform_lookup_index()["finance_record_by_user_id"].get(str(matched_user.get("userId") or ""))
 
         resp = {
             "success": True,
@@ -495,42 +807,80 @@ def _normalize_order_value(value):
         return text.lower()
 
 
-def _build_sorted_rows(node_data, order_by):
-    rows = []
+def _order_sort_value(value):
+    """Rank numbers before text so mixed columns still sort instead of raising TypeError."""
+    normalized = _normalize_order_value(value)
+    if isinstance(normalized, str):
+        return (1, normalized)
+    return (0, normalized)
 
+
+def _build_page_index(node_data, order_by):
+    """Sorted (value, key) index of a cached node for one orderBy field."""
+    entries = []
     for key, value in (node_data or {}).items():
-        item = value or {}
-        rows.append({"key": key, **item})
+        item = value if isinstance(value, dict) else {}
+        raw_value = key if order_by == "key" else item.get(order_by)
+        entries.append((_order_sort_value(raw_value), str(key)))
+
+    entries.sort()
+    return {
+        "sort_values": [entry[0] for entry in entries],
+        "cursors": entries,
+    }
 
-    def sort_key(item):
-        raw_value = item.get(order_by) if order_by != "key" else item.get("key")
-        return (_normalize_order_value(raw_value), str(item.get("key") or ""))
 
-    rows.sort(key=sort_key)
-    return rows
+def get_node_page_index(school_code, node, order_by):
+    """Page index for a cached node, built once per cache fill and dropped with the cache entry."""
+    data = get_school_node_cached(school_code, node) or {}
+    key = _cache_key(school_code, node)
+    with _NODE_CACHE_LOCK:
+        entry = _NODE_CACHE.get(key)
+        if entry and entry["data"] is data:
+            page_index = entry.setdefault("page_index", {}).get(order_by)
+            if page_index is not None:
+                return data, page_index
+
+    page_index = _build_page_index(data, order_by)
+
+    with _NODE_CACHE_LOCK:
+        entry = _NODE_CACHE.get(key)
+        if entry and entry["data"] is data:
+            entry.setdefault("page_index", {})[order_by] = page_index
 
+    return data, page_index
 
-def _apply_start_at(rows, order_by, start_at_value, start_at_key):
-    if start_at_value in (None, ""):
-        return rows
 
-    normalized_start_value = _normalize_order_value(start_at_value)
-    normalized_start_key = str(start_at_key or "")
-    filtered = []
+def _cursor_position(page_index, value, key, upper):
+    """bisect position of a (value, key) cursor; without a key the cursor covers every row with that value."""
+    sort_value = _order_sort_value(value)
+    if key:
+        cursor = (sort_value, str(key))
+        return bisect_right(page_index["cursors"], cursor) if upper else bisect_left(page_index["cursors"], cursor)
+    if upper:
+        return bisect_right(page_index["sort_values"], sort_value)
+    return bisect_left(page_index["sort_values"], sort_value)
 
-    for item in rows:
-        raw_value = item.get(order_by) if order_by != "key" else item.get("key")
-        item_value = _normalize_order_value(raw_value)
-        item_key = str(item.get("key") or "")
 
-        if item_value > normalized_start_value:
-            filtered.append(item)
-            continue
+def _page_bounds(page_index, start_at_value, start_at_key, end_at_value, end_at_key, descending):
+    """Return (lo, hi) slice of the index inside the startAt/endAt cursors.
 
-        if item_value == normalized_start_value and item_key >= normalized_start_key:
-            filtered.append(item)
+    Ascending pages run from startAt up to endAt; descending pages run from
+    startAt down to endAt, matching the cursor the previous page handed back.
+    """
+    lo = 0
+    hi = len(page_index["cursors"])
+    low_cursor, high_cursor = (
+        ((end_at_value, end_at_key), (start_at_value, start_at_key))
+        if descending
+        else ((start_at_value, start_at_key), (end_at_value, end_at_key))
+    )
 
-    return filtered
+    if low_cursor[0] not in (None, ""):
+        lo = _cursor_position(page_index, low_cursor[0], low_cursor[1], upper=False)
+    if high_cursor[0] not in (None, ""):
+        hi = _cursor_position(page_index, high_cursor[0], high_cursor[1], upper=True)
+    return lo, max(lo, hi)
 
 
 @app.route("/api/like_post", methods=["POST"])
@@ -602,8 +952,7 @@ def get_school_node(node_name):
     school_code = (request.args.get("schoolCode") or "").strip()
     if not school_code:
         return jsonify({"success": False, "message": "schoolCode is required"}), 400
-    data = get_school_node_cached(school_code, node_name)
-    return jsonify(data), 200
+    return cached_node_response(school_code, node_name, request.args.get("fields"))
 
 
 @app.route("/api/nodes/<node_name>/paged", methods=["GET"])
@@ -612,6 +961,9 @@ def get_school_node_paged(node_name):
     order_by = (request.args.get("orderBy") or "key").strip()
     start_at_value = request.args.get("startAtValue")
     start_at_key = (request.args.get("startAtKey") or "").strip()
+    end_at_value = request.args.get("endAtValue")
+    end_at_key = (request.args.get("endAtKey") or "").strip()
+    descending = (request.args.get("direction") or "asc").strip().lower() in ("desc", "descending")
 
     try:
         limit = int(request.args.get("limit") or 21)
@@ -623,18 +975,23 @@ def get_school_node_paged(node_name):
     if not school_code:
         return jsonify({"success": False, "message": "schoolCode is required"}), 400
 
-    data = get_school_node_cached(school_code, node_name) or {}
-    rows = _build_sorted_rows(data, order_by)
-    rows = _apply_start_at(rows, order_by, start_at_value, start_at_key)
+    data, page_index = get_node_page_index(school_code, node_name, order_by)
+    lo, hi = _page_bounds(page_index, start_at_value, start_at_key, end_at_value, end_at_key, descending)
 
-    has_more = len(rows) > limit
-    page_rows = rows[:limit]
+    if descending:
+        page_cursors = page_index["cursors"][max(lo, hi - limit):hi][::-1]
+    else:
+        page_cursors = page_index["cursors"][lo:min(hi, lo + limit)]
+
+    page_rows = []
+    for _, key in page_cursors:
+        item = data.get(key)
+        page_rows.append({"key": key, **(item if isinstance(item, dict) else {})})
 
     return jsonify({
         "items": page_rows,
-        "hasMore": has_more,
+        "hasMore": hi - lo > limit,
     }), 200
 
-
 if __name__ == "__main__":
     app.run(debug=True)
@@ -87,8 +87,8 @@ function toParentContact(parentId, parentNode, parentUsersById, studentsNode) {
   };
 }
 
-async function loadSupportNode(queryClient, schoolCode, nodeName) {
-  const cacheKey = ["finance-node", schoolCode, nodeName];
+async function loadSupportNode(queryClient, schoolCode, nodeName, fields = "contacts") {
+  const cacheKey = ["finance-node", schoolCode, nodeName, fields];
   const cached = queryClient.getQueryData(cacheKey);
 
   if (cached) {
@@ -96,7 +96,7 @@ async function loadSupportNode(queryClient, schoolCode, nodeName) {
   }
 
   const response = await axios.get(`${BACKEND_BASE}/api/nodes/${nodeName}`, {
-    params: { schoolCode },
+    params: { schoolCode, fields },
   });
 
   const nextValue = response.data || {};
@@ -236,12 +236,12 @@ export async function loadSchoolPeople(dbRoot, role, { force = false } = {}) {
       // Route large-node reads through the backend proxy so 100 finance users
       // share one server-side cache instead of each downloading 10 MB directly.
       const recordsFetch = schoolCode
-        ? axios.get(`${BACKEND_BASE}/api/nodes/${recordsNode}`, { params: { schoolCode } }).catch(() => ({ data: {} }))
+        ? axios.get(`${BACKEND_BASE}/api/nodes/${recordsNode}`, { params: { schoolCode, fields: "contacts" } }).catch(() => ({ data: {} }))
         : axios.get(`${dbRoot}/${recordsNode}.json`).catch(() => ({ data: {} }));
 
       const studentsFetch = isParent
         ? (schoolCode
-            ? axios.get(`${BACKEND_BASE}/api/nodes/Students`, { params: { schoolCode } }).catch(() => ({ data: {} }))
+            ? axios.get(`${BACKEND_BASE}/api/nodes/Students`, { params: { schoolCode, fields: "contacts" } }).catch(() => ({ data: {} }))
             : axios.get(`${dbRoot}/Students.json`).catch(() => ({ data: {} })))
         : Promise.resolve({ data: {} });
 
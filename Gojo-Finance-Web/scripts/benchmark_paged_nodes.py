@@ -0,0 +1,148 @@
+"""Micro-benchmark /api/nodes/<node>/paged against a cached 20k-student node.
+
+Compares the previous per-request path (merge every row into a new dict,
+sort, filter by the startAt cursor) with the sorted page index that is
+built once per cache fill and sliced with bisect. Firebase is replaced by
+an in-memory node, so the script runs offline:
+
+    python scripts/benchmark_paged_nodes.py --students 20000 --pages 200
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import types
+from pathlib import Path
+from unittest import mock
+
+
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+class StaticRef:
+    def __init__(self, tree, path=""):
+        self._tree = tree
+        self._parts = [part for part in str(path or "").strip("/").split("/") if part]
+
+    def child(self, path):
+        return StaticRef(self._tree, "/".join(self._parts + [str(path).strip("/")]))
+
+    def get(self, shallow=False):
+        node = self._tree
+        for part in self._parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+
+def build_students(count):
+    return {
+        f"SYNS_{index:05d}_26": {
+            "studentId": f"SYNS_{index:05d}_26",
+            "userId": f"-U{index:06d}",
+            "name": f"Student {(index * 7919) % count:05d}",
+            "grade": str(1 + index % 12),
+            "section": "ABC"[index % 3],
+            "basicStudentInformation": {"notes": "x" * 200},
+        }
+        for index in range(count)
+    }
+
+
+def load_app(tree):
+    fake_config = types.ModuleType("firebase_config")
+    fake_config.FIREBASE_CREDENTIALS = __file__
+    fake_config.get_firebase_options = lambda *args, **kwargs: {}
+    fake_config.require_firebase_credentials = lambda *args, **kwargs: __file__
+    sys.modules["firebase_config"] = fake_config
+
+    for patcher in (
+        mock.patch("firebase_admin.credentials.Certificate", lambda *args, **kwargs: object()),
+        mock.patch("firebase_admin.initialize_app", lambda *args, **kwargs: None),
+        mock.patch("firebase_admin.db.reference", lambda path="", **kwargs: StaticRef(tree, path)),
+    ):
+        patcher.start()
+
+    import finance_app  # noqa: E402
+
+    return finance_app
+
+
+def legacy_page(app_module, node_data, order_by, start_at_value, start_at_key, limit):
+    """The pre-index get_school_node_paged body, kept here as the baseline."""
+    rows = [{"key": key, **(value or {})} for key, value in node_data.items()]
+    rows.sort(key=lambda item: (
+        app_module._normalize_order_value(item.get(order_by) if order_by != "key" else item.get("key")),
+        str(item.get("key") or ""),
+    ))
+    if start_at_value not in (None, ""):
+        start_value = app_module._normalize_order_value(start_at_value)
+        rows = [
+            item for item in rows
+            if (app_module._normalize_order_value(item.get(order_by) if order_by != "key" else item.get("key")), str(item.get("key")))
+            >= (start_value, start_at_key)
+        ]
+    return rows[:limit], len(rows) > limit
+
+
+def walk(fetch_page, pages, order_by, limit):
+    """Follow startAt cursors the way usePaginatedRTDB does; return ms per page."""
+    cursor = (None, "")
+    started = time.perf_counter()
+    for _ in range(pages):
+        rows, has_more = fetch_page(cursor, limit + 1)
+        if not has_more:
+            cursor = (None, "")
+            continue
+        last = rows[-1]
+        cursor = (str(last.get(order_by) if order_by != "key" else last["key"]), last["key"])
+    return (time.perf_counter() - started) * 1000 / pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    school_code = "ET-SYN-001-SAB"
+    tree = {"Platform1": {"Schools": {school_code: {"Students": build_students(args.students)}}}}
+    app_module = load_app(tree)
+    client = app_module.app.test_client()
+    node_data = app_module.get_school_node_cached(school_code, "Students")
+
+    print(f"{args.students} students, {args.pages} pages of {args.limit}")
+    for order_by in ("key", "name"):
+        legacy_ms = walk(
+            lambda cursor, limit: legacy_page(app_module, node_data, order_by, cursor[0], cursor[1], limit),
+            args.pages, order_by, args.limit,
+        )
+
+        def indexed(cursor, limit):
+            params = {"schoolCode": school_code, "orderBy": order_by, "limit": limit}
+            if cursor[0] is not None:
+                params.update(startAtValue=cursor[0], startAtKey=cursor[1])
+            body = client.get("/api/nodes/Students/paged", query_string=params).get_json()
+            return body["items"], body["hasMore"]
+
+        app_module.invalidate_cached_node(school_code, "Students")
+        started = time.perf_counter()
+        indexed((None, ""), args.limit + 1)
+        build_ms = (time.perf_counter() - started) * 1000
+        indexed_ms = walk(indexed, args.pages, order_by, args.limit)
+
+        print(
+            f"  orderBy={order_by:<5} legacy {legacy_ms:>8.2f} ms/page  "
+            f"indexed {indexed_ms:>6.3f} ms/page (incl. Flask)  index build {build_ms:>7.1f} ms once per cache fill"
+        )
+
+
+if __name__ == "__main__":
+    main()
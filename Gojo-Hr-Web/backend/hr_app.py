@@ -8,7 +8,8 @@ from google.auth import exceptions as google_auth_exceptions
 import os
 import time
 from datetime import datetime, timedelta
-from functools import lru_cache
+from collections import OrderedDict
+from functools import lru_cache, wraps
 import re
 import tempfile
 from werkzeug.utils import secure_filename
@@ -240,10 +241,54 @@ if not DEFAULT_SCHOOL_CODE:
     raise RuntimeError('SCHOOL_CODE cannot be empty.')
 
 
-@lru_cache(maxsize=1)
+# Root/school-directory lookups are memoized with a TTL so a new school or a
+# schoolCodeIndex edit is picked up without restarting the process.
+SCHOOL_DIRECTORY_CACHE_TTL_SECONDS = max(5, int(os.getenv('SCHOOL_DIRECTORY_CACHE_TTL_SECONDS') or '600'))
+
+
+def _ttl_lru_cache(ttl_seconds, maxsize=1):
+    """lru_cache with expiry; exposes cache_clear() like functools.lru_cache."""
+    def decorator(fn):
+        entries = OrderedDict()
+        lock = _threading.Lock()
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with lock:
+                entry = entries.get(key)
+                if entry and (now - entry[1]) < ttl_seconds:
+                    entries.move_to_end(key)
+                    return entry[0]
+
+            value = fn(*args, **kwargs)
+            with lock:
+                entries[key] = (value, time.monotonic())
+                entries.move_to_end(key)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return value
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
+
+
+def _node_exists(node_ref):
+    # Shallow read returns only the immediate keys (or the scalar), never the subtree.
+    return node_ref.get(shallow=True) is not None
+
+
+@_ttl_lru_cache(SCHOOL_DIRECTORY_CACHE_TTL_SECONDS)
 def platform_root_ref():
     platform_ref = db.reference(PLATFORM_ROOT)
-    if platform_ref.get() is None:
+    if not _node_exists(platform_ref):
         raise RuntimeError(
             f"Missing '{PLATFORM_ROOT}' root in Realtime Database."
         )
@@ -251,12 +296,12 @@ def platform_root_ref():
     return platform_ref
 
 
-@lru_cache(maxsize=1)
+@_ttl_lru_cache(SCHOOL_DIRECTORY_CACHE_TTL_SECONDS)
 def schools_root():
     platform_ref = platform_root_ref()
 
     schools_ref = platform_ref.child(SCHOOLS_ROOT)
-    if schools_ref.get() is None:
+    if not _node_exists(schools_ref):
         raise RuntimeError(
             f"Missing '{PLATFORM_ROOT}/{SCHOOLS_ROOT}' root in Realtime Database. Existing node is required."
         )
@@ -269,7 +314,7 @@ def school_code_index_ref():
     return platform_root_ref().child('schoolCodeIndex')
 
 
-@lru_cache(maxsize=1)
+@_ttl_lru_cache(SCHOOL_DIRECTORY_CACHE_TTL_SECONDS)
 def school_code_index_map():
     index_data = school_code_index_ref().get() or {}
     return index_data if isinstance(index_data, dict) else {}
@@ -296,27 +341,36 @@ def _extract_school_shortname(school_node):
     return ''
 
 
-@lru_cache(maxsize=1)
+@_ttl_lru_cache(SCHOOL_DIRECTORY_CACHE_TTL_SECONDS)
 def school_directory_cache():
-    schools = schools_root().get() or {}
-    if not isinstance(schools, dict):
+    """School codes and shortName -> code map from shallow Schools keys,
+    schoolCodeIndex and per-school schoolInfo (never full school subtrees)."""
+    school_keys = schools_root().get(shallow=True) or {}
+    if not isinstance(school_keys, dict):
         return {
             'codes': frozenset(),
             'shortnames': {},
         }
 
-    known_codes = set()
+    known_codes = {
+        _normalize_school_code(school_code)
+        for school_code in school_keys.keys()
+        if _normalize_school_code(school_code)
+    }
     shortname_map = {}
 
-    for school_code, school_node in schools.items():
-        normalized_school_code = _normalize_school_code(school_code)
-        if not normalized_school_code:
-            continue
+    for short_key, mapped_code in school_code_index_map().items():
+        normalized_short_key = _normalize_school_code(short_key).upper()
+        normalized_mapped_code = _normalize_school_code(mapped_code)
+        if normalized_short_key and normalized_mapped_code in known_codes:
+            shortname_map.setdefault(normalized_short_key, normalized_mapped_code)
 
-        known_codes.add(normalized_school_code)
-        short_key = _extract_school_shortname(school_node)
+    indexed_codes = set(shortname_map.values())
+    for school_code in sorted(known_codes - indexed_codes):
+        school_info = schools_root().child(school_code).child('schoolInfo').get()
+        short_key = _extract_school_shortname({'schoolInfo': school_info})
         if short_key and short_key not in shortname_map:
-            shortname_map[short_key] = normalized_school_code
+            shortname_map[short_key] = school_code
 
     return {
         'codes': frozenset(known_codes),
@@ -324,17 +378,35 @@ def school_directory_cache():
     }
 
 
-@lru_cache(maxsize=1)
 def known_school_codes():
     return school_directory_cache().get('codes', frozenset())
 
 
-@lru_cache(maxsize=1)
 def school_shortname_map():
     return dict(school_directory_cache().get('shortnames', {}))
 
 
-@lru_cache(maxsize=256)
+def refresh_school_directory():
+    """Drop every memoized root/school lookup so the next call re-reads RTDB."""
+    for cached_fn in (
+        platform_root_ref,
+        schools_root,
+        school_code_index_ref,
+        school_code_index_map,
+        school_directory_cache,
+        resolve_school_code,
+        school_root_for,
+    ):
+        cached_fn.cache_clear()
+
+    directory = school_directory_cache()
+    return {
+        'schools': len(directory.get('codes', ())),
+        'shortnames': len(directory.get('shortnames', {})),
+    }
+
+
+@_ttl_lru_cache(SCHOOL_DIRECTORY_CACHE_TTL_SECONDS, maxsize=256)
 def resolve_school_code(value, default=None):
     requested_school_code = _normalize_school_code(value or default or DEFAULT_SCHOOL_CODE)
     if not requested_school_code:
@@ -407,11 +479,11 @@ def get_active_school_code(default=None):
     return school_code
 
 
-@lru_cache(maxsize=128)
+@_ttl_lru_cache(SCHOOL_DIRECTORY_CACHE_TTL_SECONDS, maxsize=128)
 def school_root_for(school_code):
     normalized_school_code = resolve_school_code(school_code, DEFAULT_SCHOOL_CODE)
     school_ref = schools_root().child(normalized_school_code)
-    if school_ref.get() is None:
+    if not _node_exists(school_ref):
         raise RuntimeError(
             f"School node '{PLATFORM_ROOT}/{SCHOOLS_ROOT}/{normalized_school_code}' does not exist. "
             "Set SCHOOL_CODE to an existing school code."
@@ -697,12 +769,7 @@ def _get_attendance_range_data(source_ref, start_date=None, end_date=None):
 
 def backfill_attendance_summaries(school_code=None, all_schools=False, overwrite=False):
     if all_schools:
-        school_nodes = schools_root().get() or {}
-        target_school_codes = sorted(
-            _normalize_school_code(code)
-            for code in school_nodes.keys()
-            if _normalize_school_code(code)
-        ) if isinstance(school_nodes, dict) else []
+        target_school_codes = sorted(known_school_codes())
     else:
         resolved_school_code = resolve_school_code(school_code, DEFAULT_SCHOOL_CODE)
         target_school_codes = [resolved_school_code] if resolved_school_code else []
@@ -3226,6 +3293,15 @@ def terminate_employee(emp_id):
     }), 200
 
 
+@app.route('/api/school-directory/refresh', methods=['POST'])
+def refresh_school_directory_endpoint():
+    try:
+        counts = refresh_school_directory()
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+    return jsonify({'ok': True, **counts})
+
+
 @app.route('/login', methods=['POST'])
 def login():
     payload = request.get_json() or {}
@@ -145,9 +145,9 @@ function AllChat() {
 
       try {
         const [studentsData, parentsData, teachersData] = await Promise.all([
-          loadSchoolStudentsNode({ rtdbBase: DB_ROOT }),
-          loadSchoolParentsNode({ rtdbBase: DB_ROOT }),
-          loadSchoolTeachersNode({ rtdbBase: DB_ROOT }),
+          loadSchoolStudentsNode({ rtdbBase: DB_ROOT, fields: "contacts" }),
+          loadSchoolParentsNode({ rtdbBase: DB_ROOT, fields: "contacts" }),
+          loadSchoolTeachersNode({ rtdbBase: DB_ROOT, fields: "contacts" }),
         ]);
 
         // Load chat summaries first so we know which contacts have actually chatted
@@ -36,8 +36,8 @@ export default function OverviewPage() {
       try {
         setLoading(true);
         const [studentsObj, parentsObj, postsObj] = await Promise.all([
-          loadSchoolStudentsNode({ rtdbBase: DB_URL }),
-          loadSchoolParentsNode({ rtdbBase: DB_URL }),
+          loadSchoolStudentsNode({ rtdbBase: DB_URL, fields: "overview" }),
+          loadSchoolParentsNode({ rtdbBase: DB_URL, fields: "count" }),
           fetchCachedJson(`${DB_URL}/posts.json`, { ttlMs: 60000 }).catch(() => ({})),
         ]);
 
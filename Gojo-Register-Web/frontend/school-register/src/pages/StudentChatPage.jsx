@@ -29,7 +29,7 @@ function StudentChatPage() {
   useEffect(() => {
     const fetchStudents = async () => {
       try {
-        const studentsData = await loadSchoolStudentsNode({ rtdbBase: DB_URL });
+        const studentsData = await loadSchoolStudentsNode({ rtdbBase: DB_URL, fields: "chat" });
 
         const studentList = Object.keys(studentsData).map(id => {
           const student = studentsData[id];
@@ -171,47 +171,53 @@ const loadNode = async ({ rtdbBase, nodePath, ttlMs, fallbackValue = {}, force =
 
 const _proxyNodeCache = new Map(); // sessionKey → { data, expiresAt }
 
-async function _loadNodeViaProxy(schoolCode, nodeName, ttlMs, sessionKey, force) {
+// `fields` is a backend preset (e.g. "overview", "chat", "contacts") or a
+// comma-separated subset of the fields those presets expose. Projected
+// responses are a few KB and revalidate with ETags, so list screens should
+// always pass one.
+async function _loadNodeViaProxy(schoolCode, nodeName, ttlMs, sessionKey, force, fields) {
+  const cacheKey = fields ? `${sessionKey}:${fields}` : sessionKey;
   if (!force) {
-    const entry = _proxyNodeCache.get(sessionKey);
+    const entry = _proxyNodeCache.get(cacheKey);
     if (entry && Date.now() < entry.expiresAt) return entry.data;
   }
   try {
-    const res = await fetch(`${BACKEND_BASE}/api/nodes/${nodeName}?schoolCode=${encodeURIComponent(schoolCode)}`);
+    const fieldsParam = fields ? `&fields=${encodeURIComponent(fields)}` : "";
+    const res = await fetch(`${BACKEND_BASE}/api/nodes/${nodeName}?schoolCode=${encodeURIComponent(schoolCode)}${fieldsParam}`);
     if (!res.ok) throw new Error(`proxy ${nodeName} ${res.status}`);
     const json = await res.json();
     const data = (json && json.data) || {};
-    _proxyNodeCache.set(sessionKey, { data, expiresAt: Date.now() + ttlMs });
+    _proxyNodeCache.set(cacheKey, { data, expiresAt: Date.now() + ttlMs });
     return data;
   } catch {
     // Fallback: direct RTDB read (still better than nothing)
-    const entry = _proxyNodeCache.get(sessionKey);
+    const entry = _proxyNodeCache.get(cacheKey);
     return entry ? entry.data : {};
   }
 }
 
-export const loadSchoolStudentsNode = ({ rtdbBase, force = false } = {}) => {
+export const loadSchoolStudentsNode = ({ rtdbBase, force = false, fields = "" } = {}) => {
   const schoolCode = extractSchoolCodeFromRtdbBase(rtdbBase);
   if (!schoolCode) return Promise.resolve({});
-  return _loadNodeViaProxy(schoolCode, "Students", DIRECTORY_TTL_MS, `${rtdbBase}:Students`, force);
+  return _loadNodeViaProxy(schoolCode, "Students", DIRECTORY_TTL_MS, `${rtdbBase}:Students`, force, fields);
 };
 
-export const loadSchoolParentsNode = ({ rtdbBase, force = false } = {}) => {
+export const loadSchoolParentsNode = ({ rtdbBase, force = false, fields = "" } = {}) => {
   const schoolCode = extractSchoolCodeFromRtdbBase(rtdbBase);
   if (!schoolCode) return Promise.resolve({});
-  return _loadNodeViaProxy(schoolCode, "Parents", DIRECTORY_TTL_MS, `${rtdbBase}:Parents`, force);
+  return _loadNodeViaProxy(schoolCode, "Parents", DIRECTORY_TTL_MS, `${rtdbBase}:Parents`, force, fields);
 };
 
-export const loadSchoolTeachersNode = ({ rtdbBase, force = false } = {}) => {
+export const loadSchoolTeachersNode = ({ rtdbBase, force = false, fields = "" } = {}) => {
   const schoolCode = extractSchoolCodeFromRtdbBase(rtdbBase);
   if (!schoolCode) return Promise.resolve({});
-  return _loadNodeViaProxy(schoolCode, "Teachers", DIRECTORY_TTL_MS, `${rtdbBase}:Teachers`, force);
+  return _loadNodeViaProxy(schoolCode, "Teachers", DIRECTORY_TTL_MS, `${rtdbBase}:Teachers`, force, fields);
 };
 
-export const loadSchoolUsersNode = ({ rtdbBase, force = false } = {}) => {
+export const loadSchoolUsersNode = ({ rtdbBase, force = false, fields = "" } = {}) => {
   const schoolCode = extractSchoolCodeFromRtdbBase(rtdbBase);
   if (!schoolCode) return Promise.resolve({});
-  return _loadNodeViaProxy(schoolCode, "Users", DIRECTORY_TTL_MS, `${rtdbBase}:Users`, force);
+  return _loadNodeViaProxy(schoolCode, "Users", DIRECTORY_TTL_MS, `${rtdbBase}:Users`, force, fields);
 };
 
 
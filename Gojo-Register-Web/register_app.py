@@ -1,17 +1,32 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import firebase_admin
 from firebase_admin import credentials, db, storage
 import os
 import sys
+import csv
+import gzip
+import hashlib
+import io
 import json
+import mimetypes
+import re
+import shutil
+import tempfile
 import uuid
 import time
 import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from werkzeug.utils import secure_filename
 from firebase_config import FIREBASE_CREDENTIALS, get_firebase_options, require_firebase_credentials
 
+try:
+    import resource
+except ImportError:  # Windows dev machines; rollover then reports no RSS figure.
+    resource = None
+
 
 app = Flask(__name__)
 CORS(app)
@@ -27,7 +42,31 @@ firebase_admin.initialize_app(cred, get_firebase_options())
 bucket = storage.bucket()
 
 PLATFORM_SCHOOLS_REF = "Platform1/Schools"
+SCHOOL_CODE_INDEX_REF = "Platform1/schoolCodeIndex"
+LOGIN_LOOKUP_WORKERS = 8
 ROLLOVER_ALLOWED_DELAYS = {3600, 21600, 43200, 86400}
+# Uniqueness indexes: <Node>/<KEY> -> userId. UsernameIndex keys match the Teacher portal.
+USERNAME_INDEX_NODE = "UsernameIndex"
+PHONE_INDEX_NODE = "PhoneIndex"
+UNIQUENESS_INDEX_META_PATH = "IndexMeta/uniqueness"
+UNIQUENESS_INDEX_BATCH_PATHS = 500
+UNIQUENESS_CLAIM_GRACE_SECONDS = 10 * 60       # a fresh claim whose Users row is not written yet
+_INDEX_KEY_UNSAFE_CHARS = re.compile(r"[.$#\[\]/]")
+_PUSH_KEY_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+_UNIQUENESS_INDEXED_SCHOOLS = set()
+# ID counters: IdCounters/<PREFIX>_<YY> holds the last sequence handed out; shared with Finance and Teacher.
+ID_COUNTERS_NODE = "IdCounters"
+ID_ALLOCATION_MAX_BLOCK = 5000
+BULK_IMPORTS_NODE = "BulkImports"
+# Bumped whenever AcademicYears or currentAcademicYear changes; the Teacher portal caches against it.
+ACADEMIC_YEAR_VERSION_FIELD = "academicYearVersion"
+BULK_IMPORT_MAX_ROWS = ID_ALLOCATION_MAX_BLOCK
+BULK_IMPORT_CHUNK_ROWS = 100                  # students (~4 paths each) per multi-path update
+BULK_IMPORT_PHOTO_WORKERS = 8
+ROLLOVER_READ_PAGE_SIZE = 200                 # children per paged read
+ROLLOVER_PREVIEW_READ_WORKERS = 16            # parallel point reads for the rollover preview count
+ROLLOVER_WRITE_BATCH_PATHS = 250              # paths per multi-path update
+ROLLOVER_WRITE_BATCH_BYTES = 4 * 1024 * 1024  # well under the 16 MB RTDB write limit
 
 # ---------------------------------------------------------------------------
 # Server-side node cache — shared across ALL registerers hitting this server.
@@ -75,6 +114,127 @@ def get_school_node_cached(school_code: str, node: str):
     return data
 
 
+# ---------------------------------------------------------------------------
+# Projected node responses — list screens ask for a named field preset and get
+# a pre-serialized (optionally gzipped) body with an ETag, cached on the node
+# cache entry so it is rebuilt whenever the node itself is refetched.
+# ---------------------------------------------------------------------------
+STUDENT_NAME_FIELDS = ("name", "firstName", "middleName", "lastName", "basicStudentInformation.name", "profileImage")
+CHAT_CONTACT_FIELDS = ("userId", "financeId", "adminId")
+NODE_FIELD_PRESETS = {
+    "Students": {
+        "overview": STUDENT_NAME_FIELDS + (
+            "userId", "grade", "section", "gender", "status", "createdAt", "registeredAt",
+        ),
+        "chat": STUDENT_NAME_FIELDS,
+        "contacts": CHAT_CONTACT_FIELDS,
+    },
+    "Parents": {
+        "count": (),
+        "contacts": CHAT_CONTACT_FIELDS,
+    },
+    "Teachers": {
+        "contacts": CHAT_CONTACT_FIELDS,
+    },
+}
+# Ad-hoc fields= lists may only pick from the paths some preset of the node already exposes.
+NODE_PROJECTABLE_FIELDS = {
+    node: frozenset(path for preset in presets.values() for path in preset)
+    for node, presets in NODE_FIELD_PRESETS.items()
+}
+PROJECTION_BLOCKED_FIELDS = {"password"}
+NODE_RESPONSE_GZIP_MIN_BYTES = 1024
+# Rendered bodies kept per node cache entry (full node plus projections).
+NODE_RESPONSE_CACHE_MAX_ENTRIES = 8
+
+
+def resolve_node_fields(node, fields_param):
+    """Return the field paths for a preset name or comma-separated list, or None for the full node.
+
+    Lists are limited to fields some preset of the node already exposes; anything else raises ValueError.
+    """
+    text = str(fields_param or "").strip()
+    if not text:
+        return None
+    preset = (NODE_FIELD_PRESETS.get(node) or {}).get(text)
+    if preset is not None:
+        return tuple(preset)
+    requested = {part.strip() for part in text.split(",") if part.strip()}
+    unknown = requested - NODE_PROJECTABLE_FIELDS.get(node, frozenset())
+    if not requested or unknown:
+        raise ValueError(f"Unsupported fields for {node}: {', '.join(sorted(unknown)) or text}")
+    return tuple(sorted(requested))
+
+
+def project_node_record(record, field_paths):
+    """Copy only field_paths (dot-separated) out of one child record; no paths means presence only."""
+    if not field_paths:
+        return True
+    if not isinstance(record, dict):
+        return record
+
+    projected = {}
+    for path in field_paths:
+        parts = path.split(".")
+        if parts[-1] in PROJECTION_BLOCKED_FIELDS:
+            continue
+        value = record
+        for part in parts:
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is None:
+            continue
+        target = projected
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return projected
+
+
+def cached_node_response(school_code, node, fields_param=None):
+    """Serve a cached node as {"success", "data"}, projected by fields=, with gzip and ETag revalidation."""
+    data = get_school_node_cached(school_code, node) or {}
+    try:
+        field_paths = resolve_node_fields(node, fields_param)
+    except ValueError as exc:
+        return jsonify({"success": False, "message": str(exc)}), 400
+    key = _cache_key(school_code, node)
+
+    with _NODE_CACHE_LOCK:
+        entry = _NODE_CACHE.get(key)
+        rendered = (entry.get("responses") or {}).get(field_paths) if entry and entry["data"] is data else None
+
+    if rendered is None:
+        payload = data
+        if field_paths is not None and isinstance(data, dict):
+            payload = {child_key: project_node_record(record, field_paths) for child_key, record in data.items()}
+        body = json.dumps({"success": True, "data": payload}, separators=(",", ":")).encode("utf-8")
+        rendered = {"body": body, "etag": hashlib.sha1(body).hexdigest(), "gzip": None}
+        with _NODE_CACHE_LOCK:
+            entry = _NODE_CACHE.get(key)
+            if entry and entry["data"] is data:
+                responses = entry.setdefault("responses", {})
+                if field_paths not in responses and len(responses) >= NODE_RESPONSE_CACHE_MAX_ENTRIES:
+                    responses.pop(next(iter(responses)))
+                responses[field_paths] = rendered
+
+    body = rendered["body"]
+    etag = rendered["etag"]
+    use_gzip = len(body) >= NODE_RESPONSE_GZIP_MIN_BYTES and "gzip" in request.accept_encodings
+    if use_gzip:
+        if rendered["gzip"] is None:
+            rendered["gzip"] = gzip.compress(body, compresslevel=6)
+        body = rendered["gzip"]
+        etag = f"{etag}-gzip"
+
+    response = app.response_class(body, mimetype="application/json")
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
 def schools_data():
     return db.reference(PLATFORM_SCHOOLS_REF).get() or {}
 
@@ -124,48 +284,220 @@ def find_school_code_for_user(user_id=None, finance_id=None):
     return None
 
 
-def generate_parent_id(school_code):
-    # Use shallow=True to download only keys (~50 KB) instead of full node data (~10 MB)
-    parents = school_ref(school_code).child("Parents").get(shallow=True) or {}
-    year_suffix = datetime.utcnow().strftime("%y")
-    prefix = "GPR"
-    max_seq = 0
+def username_index_key(username):
+    return _INDEX_KEY_UNSAFE_CHARS.sub("_", str(username or "").strip().upper())
 
-    for pid in parents.keys():
-        text = str(pid or "")
-        parts = text.split("_")
-        if len(parts) == 3 and parts[0] == prefix and parts[2] == year_suffix:
-            try:
-                seq = int(parts[1])
-                if seq > max_seq:
-                    max_seq = seq
-            except Exception:
-                continue
 
-    next_seq = max_seq + 1
-    return f"{prefix}_{str(next_seq).zfill(4)}_{year_suffix}"
+def phone_index_key(phone):
+    return _INDEX_KEY_UNSAFE_CHARS.sub("_", str(phone or "").strip())
 
 
-def generate_scoped_id(school_code, node_name, prefix):
+def user_phone(row):
+    row = row or {}
+    return str(row.get("phone") or row.get("Phone") or row.get("phoneNumber") or "").strip()
+
+
+def push_key_age_seconds(key):
+    """Age of an RTDB push key from its embedded timestamp, or None for other key formats."""
+    text = str(key or "")
+    if len(text) != 20:
+        return None
+    timestamp_ms = 0
+    for char in text[:8]:
+        position = _PUSH_KEY_CHARS.find(char)
+        if position < 0:
+            return None
+        timestamp_ms = timestamp_ms * 64 + position
+    return time.time() - timestamp_ms / 1000.0
+
+
+def generate_push_key():
+    """An RTDB-style push key made locally (8 timestamp chars + 12 random chars), no round trip."""
+    timestamp_ms = int(time.time() * 1000)
+    stamp = ""
+    for _ in range(8):
+        stamp = _PUSH_KEY_CHARS[timestamp_ms % 64] + stamp
+        timestamp_ms //= 64
+    return stamp + "".join(_PUSH_KEY_CHARS[byte % 64] for byte in os.urandom(12))
+
+
+def build_uniqueness_index_updates(users):
+    """UsernameIndex/PhoneIndex entries for a Users map; the first user (by key) holding a value wins."""
+    updates = {}
+    for user_id in sorted(users or {}):
+        row = users[user_id] if isinstance(users[user_id], dict) else {}
+        username_key = username_index_key(row.get("username"))
+        phone_key = phone_index_key(user_phone(row))
+        if username_key:
+            updates.setdefault(f"{USERNAME_INDEX_NODE}/{username_key}", str(user_id))
+        if phone_key:
+            updates.setdefault(f"{PHONE_INDEX_NODE}/{phone_key}", str(user_id))
+    return updates
+
+
+def backfill_uniqueness_indexes(school_code, dry_run=False):
+    """Build UsernameIndex/PhoneIndex for one school from its Users node; returns the entry count."""
+    users = school_ref(school_code).child("Users").get() or {}
+    updates = list(build_uniqueness_index_updates(users).items())
+    if not dry_run:
+        for start in range(0, len(updates), UNIQUENESS_INDEX_BATCH_PATHS):
+            school_ref(school_code).update(dict(updates[start:start + UNIQUENESS_INDEX_BATCH_PATHS]))
+        school_ref(school_code).child(UNIQUENESS_INDEX_META_PATH).set({
+            "backfilledAt": utc_now_iso(),
+            "users": len(users),
+            "entries": len(updates),
+        })
+        _UNIQUENESS_INDEXED_SCHOOLS.add(school_code)
+    return len(updates)
+
+
+def ensure_uniqueness_indexes(school_code):
+    """Backfill a school that predates the indexes once; afterwards this is a no-op."""
+    if school_code in _UNIQUENESS_INDEXED_SCHOOLS:
+        return
+    if school_ref(school_code).child(UNIQUENESS_INDEX_META_PATH).get():
+        _UNIQUENESS_INDEXED_SCHOOLS.add(school_code)
+        return
+    backfill_uniqueness_indexes(school_code)
+
+
+def claim_index_entry(school_code, node, key, user_id, holder_matches):
+    """Atomically point <node>/<key> at user_id.
+
+    Returns True when claimed. An entry held by another user is only taken
+    over when that user's row no longer carries the value (renamed or
+    deleted); a fresh claim whose Users row is still being written counts
+    as live.
+    """
+    entry_ref = school_ref(school_code).child(f"{node}/{key}")
+    seen = {"holder": None}
+
+    def claim(current):
+        if current in (None, "", user_id):
+            return user_id
+        seen["holder"] = current
+        return current
+
+    if entry_ref.transaction(claim) == user_id:
+        return True
+
+    holder_id = str(seen["holder"] or "")
+    holder_row = school_ref(school_code).child(f"Users/{holder_id}").get()
+    if holder_row:
+        if holder_matches(holder_row):
+            return False
+    else:
+        holder_age = push_key_age_seconds(holder_id)
+        if holder_age is not None and holder_age < UNIQUENESS_CLAIM_GRACE_SECONDS:
+            return False
+
+    def take_over(current):
+        if current in (None, "", holder_id, user_id):
+            return user_id
+        return current
+
+    return entry_ref.transaction(take_over) == user_id
+
+
+def release_index_entry(school_code, node, key, user_id):
+    if not key:
+        return
+    school_ref(school_code).child(f"{node}/{key}").transaction(
+        lambda current: None if current == user_id else current
+    )
+
+
+def claim_username(school_code, username, user_id):
+    target = username_index_key(username)
+    return bool(target) and claim_index_entry(
+        school_code, USERNAME_INDEX_NODE, target, user_id,
+        lambda row: username_index_key(row.get("username")) == target,
+    )
+
+
+def claim_phone(school_code, phone, user_id):
+    target = phone_index_key(phone)
+    return bool(target) and claim_index_entry(
+        school_code, PHONE_INDEX_NODE, target, user_id,
+        lambda row: phone_index_key(user_phone(row)) == target,
+    )
+
+
+def claim_account_identity(school_code, user_id, username, phone):
+    """Claim username and phone for a new Users row; returns an error message or None."""
+    ensure_uniqueness_indexes(school_code)
+    if not claim_username(school_code, username, user_id):
+        return "Username already exists."
+    if phone and not claim_phone(school_code, phone, user_id):
+        release_index_entry(school_code, USERNAME_INDEX_NODE, username_index_key(username), user_id)
+        return "Phone already exists."
+    return None
+
+
+def release_account_identity(school_code, user_id, username, phone):
+    release_index_entry(school_code, USERNAME_INDEX_NODE, username_index_key(username), user_id)
+    release_index_entry(school_code, PHONE_INDEX_NODE, phone_index_key(phone), user_id)
+
+
+def id_year_suffix():
+    return datetime.utcnow().strftime("%y")
+
+
+def format_scoped_id(prefix, seq, year_suffix):
+    return f"{prefix}_{str(seq).zfill(4)}_{year_suffix}"
+
+
+def max_scoped_sequence(school_code, node_name, prefix, year_suffix):
     # Use shallow=True to download only keys (~50 KB) instead of full node data (~10 MB)
     node = school_ref(school_code).child(node_name).get(shallow=True) or {}
-    year_suffix = datetime.utcnow().strftime("%y")
     max_seq = 0
 
     if isinstance(node, dict):
         for key in node.keys():
-            text = str(key or "")
-            parts = text.split("_")
+            parts = str(key or "").split("_")
             if len(parts) == 3 and parts[0] == prefix and parts[2] == year_suffix:
                 try:
-                    seq = int(parts[1])
-                    if seq > max_seq:
-                        max_seq = seq
+                    max_seq = max(max_seq, int(parts[1]))
                 except Exception:
                     continue
 
-    next_seq = max_seq + 1
-    return f"{prefix}_{str(next_seq).zfill(4)}_{year_suffix}"
+    return max_seq
+
+
+def allocate_scoped_ids(school_code, node_name, prefix, count=1):
+    """Reserve `count` consecutive <prefix>_<seq>_<YY> ids in one transaction.
+
+    The counter lives at IdCounters/<prefix>_<YY>. It is seeded from a shallow
+    key scan of node_name the first time a (school, prefix, year) is used;
+    after that an allocation is a single transaction, and concurrent callers
+    (including the Finance and Teacher portals) never receive the same id.
+    """
+    count = int(count)
+    if count < 1 or count > ID_ALLOCATION_MAX_BLOCK:
+        raise ValueError(f"count must be between 1 and {ID_ALLOCATION_MAX_BLOCK}")
+
+    year_suffix = id_year_suffix()
+    counter_ref = school_ref(school_code).child(f"{ID_COUNTERS_NODE}/{prefix}_{year_suffix}")
+    seed = {}
+
+    def reserve(current):
+        if current is None:
+            # Only reached once per counter; the scan result is reused on transaction retries.
+            if "value" not in seed:
+                seed["value"] = max_scoped_sequence(school_code, node_name, prefix, year_suffix)
+            current = seed["value"]
+        return int(current) + count
+
+    last_seq = int(counter_ref.transaction(reserve))
+    return [format_scoped_id(prefix, seq, year_suffix) for seq in range(last_seq - count + 1, last_seq + 1)]
+
+
+def generate_scoped_id(school_code, node_name, prefix):
+    return allocate_scoped_ids(school_code, node_name, prefix)[0]
+
+
+def generate_parent_id(school_code):
+    return generate_scoped_id(school_code, "Parents", "GPR")
 
 
 def generate_temp_password(length=8):
@@ -225,6 +557,10 @@ def get_school_code_from_request():
     ).strip()
 
 
+def academic_year_version():
+    return int(time.time() * 1000)
+
+
 def utc_now_iso():
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
@@ -259,8 +595,49 @@ def rollover_history_ref(school_code):
     return rollover_control_ref(school_code).child("History")
 
 
-def clone_payload(value):
-    return json.loads(json.dumps(value))
+def process_max_rss_bytes():
+    """High-water resident set size of this worker process (0 where resource is unavailable).
+
+    Process-wide, so it includes whatever else the worker served, not just the rollover.
+    """
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(max_rss if sys.platform == "darwin" else max_rss * 1024)
+
+
+def rtdb_key_order(key):
+    """Sort key matching RTDB orderByKey: 32-bit integer keys first, then strings."""
+    text = str(key)
+    try:
+        number = int(text)
+    except ValueError:
+        number = None
+    if number is not None and str(number) == text and -2 ** 31 <= number < 2 ** 31:
+        return (0, number, "")
+    return (1, 0, text)
+
+
+def iter_node_children(ref, page_size=ROLLOVER_READ_PAGE_SIZE):
+    """Yield (key, value) for every child of ref, reading page_size children per request."""
+    start_key = None
+    while True:
+        query = ref.order_by_key()
+        if start_key is not None:
+            query = query.start_at(start_key)
+        limit = page_size if start_key is None else page_size + 1
+        page = query.limit_to_first(limit).get() or {}
+        if isinstance(page, list):
+            page = {str(index): value for index, value in enumerate(page) if value is not None}
+
+        rows = [(str(key), value) for key, value in page.items() if str(key) != start_key]
+        rows.sort(key=lambda row: rtdb_key_order(row[0]))
+        for key, value in rows:
+            yield key, value
+
+        if len(page) < limit or not rows:
+            return
+        start_key = rows[-1][0]
 
 
 def get_registerer_user(school_code, actor_user_id):
@@ -302,33 +679,67 @@ def get_current_academic_year(school_node):
     return ""
 
 
-def build_rollover_guard_preview(school_node, current_year, target_year):
-    students = (school_node or {}).get("Students") or {}
-    parents = (school_node or {}).get("Parents") or {}
-    class_marks = (school_node or {}).get("ClassMarks") or {}
-    lesson_plans = (school_node or {}).get("LessonPlans") or {}
+def count_current_year_students(school_code, current_year):
+    """Count Students in current_year without downloading any student record twice.
 
-    current_year_student_count = 0
-    for student_node in students.values():
-        student = student_node or {}
-        basic = student.get("basicStudentInformation") or {}
-        student_year = normalize_year_key(student.get("academicYear") or basic.get("academicYear"))
-        if student_year == current_year:
-            current_year_student_count += 1
+    One range query on academicYear covers both stored spellings (2025/2026 and
+    2025_2026 sort next to each other). Only the students it did not match are
+    checked further, with point reads of academicYear and, where that is empty,
+    basicStudentInformation/academicYear. If the query is rejected (no .indexOn
+    rule yet) every student gets those point reads instead of a full download.
+    """
+    students_ref = school_ref(school_code).child("Students")
+    student_ids = students_ref.get(shallow=True) or {}
+    if not isinstance(student_ids, dict):
+        return 0
 
-    lesson_plan_archive = clone_payload(lesson_plans)
-    if isinstance(lesson_plan_archive, dict):
-        lesson_plan_archive.pop("StudentWhatLearn", None)
+    spellings = sorted({current_year, year_label_from_key(current_year)} - {""})
+    matched = set()
+    try:
+        rows = students_ref.order_by_child("academicYear").start_at(spellings[0]).end_at(spellings[-1]).get() or {}
+    except Exception:
+        rows = {}
+    for student_id, student_node in (rows.items() if isinstance(rows, dict) else []):
+        if normalize_year_key((student_node or {}).get("academicYear")) == current_year:
+            matched.add(student_id)
+
+    def point_read_in_year(student_id):
+        student_ref = students_ref.child(student_id)
+        year = student_ref.child("academicYear").get() or student_ref.child("basicStudentInformation/academicYear").get()
+        return normalize_year_key(year) == current_year
+
+    remaining = [student_id for student_id in student_ids if student_id not in matched]
+    if remaining:
+        with ThreadPoolExecutor(max_workers=min(ROLLOVER_PREVIEW_READ_WORKERS, len(remaining))) as executor:
+            matched.update(student_id for student_id, in_year in zip(remaining, executor.map(point_read_in_year, remaining)) if in_year)
+    return len(matched)
+
+
+def count_node_children(school_code, node_name, exclude=()):
+    keys = school_ref(school_code).child(node_name).get(shallow=True) or {}
+    if not isinstance(keys, dict):
+        return 0
+    return sum(1 for key in keys if key not in exclude)
+
+
+def build_rollover_guard_preview(school_code, current_year, target_year):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        students = executor.submit(count_current_year_students, school_code, current_year)
+        parents = executor.submit(count_node_children, school_code, "Parents")
+        class_marks = executor.submit(count_node_children, school_code, "ClassMarks")
+        lesson_plans = executor.submit(count_node_children, school_code, "LessonPlans", ("StudentWhatLearn",))
+
+        archive_counts = {
+            "students": students.result(),
+            "parents": parents.result(),
+            "classMarks": class_marks.result(),
+            "lessonPlans": lesson_plans.result(),
+        }
 
     return {
         "fromAcademicYear": current_year,
         "toAcademicYear": target_year,
-        "archiveCounts": {
-            "students": current_year_student_count,
-            "parents": len(parents or {}),
-            "classMarks": len(class_marks or {}),
-            "lessonPlans": len(lesson_plan_archive or {}),
-        },
+        "archiveCounts": archive_counts,
         "deleteRoots": [
             "Students",
             "Parents",
@@ -365,6 +776,7 @@ def build_rollover_guard_preview(school_node, current_year, target_year):
 @app.route("/register/parent", methods=["POST"])
 @app.route("/api/register/parent", methods=["POST"])
 def register_parent():
+    claimed_identity = None
     try:
         name = (request.form.get("name") or "").strip()
         username = (request.form.get("username") or "").strip()
@@ -391,24 +803,21 @@ def register_parent():
         parents_ref = school_ref(school_code).child("Parents")
         students_ref = school_ref(school_code).child("Students")
 
-        users = users_ref.get() or {}
-        for uid, u in users.items():
-            row = u or {}
-            if str(row.get("username") or "").lower() == username.lower():
-                return jsonify({"success": False, "message": "Username already exists."}), 400
-            existing_phone = str(row.get("phone") or row.get("Phone") or row.get("phoneNumber") or "").strip()
-            if existing_phone and existing_phone == phone:
-                return jsonify({"success": False, "message": "Phone already exists."}), 400
+        new_user_ref = users_ref.push()
+        user_id = new_user_ref.key
+
+        identity_error = claim_account_identity(school_code, user_id, username, phone)
+        if identity_error:
+            return jsonify({"success": False, "message": identity_error}), 400
+        claimed_identity = (school_code, user_id, username, phone)
 
         students_data = students_ref.get() or {}
         for sid in student_ids:
             if sid not in students_data:
+                release_account_identity(*claimed_identity)
                 return jsonify({"success": False, "message": f"Student not found: {sid}"}), 400
 
         profile_url = "/default-profile.png"
-
-        new_user_ref = users_ref.push()
-        user_id = new_user_ref.key
         parent_id = generate_parent_id(school_code)
 
         user_payload = {
@@ -423,6 +832,7 @@ def register_parent():
             "schoolCode": school_code,
         }
         new_user_ref.set(user_payload)
+        claimed_identity = None
 
         children_payload = {}
         for idx, sid in enumerate(student_ids):
@@ -460,47 +870,154 @@ def register_parent():
 
         return jsonify({"success": True, "message": "Parent registered successfully", "parentId": parent_id, "userId": user_id}), 200
     except Exception as e:
+        if claimed_identity:
+            # The Users row was never written, so free the username/phone for a retry.
+            release_account_identity(*claimed_identity)
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+def upload_public_blob(object_name, file_obj, content_type=None):
+    blob = bucket.blob(object_name)
+    blob.upload_from_file(file_obj, content_type=content_type)
+    blob.make_public()
+    return blob.public_url
+
+
+STUDENT_FORM_FIELDS = (
+    "name", "firstName", "middleName", "lastName", "grade", "section", "email", "phone",
+    "gender", "dob", "admissionDate", "previousSchool", "nationalIdNumber", "region", "city",
+    "subCity", "kebele", "houseNumber", "registrationFeePaid", "hasDiscount", "discountAmount",
+    "paymentPlanType", "transportService", "bloodType", "medicalCondition", "emergencyContactName",
+    "emergencyPhone", "stream", "specialProgram", "languageOption", "electiveSubjects", "status",
+    "academicYear", "profileImage",
+)
+
+
+def read_student_fields(fields):
+    """Normalize a student registration form (or one bulk-import row) into plain values."""
+    values = {key: str(fields.get(key) or "").strip() for key in STUDENT_FORM_FIELDS}
+    values["password"] = str(fields.get("password") or "")
+    values["role"] = str(fields.get("role") or "student").strip() or "student"
+    values["studentId"] = str(fields.get("studentNumber") or fields.get("studentId") or "").strip()
+    values["status"] = values["status"] or "active"
+    values["isActive"] = str(fields.get("isActive") or "true").strip().lower() in ("1", "true", "yes", "y", "on")
+    if not values["name"]:
+        values["name"] = " ".join([v for v in [values["firstName"], values["middleName"], values["lastName"]] if v]).strip()
+    return values
+
+
+def resolve_registration_academic_year(school_code, requested_year=None):
+    school_info = school_ref(school_code).child("schoolInfo").get() or {}
+    active_academic_year = normalize_year_key((school_info or {}).get("currentAcademicYear"))
+    return (
+        active_academic_year
+        or normalize_year_key(requested_year)
+        or f"{datetime.utcnow().year - 1}_{datetime.utcnow().year}"
+    )
+
+
+def build_student_records(values, school_code, student_id, user_id, academic_year, profile_url,
+                          national_id_image_url, registration_time, parent_guardian_info=()):
+    """Users and Students payloads for one student; the username is always the studentId."""
+    user_payload = {
+        "userId": user_id,
+        "name": values["name"],
+        "username": student_id,
+        "password": values["password"],
+        "email": values["email"],
+        "phone": values["phone"],
+        "gender": values["gender"],
+        "dob": values["dob"],
+        "profileImage": profile_url,
+        "role": "student",
+        "isActive": values["isActive"],
+        "schoolCode": school_code,
+        "studentId": student_id,
+        "nationalIdNumber": values["nationalIdNumber"],
+        "nationalIdImage": national_id_image_url,
+        "createdAt": registration_time,
+    }
+    student_payload = {
+        "studentId": student_id,
+        "userId": user_id,
+        "grade": values["grade"],
+        "section": values["section"],
+        "dob": values["dob"],
+        "status": values["status"],
+        "academicYear": academic_year,
+        "name": values["name"],
+        "gender": values["gender"],
+        "registeredAt": registration_time,
+        "createdAt": registration_time,
+        "admissionDate": values["admissionDate"],
+        "previousSchool": values["previousSchool"],
+        "nationalIdNumber": values["nationalIdNumber"],
+        "nationalIdImage": national_id_image_url,
+        "profileImage": profile_url,
+        "basicStudentInformation": {
+            "studentId": student_id,
+            "firstName": values["firstName"],
+            "middleName": values["middleName"],
+            "lastName": values["lastName"],
+            "name": values["name"],
+            "gender": values["gender"],
+            "dob": values["dob"],
+            "admissionDate": values["admissionDate"],
+            "academicYear": academic_year,
+            "grade": values["grade"],
+            "section": values["section"],
+            "previousSchool": values["previousSchool"],
+            "status": values["status"],
+            "studentPhoto": profile_url,
+            "nationalIdNumber": values["nationalIdNumber"],
+            "nationalIdImage": national_id_image_url,
+        },
+        "parentGuardianInformation": {
+            "parents": list(parent_guardian_info),
+        },
+        "addressInformation": {
+            "region": values["region"],
+            "city": values["city"],
+            "subCity": values["subCity"],
+            "kebele": values["kebele"],
+            "houseNumber": values["houseNumber"],
+        },
+        "financeInformation": {
+            "registrationFeePaid": values["registrationFeePaid"],
+            "hasDiscount": values["hasDiscount"],
+            "discountAmount": values["discountAmount"],
+            "paymentPlanType": values["paymentPlanType"],
+            "transportService": values["transportService"],
+        },
+        "healthEmergency": {
+            "bloodType": values["bloodType"],
+            "medicalCondition": values["medicalCondition"],
+            "emergencyContactName": values["emergencyContactName"],
+            "emergencyPhone": values["emergencyPhone"],
+        },
+        "academicSetup": {
+            "stream": values["stream"],
+            "specialProgram": values["specialProgram"],
+            "languageOption": values["languageOption"],
+            "electiveSubjects": values["electiveSubjects"],
+        },
+        "systemAccountInformation": {
+            "username": student_id,
+            "temporaryPassword": values["password"],
+            "isActive": values["isActive"],
+            "role": values["role"],
+            "userId": user_id,
+        },
+    }
+    return user_payload, student_payload
+
+
 @app.route("/register/student", methods=["POST"])
 @app.route("/api/register/student", methods=["POST"])
 def register_student():
+    claimed_identity = None
     try:
-        name = (request.form.get("name") or "").strip()
-        first_name = (request.form.get("firstName") or "").strip()
-        middle_name = (request.form.get("middleName") or "").strip()
-        last_name = (request.form.get("lastName") or "").strip()
-        username = (request.form.get("username") or "").strip()
-        password = request.form.get("password") or ""
-        grade = (request.form.get("grade") or "").strip()
-        section = (request.form.get("section") or "").strip()
-        email = (request.form.get("email") or "").strip()
-        phone = (request.form.get("phone") or "").strip()
-        gender = (request.form.get("gender") or "").strip()
-        dob = (request.form.get("dob") or "").strip()
-        admission_date = (request.form.get("admissionDate") or "").strip()
-        previous_school = (request.form.get("previousSchool") or "").strip()
-        national_id_number = (request.form.get("nationalIdNumber") or "").strip()
-        region = (request.form.get("region") or "").strip()
-        city = (request.form.get("city") or "").strip()
-        sub_city = (request.form.get("subCity") or "").strip()
-        kebele = (request.form.get("kebele") or "").strip()
-        house_number = (request.form.get("houseNumber") or "").strip()
-        registration_fee_paid = (request.form.get("registrationFeePaid") or "").strip()
-        has_discount = (request.form.get("hasDiscount") or "").strip()
-        discount_amount = (request.form.get("discountAmount") or "").strip()
-        payment_plan_type = (request.form.get("paymentPlanType") or "").strip()
-        transport_service = (request.form.get("transportService") or "").strip()
-        blood_type = (request.form.get("bloodType") or "").strip()
-        medical_condition = (request.form.get("medicalCondition") or "").strip()
-        emergency_contact_name = (request.form.get("emergencyContactName") or "").strip()
-        emergency_phone = (request.form.get("emergencyPhone") or "").strip()
-        stream = (request.form.get("stream") or "").strip()
-        special_program = (request.form.get("specialProgram") or "").strip()
-        language_option = (request.form.get("languageOption") or "").strip()
-        elective_subjects = (request.form.get("electiveSubjects") or "").strip()
-        student_role = (request.form.get("role") or "student").strip() or "student"
+        values = read_student_fields(request.form)
         school_code = (request.form.get("schoolCode") or request.args.get("schoolCode") or "").strip()
         profile_file = request.files.get("studentPhoto") or request.files.get("profile")
         student_national_id_file = request.files.get("studentNationalIdImage")
@@ -508,48 +1025,42 @@ def register_student():
         if not school_code:
             return jsonify({"success": False, "message": "schoolCode is required"}), 400
 
-        if not name:
-            name = " ".join([v for v in [first_name, middle_name, last_name] if v]).strip()
+        if not values["password"]:
+            values["password"] = generate_temp_password(8)
 
-        if not password:
-            password = generate_temp_password(8)
-
-        if not name or not grade or not section:
+        if not values["name"] or not values["grade"] or not values["section"]:
             return jsonify({"success": False, "message": "Name, grade and section are required."}), 400
 
         users_ref = school_ref(school_code).child("Users")
         students_ref = school_ref(school_code).child("Students")
 
-        provided_student_id = (request.form.get("studentNumber") or request.form.get("studentId") or "").strip()
-        student_id = provided_student_id or generate_scoped_id(school_code, "Students", "GES")
+        student_id = values["studentId"] or generate_scoped_id(school_code, "Students", "GES")
 
         # For students, keep username aligned to studentId in Users node
         username = student_id
+        phone = values["phone"]
 
-        users = users_ref.get() or {}
-        for _, u in users.items():
-            row = u or {}
-            if str(row.get("username") or "").lower() == username.lower():
-                return jsonify({"success": False, "message": "Username already exists."}), 400
-            existing_phone = str(row.get("phone") or row.get("Phone") or row.get("phoneNumber") or "").strip()
-            if phone and existing_phone and existing_phone == phone:
-                return jsonify({"success": False, "message": "Phone already exists."}), 400
+        new_user_ref = users_ref.push()
+        user_id = new_user_ref.key
+
+        identity_error = claim_account_identity(school_code, user_id, username, phone)
+        if identity_error:
+            return jsonify({"success": False, "message": identity_error}), 400
+        claimed_identity = (school_code, user_id, username, phone)
 
         # Prevent duplicate studentId keys
         existing_student = students_ref.child(student_id).get()
         if existing_student:
+            release_account_identity(*claimed_identity)
             return jsonify({"success": False, "message": "Student ID already exists."}), 400
 
-        profile_url = (request.form.get("profileImage") or "").strip() or "/default-profile.png"
+        profile_url = values["profileImage"] or "/default-profile.png"
         if profile_file:
             try:
                 safe_student_key = (student_id or "student").replace("/", "_")
                 safe_filename = os.path.basename(profile_file.filename or "photo.jpg")
                 object_name = f"students/{safe_student_key}_{int(datetime.utcnow().timestamp())}_{safe_filename}"
-                blob = bucket.blob(object_name)
-                blob.upload_from_file(profile_file, content_type=profile_file.content_type)
-                blob.make_public()
-                profile_url = blob.public_url
+                profile_url = upload_public_blob(object_name, profile_file, profile_file.content_type)
             except Exception:
                 # keep default/fallback profile image URL if upload fails
                 pass
@@ -560,43 +1071,12 @@ def register_student():
                 safe_student_key = (student_id or "student").replace("/", "_")
                 safe_filename = os.path.basename(student_national_id_file.filename or "nid.jpg")
                 object_name = f"national_ids/students/{safe_student_key}_{int(datetime.utcnow().timestamp())}_{safe_filename}"
-                blob = bucket.blob(object_name)
-                blob.upload_from_file(student_national_id_file, content_type=student_national_id_file.content_type)
-                blob.make_public()
-                national_id_image_url = blob.public_url
+                national_id_image_url = upload_public_blob(
+                    object_name, student_national_id_file, student_national_id_file.content_type
+                )
             except Exception:
                 national_id_image_url = ""
 
-        is_active_raw = str(request.form.get("isActive") or "true").strip().lower()
-        is_active = is_active_raw in ("1", "true", "yes", "y", "on")
-
-        status = (request.form.get("status") or "active").strip() or "active"
-
-        new_user_ref = users_ref.push()
-        user_id = new_user_ref.key
-
-        registration_time = datetime.utcnow().isoformat()
-
-        user_payload = {
-            "userId": user_id,
-            "name": name,
-            "username": username,
-            "password": password,
-            "email": email,
-            "phone": phone,
-            "gender": gender,
-            "dob": dob,
-            "profileImage": profile_url,
-            "role": "student",
-            "isActive": is_active,
-            "schoolCode": school_code,
-            "studentId": student_id,
-            "nationalIdNumber": national_id_number,
-            "nationalIdImage": national_id_image_url,
-            "createdAt": registration_time,
-        }
-        new_user_ref.set(user_payload)
-
         parents_raw = request.form.get("parents") or "[]"
         try:
             parents_list = json.loads(parents_raw)
@@ -626,82 +1106,15 @@ def register_student():
                 },
             })
 
-        requested_academic_year = normalize_year_key(request.form.get("academicYear"))
-        school_info = school_ref(school_code).child("schoolInfo").get() or {}
-        active_academic_year = normalize_year_key((school_info or {}).get("currentAcademicYear"))
-        academic_year = active_academic_year or requested_academic_year or f"{datetime.utcnow().year - 1}_{datetime.utcnow().year}"
-        student_payload = {
-            "studentId": student_id,
-            "userId": user_id,
-            "grade": grade,
-            "section": section,
-            "dob": dob,
-            "status": status,
-            "academicYear": academic_year,
-            "name": name,
-            "gender": gender,
-            "registeredAt": registration_time,
-            "createdAt": registration_time,
-            "admissionDate": admission_date,
-            "previousSchool": previous_school,
-            "nationalIdNumber": national_id_number,
-            "nationalIdImage": national_id_image_url,
-            "profileImage": profile_url,
-            "basicStudentInformation": {
-                "studentId": student_id,
-                "firstName": first_name,
-                "middleName": middle_name,
-                "lastName": last_name,
-                "name": name,
-                "gender": gender,
-                "dob": dob,
-                "admissionDate": admission_date,
-                "academicYear": academic_year,
-                "grade": grade,
-                "section": section,
-                "previousSchool": previous_school,
-                "status": status,
-                "studentPhoto": profile_url,
-                "nationalIdNumber": national_id_number,
-                "nationalIdImage": national_id_image_url,
-            },
-            "parentGuardianInformation": {
-                "parents": parent_guardian_info,
-            },
-            "addressInformation": {
-                "region": region,
-                "city": city,
-                "subCity": sub_city,
-                "kebele": kebele,
-                "houseNumber": house_number,
-            },
-            "financeInformation": {
-                "registrationFeePaid": registration_fee_paid,
-                "hasDiscount": has_discount,
-                "discountAmount": discount_amount,
-                "paymentPlanType": payment_plan_type,
-                "transportService": transport_service,
-            },
-            "healthEmergency": {
-                "bloodType": blood_type,
-                "medicalCondition": medical_condition,
-                "emergencyContactName": emergency_contact_name,
-                "emergencyPhone": emergency_phone,
-            },
-            "academicSetup": {
-                "stream": stream,
-                "specialProgram": special_program,
-                "languageOption": language_option,
-                "electiveSubjects": elective_subjects,
-            },
-            "systemAccountInformation": {
-                "username": username,
-                "temporaryPassword": password,
-                "isActive": is_active,
-                "role": student_role,
-                "userId": user_id,
-            },
-        }
+        academic_year = resolve_registration_academic_year(school_code, values["academicYear"])
+        registration_time = datetime.utcnow().isoformat()
+        user_payload, student_payload = build_student_records(
+            values, school_code, student_id, user_id, academic_year,
+            profile_url, national_id_image_url, registration_time, parent_guardian_info,
+        )
+        new_user_ref.set(user_payload)
+        claimed_identity = None
+
         students_ref.child(student_id).set(student_payload)
 
         # Optional parent records from student registration payload
@@ -757,15 +1170,13 @@ def register_student():
             parent_user_ref = users_ref.push()
             parent_user_id = parent_user_ref.key
 
-            # Ensure parent username is unique in Users
-            all_users_map = users_ref.get() or {}
-            existing_usernames = {str((u or {}).get("username") or "").lower() for u in all_users_map.values()}
-            if parent_username.lower() in existing_usernames:
-                parent_username = f"{parent_id}_{idx + 1}"
-                suffix = 1
-                while parent_username.lower() in existing_usernames:
-                    suffix += 1
-                    parent_username = f"{parent_id}_{idx + 1}_{suffix}"
+            # Ensure parent username is unique in Users by claiming it in UsernameIndex
+            attempt = 0
+            while not claim_username(school_code, parent_username, parent_user_id):
+                attempt += 1
+                parent_username = f"{parent_id}_{idx + 1}" if attempt == 1 else f"{parent_id}_{idx + 1}_{attempt}"
+            if parent_phone:
+                claim_phone(school_code, parent_phone, parent_user_id)
 
             parent_user_payload = {
                 "userId": parent_user_id,
@@ -842,12 +1253,335 @@ def register_student():
             "userId": user_id,
         }), 200
     except Exception as e:
+        if claimed_identity:
+            # The Users row was never written, so free the username/phone for a retry.
+            release_account_identity(*claimed_identity)
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+def load_bulk_student_rows(upload, payload):
+    """Rows from an uploaded CSV/JSON file, a `rows` form field or a JSON body."""
+    if upload is not None:
+        text = upload.read().decode("utf-8-sig")
+        is_json = (upload.filename or "").lower().endswith(".json") or text.lstrip().startswith(("[", "{"))
+    else:
+        raw_rows = payload.get("rows") if payload else request.form.get("rows")
+        text = json.dumps(raw_rows) if isinstance(raw_rows, list) else str(raw_rows or "")
+        is_json = True
+
+    if is_json:
+        try:
+            data = json.loads(text or "[]")
+        except ValueError:
+            raise ValueError("Import file is not valid JSON.")
+        if isinstance(data, dict):
+            data = data.get("rows") or data.get("students") or []
+        rows = data if isinstance(data, list) else []
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    cleaned = []
+    for row in rows:
+        if not isinstance(row, dict):
+            raise ValueError("Every import row must be an object.")
+        cleaned.append({str(key).strip(): value for key, value in row.items() if key is not None and str(key).strip()})
+    return cleaned
+
+
+def bulk_import_row_key(index):
+    # Non-numeric keys so RTDB never turns the rows map into an array.
+    return f"row_{index:05d}"
+
+
+def bulk_import_photo_name(row, values, photo_names):
+    requested = str(row.get("photo") or row.get("studentPhoto") or "").strip()
+    if requested:
+        return photo_names.get(os.path.basename(requested).lower()), requested
+    if values["studentId"]:
+        for extension in (".jpg", ".jpeg", ".png", ".webp"):
+            match = photo_names.get(f"{values['studentId']}{extension}".lower())
+            if match:
+                return match, ""
+    return None, ""
+
+
+def validate_bulk_student_rows(school_code, rows, photo_names, planned_rows):
+    """Check every row before anything is written; returns (values per row, row errors).
+
+    Rows already planned by an earlier attempt of the same import keep their
+    ids and skip the duplicate checks, which their own writes would trip.
+    """
+    values_list = [read_student_fields(row) for row in rows]
+    errors = []
+    needs_lookup = any(
+        (values["studentId"] or values["phone"]) and bulk_import_row_key(index) not in planned_rows
+        for index, values in enumerate(values_list)
+    )
+    existing_students, taken_usernames, taken_phones = {}, {}, {}
+    if needs_lookup:
+        ensure_uniqueness_indexes(school_code)
+        existing_students = school_ref(school_code).child("Students").get(shallow=True) or {}
+        taken_usernames = school_ref(school_code).child(USERNAME_INDEX_NODE).get(shallow=True) or {}
+        taken_phones = school_ref(school_code).child(PHONE_INDEX_NODE).get(shallow=True) or {}
+
+    seen_ids, seen_phones = {}, {}
+    for index, (row, values) in enumerate(zip(rows, values_list)):
+        row_errors = []
+        planned = bulk_import_row_key(index) in planned_rows
+        if not values["name"] or not values["grade"] or not values["section"]:
+            row_errors.append("Name, grade and section are required.")
+        if str(row.get("parents") or "").strip() not in ("", "[]"):
+            row_errors.append("Parents are not imported in bulk; register them with /api/register/parent.")
+
+        student_id = values["studentId"]
+        if student_id:
+            if student_id in seen_ids:
+                row_errors.append(f"Student ID repeats row {seen_ids[student_id] + 1}.")
+            seen_ids.setdefault(student_id, index)
+            if not planned and (student_id in existing_students or username_index_key(student_id) in taken_usernames):
+                row_errors.append("Student ID already exists.")
+
+        phone_key = phone_index_key(values["phone"])
+        if phone_key:
+            if phone_key in seen_phones:
+                row_errors.append(f"Phone repeats row {seen_phones[phone_key] + 1}.")
+            seen_phones.setdefault(phone_key, index)
+            if not planned and phone_key in taken_phones:
+                row_errors.append("Phone already exists.")
+
+        photo_member, requested_photo = bulk_import_photo_name(row, values, photo_names)
+        if requested_photo and not photo_member:
+            row_errors.append(f"Photo {requested_photo} is not in the photos zip.")
+        values["photoMember"] = photo_member
+
+        if row_errors:
+            errors.append({"row": index + 1, "studentId": student_id, "errors": row_errors})
+
+    return values_list, errors
+
+
+def upload_bulk_student_photo(student_id, member_name, content):
+    safe_student_key = (student_id or "student").replace("/", "_")
+    safe_filename = os.path.basename(member_name or "photo.jpg")
+    object_name = f"students/{safe_student_key}_{int(datetime.utcnow().timestamp())}_{safe_filename}"
+    content_type = mimetypes.guess_type(safe_filename)[0] or "image/jpeg"
+    return upload_public_blob(object_name, io.BytesIO(content), content_type)
+
+
+@app.route("/register/students/bulk", methods=["POST"])
+@app.route("/api/register/students/bulk", methods=["POST"])
+def bulk_register_students():
+    """Register many students from CSV/JSON rows (plus an optional photos zip).
+
+    Every row is validated before any write, new studentIds come from one
+    IdCounters block, and rows are written BULK_IMPORT_CHUNK_ROWS at a time
+    with multi-path updates. Each row's UsernameIndex/PhoneIndex entries are
+    claimed with a transaction first; a row that loses a claim to a
+    concurrent registration is reported as a conflict and left for a later
+    resume. The response is NDJSON, one line per row. The
+    plan is kept under BulkImports/<importId>; posting the same file again
+    with that importId resumes after the last written chunk.
+    """
+    payload = request.get_json(silent=True) or {}
+    school_code = (request.form.get("schoolCode") or payload.get("schoolCode") or request.args.get("schoolCode") or "").strip()
+    import_id = str(request.form.get("importId") or payload.get("importId") or "").strip()
+    dry_run = str(request.form.get("dryRun") or payload.get("dryRun") or "").strip().lower() in ("1", "true", "yes")
+
+    if not school_code:
+        return jsonify({"success": False, "message": "schoolCode is required"}), 400
+    if import_id and not re.fullmatch(r"[A-Za-z0-9_-]+", import_id):
+        return jsonify({"success": False, "message": "Invalid importId"}), 400
+
+    try:
+        rows = load_bulk_student_rows(request.files.get("file"), payload)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    if not rows:
+        return jsonify({"success": False, "message": "No rows to import."}), 400
+    if len(rows) > BULK_IMPORT_MAX_ROWS:
+        return jsonify({"success": False, "message": f"At most {BULK_IMPORT_MAX_ROWS} rows per import."}), 400
+
+    photos_zip = photos_spool = None
+    photo_names = {}
+    photos_file = request.files.get("photos")
+    if photos_file:
+        # The upload stream is closed once the view returns, before the streamed body runs.
+        photos_spool = tempfile.TemporaryFile()
+        shutil.copyfileobj(photos_file.stream, photos_spool)
+        try:
+            photos_zip = zipfile.ZipFile(photos_spool)
+        except zipfile.BadZipFile:
+            photos_spool.close()
+            return jsonify({"success": False, "message": "photos must be a zip file."}), 400
+        photo_names = {
+            os.path.basename(info.filename).lower(): info.filename
+            for info in photos_zip.infolist()
+            if not info.is_dir()
+        }
+
+    fingerprint = hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    import_id = import_id or generate_request_id("import")
+    import_ref = school_ref(school_code).child(f"{BULK_IMPORTS_NODE}/{import_id}")
+    plan = import_ref.get() or {}
+    if plan and plan.get("fingerprint") != fingerprint:
+        return jsonify({"success": False, "message": "importId belongs to a different file."}), 409
+    planned_rows = plan.get("rows") if isinstance(plan.get("rows"), dict) else {}
+
+    values_list, errors = validate_bulk_student_rows(school_code, rows, photo_names, planned_rows)
+    if errors:
+        return jsonify({
+            "success": False,
+            "message": f"{len(errors)} of {len(rows)} rows are invalid; nothing was imported.",
+            "errors": errors,
+        }), 400
+    if dry_run:
+        return jsonify({"success": True, "dryRun": True, "rows": len(rows), "importId": import_id}), 200
+
+    # Plan ids for rows not planned yet: one IdCounters block, locally generated user keys.
+    academic_year = plan.get("academicYear") or resolve_registration_academic_year(
+        school_code, next((values["academicYear"] for values in values_list if values["academicYear"]), "")
+    )
+    unplanned = [index for index in range(len(rows)) if bulk_import_row_key(index) not in planned_rows]
+    missing_ids = [index for index in unplanned if not values_list[index]["studentId"]]
+    provided_ids = {values["studentId"] for values in values_list if values["studentId"]}
+    allocated_ids = []
+    while len(allocated_ids) < len(missing_ids):
+        block = allocate_scoped_ids(school_code, "Students", "GES", len(missing_ids) - len(allocated_ids))
+        allocated_ids.extend(student_id for student_id in block if student_id not in provided_ids)
+    allocated_ids = iter(allocated_ids)
+    now_iso = utc_now_iso()
+    plan_updates = {"status": "running", "updatedAt": now_iso, "lastError": None}
+    if not plan:
+        plan_updates.update({
+            "fingerprint": fingerprint,
+            "total": len(rows),
+            "academicYear": academic_year,
+            "createdAt": now_iso,
+        })
+    for index in unplanned:
+        entry = {
+            "studentId": values_list[index]["studentId"] or next(allocated_ids),
+            "userId": generate_push_key(),
+            "done": False,
+        }
+        planned_rows[bulk_import_row_key(index)] = entry
+        plan_updates[f"rows/{bulk_import_row_key(index)}"] = entry
+    import_ref.update(plan_updates)
+
+    def import_rows():
+        counts = {"created": 0, "skipped": 0, "conflicts": 0, "photoErrors": 0}
+        yield json.dumps({"type": "start", "importId": import_id, "total": len(rows), "resumed": bool(plan)}) + "\n"
+
+        pending = []
+        for index in range(len(rows)):
+            entry = planned_rows[bulk_import_row_key(index)]
+            if entry.get("done"):
+                counts["skipped"] += 1
+                yield json.dumps({"row": index + 1, "status": "skipped", "studentId": entry.get("studentId")}) + "\n"
+            else:
+                pending.append(index)
+
+        claimed_chunk = []
+        try:
+            ensure_uniqueness_indexes(school_code)
+            with ThreadPoolExecutor(max_workers=BULK_IMPORT_PHOTO_WORKERS) as executor:
+                for start in range(0, len(pending), BULK_IMPORT_CHUNK_ROWS):
+                    claims = {}
+                    for index in pending[start:start + BULK_IMPORT_CHUNK_ROWS]:
+                        entry = planned_rows[bulk_import_row_key(index)]
+                        claims[index] = executor.submit(
+                            claim_account_identity, school_code, entry["userId"], entry["studentId"], values_list[index]["phone"]
+                        )
+
+                    chunk = []
+                    for index, claim in claims.items():
+                        identity_error = claim.result()
+                        if identity_error:
+                            counts["conflicts"] += 1
+                            yield json.dumps({
+                                "row": index + 1,
+                                "status": "conflict",
+                                "studentId": planned_rows[bulk_import_row_key(index)]["studentId"],
+                                "message": identity_error,
+                            }) + "\n"
+                        else:
+                            chunk.append(index)
+                    claimed_chunk = chunk
+
+                    uploads = {}
+                    for index in chunk:
+                        member_name = values_list[index]["photoMember"]
+                        if member_name:
+                            student_id = planned_rows[bulk_import_row_key(index)]["studentId"]
+                            uploads[index] = executor.submit(
+                                upload_bulk_student_photo, student_id, member_name, photos_zip.read(member_name)
+                            )
+
+                    updates = {}
+                    reports = []
+                    for index in chunk:
+                        values = values_list[index]
+                        entry = planned_rows[bulk_import_row_key(index)]
+                        student_id, user_id = entry["studentId"], entry["userId"]
+                        values["password"] = values["password"] or generate_temp_password(8)
+                        report = {"row": index + 1, "status": "created", "studentId": student_id, "userId": user_id}
+
+                        profile_url = values["profileImage"] or "/default-profile.png"
+                        if index in uploads:
+                            try:
+                                profile_url = uploads[index].result()
+                            except Exception as e:
+                                counts["photoErrors"] += 1
+                                report["photoError"] = str(e)
+
+                        user_payload, student_payload = build_student_records(
+                            values, school_code, student_id, user_id, academic_year,
+                            profile_url, "", datetime.utcnow().isoformat(),
+                        )
+                        updates[f"Users/{user_id}"] = user_payload
+                        updates[f"Students/{student_id}"] = student_payload
+                        updates[f"{BULK_IMPORTS_NODE}/{import_id}/rows/{bulk_import_row_key(index)}/done"] = True
+                        reports.append(report)
+
+                    updates[f"{BULK_IMPORTS_NODE}/{import_id}/updatedAt"] = utc_now_iso()
+                    if not reports:
+                        continue
+                    school_ref(school_code).update(updates)
+                    claimed_chunk = []
+                    counts["created"] += len(reports)
+                    for report in reports:
+                        yield json.dumps(report) + "\n"
+        except Exception as e:
+            for index in claimed_chunk:
+                # These Users rows were never written, so free their username/phone.
+                entry = planned_rows[bulk_import_row_key(index)]
+                release_account_identity(school_code, entry["userId"], entry["studentId"], values_list[index]["phone"])
+            import_ref.update({"status": "failed", "lastError": str(e), "updatedAt": utc_now_iso()})
+            yield json.dumps({"type": "error", "importId": import_id, "message": str(e), **counts}) + "\n"
+            return
+        finally:
+            if photos_zip is not None:
+                photos_zip.close()
+                photos_spool.close()
+            if counts["created"]:
+                _invalidate_cached_node(school_code, "Students")
+                _invalidate_cached_node(school_code, "Users")
+
+        import_ref.update({
+            "status": "completed",
+            "conflicts": counts["conflicts"],
+            "completedAt": utc_now_iso(),
+            "updatedAt": utc_now_iso(),
+        })
+        yield json.dumps({"type": "done", "importId": import_id, "total": len(rows), **counts}) + "\n"
+
+    return Response(stream_with_context(import_rows()), mimetype="application/x-ndjson")
+
+
 @app.route("/register/registerer", methods=["POST"])
 @app.route("/api/register/registerer", methods=["POST"])
 def register_registerer():
+    claimed_identity = None
     try:
         name = (request.form.get("name") or "").strip()
         password = request.form.get("password") or ""
@@ -868,20 +1602,16 @@ def register_registerer():
         registerer_id = generate_scoped_id(school_code, "Registerers", "GSR")
         username = registerer_id
 
-        users = users_ref.get() or {}
-        for _, u in users.items():
-            row = u or {}
-            if str(row.get("username") or "").lower() == username.lower():
-                return jsonify({"success": False, "message": "Username already exists."}), 400
-            existing_phone = str(row.get("phone") or row.get("Phone") or row.get("phoneNumber") or "").strip()
-            if existing_phone and existing_phone == phone:
-                return jsonify({"success": False, "message": "Phone already exists."}), 400
-
-        profile_url = "/default-profile.png"
-
         new_user_ref = users_ref.push()
         user_id = new_user_ref.key
 
+        identity_error = claim_account_identity(school_code, user_id, username, phone)
+        if identity_error:
+            return jsonify({"success": False, "message": identity_error}), 400
+        claimed_identity = (school_code, user_id, username, phone)
+
+        profile_url = "/default-profile.png"
+
         user_payload = {
             "userId": user_id,
             "name": name,
@@ -897,6 +1627,7 @@ def register_registerer():
             "employeeId": registerer_id,
         }
         new_user_ref.set(user_payload)
+        claimed_identity = None
 
         registerer_payload = {
             "registererId": registerer_id,
@@ -917,12 +1648,16 @@ def register_registerer():
             "userId": user_id,
         }), 200
     except Exception as e:
+        if claimed_identity:
+            # The Users row was never written, so free the username/phone for a retry.
+            release_account_identity(*claimed_identity)
         return jsonify({"success": False, "message": str(e)}), 500
 
 
 @app.route("/register/teacher", methods=["POST"])
 @app.route("/api/register/teacher", methods=["POST"])
 def register_teacher():
+    claimed_identity = None
     try:
         name = (request.form.get("name") or "").strip()
         username = (request.form.get("username") or "").strip()
@@ -953,20 +1688,16 @@ def register_teacher():
         if not username:
             username = teacher_id
 
-        users = users_ref.get() or {}
-        for _, u in users.items():
-            row = u or {}
-            if str(row.get("username") or "").lower() == username.lower():
-                return jsonify({"success": False, "message": "Username already exists."}), 400
-            existing_phone = str(row.get("phone") or row.get("Phone") or row.get("phoneNumber") or "").strip()
-            if phone and existing_phone and existing_phone == phone:
-                return jsonify({"success": False, "message": "Phone already exists."}), 400
-
-        profile_url = "/default-profile.png"
-
         new_user_ref = users_ref.push()
         user_id = new_user_ref.key
 
+        identity_error = claim_account_identity(school_code, user_id, username, phone)
+        if identity_error:
+            return jsonify({"success": False, "message": identity_error}), 400
+        claimed_identity = (school_code, user_id, username, phone)
+
+        profile_url = "/default-profile.png"
+
         user_payload = {
             "userId": user_id,
             "name": name,
@@ -982,6 +1713,7 @@ def register_teacher():
             "teacherId": teacher_id,
         }
         new_user_ref.set(user_payload)
+        claimed_identity = None
 
         teacher_payload = {
             "teacherId": teacher_id,
@@ -1001,9 +1733,99 @@ def register_teacher():
             "userId": user_id,
         }), 200
     except Exception as e:
+        if claimed_identity:
+            # The Users row was never written, so free the username/phone for a retry.
+            release_account_identity(*claimed_identity)
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+def school_codes_from_username_hint(username):
+    """Map a username prefix (e.g. GMIR_0001_26 -> GMI) to school codes through schoolCodeIndex."""
+    first_token = str(username or "").strip().upper().split("_", 1)[0]
+    letters_only = "".join(ch for ch in first_token if ch.isalpha())
+    if not letters_only:
+        return []
+
+    # Staff ids usually append a role letter to the school short name; try both forms.
+    candidates = [letters_only[:-1], letters_only] if len(letters_only) > 1 else [letters_only]
+    for short_name in candidates:
+        try:
+            mapped = db.reference(f"{SCHOOL_CODE_INDEX_REF}/{short_name}").get()
+        except Exception:
+            mapped = None
+        code = str(mapped or "").strip() if isinstance(mapped, str) else ""
+        if code:
+            return [code]
+    return []
+
+
+def list_school_codes():
+    schools = db.reference(PLATFORM_SCHOOLS_REF).get(shallow=True) or {}
+    return sorted(str(code).strip() for code in schools.keys() if str(code).strip())
+
+
+def query_school_users_by_username(school_code, username):
+    """Yield (userId, user) whose username matches case-insensitively, exact spelling first."""
+    target = str(username or "").strip()
+    users_ref = school_ref(school_code).child("Users")
+    seen = set()
+    for candidate in dict.fromkeys([target, target.upper(), target.lower()]):
+        scanned = False
+        try:
+            rows = users_ref.order_by_child("username").equal_to(candidate).limit_to_first(5).get() or {}
+        except Exception:
+            # No ".indexOn": "username" rule for this school yet: fall back to scanning Users.
+            rows = users_ref.get() or {}
+            scanned = True
+        for uid, row in (rows.items() if isinstance(rows, dict) else []):
+            if uid not in seen and str((row or {}).get("username") or "").strip().lower() == target.lower():
+                seen.add(uid)
+                yield uid, row or {}
+        if scanned:
+            return
+
+
+def find_login_user(username, password, school_codes):
+    """Return (school_code, user) for the first school, in order, holding a username+password match."""
+    def password_match(school_code):
+        for uid, row in query_school_users_by_username(school_code, username):
+            stored_password = "" if row.get("password") is None else str(row.get("password"))
+            if stored_password == password:
+                return {"userId": uid, **row}
+        return None
+
+    if len(school_codes) <= 1:
+        for school_code in school_codes:
+            user = password_match(school_code)
+            if user:
+                return school_code, user
+        return None, None
+
+    with ThreadPoolExecutor(max_workers=min(LOGIN_LOOKUP_WORKERS, len(school_codes))) as executor:
+        for school_code, user in zip(school_codes, executor.map(password_match, school_codes)):
+            if user:
+                return school_code, user
+    return None, None
+
+
+def find_registerer_record(school_code, user_id, username):
+    registerers_ref = school_ref(school_code).child("Registerers")
+    for registerer_id in dict.fromkeys([str(username or "").strip().upper(), str(username or "").strip()]):
+        if not registerer_id:
+            continue
+        try:
+            row = registerers_ref.child(registerer_id).get()
+        except ValueError:
+            continue  # not a valid RTDB key, so it cannot be a Registerers id
+        if isinstance(row, dict):
+            return {"registererId": registerer_id, **row}
+
+    rows = registerers_ref.order_by_child("userId").equal_to(user_id).limit_to_first(1).get() or {}
+    for registerer_id, row in rows.items():
+        return {"registererId": registerer_id, **(row or {})}
+    return None
+
+
 @app.route("/api/login", methods=["POST"])
 def login_registrar():
     try:
@@ -1017,22 +1839,15 @@ def login_registrar():
         if not username_input or password is None or not str(password_input).strip():
             return jsonify({"success": False, "message": "Missing credentials"}), 400
 
-        all_schools = schools_data()
-        matched_user = None
-        matched_school_code = None
-
-        for school_code, school_node in all_schools.items():
-            users = (school_node or {}).get("Users") or {}
-            for uid, u in users.items():
-                stored_username = str((u or {}).get("username") or "").strip()
-                stored_password = "" if (u or {}).get("password") is None else str((u or {}).get("password"))
+        # Resolve the school from an explicit schoolCode or the username prefix, then fall back
+        # to one indexed Users query per school; never download Platform1/Schools.
+        explicit_school_code = str(data.get("schoolCode") or "").strip()
+        hinted_codes = [explicit_school_code] if explicit_school_code else school_codes_from_username_hint(username_input)
+        matched_school_code, matched_user = find_login_user(username_input, password_input, hinted_codes)
 
-                if stored_username.lower() == username_input.lower() and stored_password == password_input:
-                    matched_user = {"userId": uid, **(u or {})}
-                    matched_school_code = school_code
-                    break
-            if matched_user:
-                break
+        if not matched_user and not explicit_school_code:
+            remaining_codes = [code for code in list_school_codes() if code not in hinted_codes]
+            matched_school_code, matched_user = find_login_user(username_input, password_input, remaining_codes)
 
         if not matched_user:
             return jsonify({"success": False, "message": "Invalid username or password"}), 401
@@ -1049,13 +1864,7 @@ def login_registrar():
                 "message": "Only registerer accounts can login to this portal"
             }), 403
 
-        registerers = ((all_schools.get(matched_school_code) or {}).get("Registerers") or {})
-        matched_registerer = None
-        for rid, reg in registerers.items():
-            row = reg or {}
-            if str(rid or "").strip().upper() == username_value or row.get("userId") == matched_user.get("userId"):
-                matched_registerer = {"registererId": rid, **row}
-                break
+        matched_registerer = find_registerer_record(matched_school_code, matched_user.get("userId"), username_value)
 
         if not matched_registerer:
             return jsonify({
@@ -1366,52 +2175,48 @@ def get_students():
 
 @app.route("/api/nodes/Students", methods=["GET"])
 def proxy_students_node():
-    """Return the full Students node for a school, served from server cache."""
+    """Return the Students node for a school (optionally projected by fields=), served from server cache."""
     try:
         school_code = request.args.get("schoolCode")
         if not school_code:
             return jsonify({"success": False, "message": "schoolCode is required"}), 400
-        data = get_school_node_cached(school_code, "Students")
-        return jsonify({"success": True, "data": data}), 200
+        return cached_node_response(school_code, "Students", request.args.get("fields"))
     except Exception as exc:
         return jsonify({"success": False, "message": str(exc)}), 500
 
 
 @app.route("/api/nodes/Parents", methods=["GET"])
 def proxy_parents_node():
-    """Return the full Parents node for a school, served from server cache."""
+    """Return the Parents node for a school (optionally projected by fields=), served from server cache."""
     try:
         school_code = request.args.get("schoolCode")
         if not school_code:
             return jsonify({"success": False, "message": "schoolCode is required"}), 400
-        data = get_school_node_cached(school_code, "Parents")
-        return jsonify({"success": True, "data": data}), 200
+        return cached_node_response(school_code, "Parents", request.args.get("fields"))
     except Exception as exc:
         return jsonify({"success": False, "message": str(exc)}), 500
 
 
 @app.route("/api/nodes/Teachers", methods=["GET"])
 def proxy_teachers_node():
-    """Return the full Teachers node for a school, served from server cache."""
+    """Return the Teachers node for a school (optionally projected by fields=), served from server cache."""
     try:
         school_code = request.args.get("schoolCode")
         if not school_code:
             return jsonify({"success": False, "message": "schoolCode is required"}), 400
-        data = get_school_node_cached(school_code, "Teachers")
-        return jsonify({"success": True, "data": data}), 200
+        return cached_node_response(school_code, "Teachers", request.args.get("fields"))
     except Exception as exc:
         return jsonify({"success": False, "message": str(exc)}), 500
 
 
 @app.route("/api/nodes/Users", methods=["GET"])
 def proxy_users_node():
-    """Return the full Users node for a school, served from server cache."""
+    """Return the Users node for a school (optionally projected by fields=), served from server cache."""
     try:
         school_code = request.args.get("schoolCode")
         if not school_code:
             return jsonify({"success": False, "message": "schoolCode is required"}), 400
-        data = get_school_node_cached(school_code, "Users")
-        return jsonify({"success": True, "data": data}), 200
+        return cached_node_response(school_code, "Users", request.args.get("fields"))
     except Exception as exc:
         return jsonify({"success": False, "message": str(exc)}), 500
 
@@ -1482,6 +2287,7 @@ def create_academic_year():
         }
         years_ref.child(year_key).set(payload)
 
+        school_info_updates = {ACADEMIC_YEAR_VERSION_FIELD: academic_year_version()}
         if activate_now:
             all_years = years_ref.get() or {}
             for key in all_years.keys():
@@ -1489,7 +2295,8 @@ def create_academic_year():
                     current_status = str((all_years.get(key) or {}).get("status") or "inactive").strip().lower()
                     next_status = "archived" if current_status == "archived" else "inactive"
                     years_ref.child(key).update({"isCurrent": False, "status": next_status})
-            school_ref(school_code).child("schoolInfo").update({"currentAcademicYear": year_key})
+            school_info_updates["currentAcademicYear"] = year_key
+        school_ref(school_code).child("schoolInfo").update(school_info_updates)
 
         return jsonify({
             "success": True,
@@ -1534,7 +2341,10 @@ def activate_academic_year():
                 "updatedAt": datetime.utcnow().isoformat(),
             })
 
-        school_ref(school_code).child("schoolInfo").update({"currentAcademicYear": year_key})
+        school_ref(school_code).child("schoolInfo").update({
+            "currentAcademicYear": year_key,
+            ACADEMIC_YEAR_VERSION_FIELD: academic_year_version(),
+        })
         return jsonify({"success": True, "message": f"Academic year {year_label_from_key(year_key)} activated.", "yearKey": year_key}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -1569,9 +2379,11 @@ def archive_academic_year():
             "archivedAt": datetime.utcnow().isoformat(),
         })
 
+        school_info_updates = {ACADEMIC_YEAR_VERSION_FIELD: academic_year_version()}
         current_year = (school_ref(school_code).child("schoolInfo").get() or {}).get("currentAcademicYear")
         if current_year == year_key:
-            school_ref(school_code).child("schoolInfo").update({"currentAcademicYear": None})
+            school_info_updates["currentAcademicYear"] = None
+        school_ref(school_code).child("schoolInfo").update(school_info_updates)
 
         return jsonify({"success": True, "message": f"Academic year {year_label_from_key(year_key)} archived.", "yearKey": year_key}), 200
     except Exception as e:
@@ -1621,8 +2433,9 @@ def arm_rollover_guard():
         if not actor:
             return jsonify({"success": False, "message": "Registerer password verification failed."}), 403
 
-        school_node = school_ref(school_code).get() or {}
-        current_year = get_current_academic_year(school_node)
+        years = school_ref(school_code).child("AcademicYears").get() or {}
+        school_info = school_ref(school_code).child("schoolInfo").get() or {}
+        current_year = get_current_academic_year({"schoolInfo": school_info, "AcademicYears": years})
         if not current_year:
             return jsonify({"success": False, "message": "No current academic year is set."}), 400
 
@@ -1632,7 +2445,6 @@ def arm_rollover_guard():
         if requested_target == current_year:
             return jsonify({"success": False, "message": "Target year must be different from current year."}), 400
 
-        years = (school_node or {}).get("AcademicYears") or {}
         if requested_target not in years:
             return jsonify({"success": False, "message": "Target academic year does not exist."}), 404
 
@@ -1651,7 +2463,7 @@ def arm_rollover_guard():
         created_at = datetime.now(timezone.utc)
         execute_after = datetime.fromtimestamp(created_at.timestamp() + delay_seconds, tz=timezone.utc)
         request_id = generate_request_id()
-        preview = build_rollover_guard_preview(school_node, current_year, requested_target)
+        preview = build_rollover_guard_preview(school_code, current_year, requested_target)
 
         pending_request = {
             "requestId": request_id,
@@ -1771,11 +2583,9 @@ def rollover_academic_year():
             or ""
         )
 
-        school_node = school_ref(school_code).get() or {}
-        school_info = (school_node or {}).get("schoolInfo") or {}
+        school_info = school_ref(school_code).child("schoolInfo").get() or {}
         years_ref = school_ref(school_code).child("AcademicYears")
-        years = (school_node or {}).get("AcademicYears") or {}
-        year_history = (school_node or {}).get("YearHistory") or {}
+        years = years_ref.get() or {}
 
         def safe_number(value):
             if isinstance(value, bool):
@@ -1880,9 +2690,6 @@ def rollover_academic_year():
                 return "graduated"
             return status_text or "active"
 
-        def clone_json(value):
-            return json.loads(json.dumps(value))
-
         school_exam_reset_keys = {
             "AssessmentSubmissions",
             "Assessments",
@@ -1952,8 +2759,8 @@ def rollover_academic_year():
             return jsonify({"success": False, "message": "Target year does not match the armed rollover request."}), 409
 
         current_year_node = (years or {}).get(normalized_current_year) or {}
-        existing_archive = (year_history or {}).get(normalized_current_year) or {}
-        existing_archive_meta = (existing_archive or {}).get("rolloverMeta") or {}
+        history_root = f"YearHistory/{normalized_current_year}"
+        existing_archive_meta = school_ref(school_code).child(f"{history_root}/rolloverMeta").get() or {}
 
         if (
             existing_archive_meta.get("rolledToYear") == target_year
@@ -1993,327 +2800,417 @@ def rollover_academic_year():
             }), 200
 
         now_iso = datetime.utcnow().isoformat()
+        history_entry_ref = rollover_history_ref(school_code).child(request_id)
+        progress_path = f"RolloverControl/History/{request_id}/progress"
+        previous_progress = history_entry_ref.child("progress").get() or {}
+        resumed = bool(previous_progress.get("checkpoints") or previous_progress.get("completedPhases"))
+        checkpoints = dict(previous_progress.get("checkpoints") or {})
+        completed_phases = dict(previous_progress.get("completedPhases") or {})
 
-        students = (school_node or {}).get("Students") or {}
-        parents = (school_node or {}).get("Parents") or {}
-        users = (school_node or {}).get("Users") or {}
-        courses = (school_node or {}).get("Courses") or {}
-        class_marks = (school_node or {}).get("ClassMarks") or {}
-        attendance = (school_node or {}).get("Attendance") or {}
-        lesson_plans = (school_node or {}).get("LessonPlans") or {}
         promotion_pass_mark = safe_number(((school_info.get("settings") or {}).get("academic") or {}).get("promotionPassMark"))
         if promotion_pass_mark is None:
             promotion_pass_mark = 50.0
 
-        student_results_map = {}
-        for course_id, roster in (class_marks or {}).items():
-            if not isinstance(roster, dict):
-                continue
-
-            course_row = (courses or {}).get(course_id) or {}
-            subject_name = first_non_empty(course_row.get("subject"), course_row.get("name"), course_row.get("courseId"), course_id)
-            if not subject_name:
-                continue
-
-            for student_id, mark_node in roster.items():
-                final_score = extract_final_score(mark_node)
-                if final_score is None:
-                    continue
-
-                student_bucket = student_results_map.setdefault(str(student_id), {})
-                student_bucket.setdefault(subject_name, []).append(final_score)
-
-        student_attendance_map = {}
-        for _, dates_node in (attendance or {}).items():
-            if not isinstance(dates_node, dict):
-                continue
-
-            for _, attendance_by_student in dates_node.items():
-                if not isinstance(attendance_by_student, dict):
-                    continue
-
-                for student_id, raw_status in attendance_by_student.items():
-                    status_text = str(raw_status or "").strip().lower()
-                    if not status_text:
-                        continue
-
-                    bucket = student_attendance_map.setdefault(str(student_id), {
-                        "present": 0,
-                        "absent": 0,
-                        "late": 0,
-                    })
-                    if status_text.startswith("present"):
-                        bucket["present"] += 1
-                    elif status_text.startswith("late"):
-                        bucket["late"] += 1
-                    elif status_text.startswith("absent"):
-                        bucket["absent"] += 1
-
         promoted = 0
         repeated = 0
         graduated = 0
         withdrawn = 0
         students_archived = 0
+        parents_archived = 0
         deactivated_user_ids = set()
-
-        root_updates = {}
         current_year_label = first_non_empty(current_year_node.get("label"), year_label_from_key(normalized_current_year))
-        history_root = f"YearHistory/{normalized_current_year}"
 
-        parents_history = clone_json(parents)
-        if isinstance(parents_history, dict):
-            for parent_id, parent_node in parents_history.items():
-                if not isinstance(parent_node, dict):
+        progress = {
+            "phase": "starting",
+            "startedAt": previous_progress.get("startedAt") or now_iso,
+            "resumedAt": now_iso if resumed else "",
+            "checkpoints": checkpoints,
+            "completedPhases": completed_phases,
+            "batchesWritten": int(previous_progress.get("batchesWritten") or 0),
+            "pathsWritten": int(previous_progress.get("pathsWritten") or 0),
+            "bytesWritten": int(previous_progress.get("bytesWritten") or 0),
+            "studentsArchived": 0,
+            "peakBatchBytes": int(previous_progress.get("peakBatchBytes") or 0),
+            "maxRssBytes": 0,
+        }
+        batch = {"updates": {}, "bytes": 0}
+
+        def flush_batch(force=False):
+            if not batch["updates"] and not force:
+                return
+            progress["peakBatchBytes"] = max(progress["peakBatchBytes"], batch["bytes"])
+            progress["maxRssBytes"] = process_max_rss_bytes()
+            progress["batchesWritten"] += 1 if batch["updates"] else 0
+            progress["pathsWritten"] += len(batch["updates"])
+            progress["bytesWritten"] += batch["bytes"]
+            progress["studentsArchived"] = students_archived
+            progress["updatedAt"] = datetime.utcnow().isoformat()
+            # The checkpoint travels in the same multi-path update as the data it describes.
+            school_ref(school_code).update({**batch["updates"], progress_path: progress})
+            batch["updates"] = {}
+            batch["bytes"] = 0
+
+        def queue_write(path, value, phase=None, key=None):
+            batch["updates"][path] = value
+            batch["bytes"] += len(json.dumps(value)) if value is not None else 0
+            if phase is not None:
+                checkpoints[phase] = key
+            if len(batch["updates"]) >= ROLLOVER_WRITE_BATCH_PATHS or batch["bytes"] >= ROLLOVER_WRITE_BATCH_BYTES:
+                flush_batch()
+
+        def already_written(phase, key):
+            if completed_phases.get(phase):
+                return True
+            checkpoint = checkpoints.get(phase)
+            return checkpoint is not None and rtdb_key_order(key) <= rtdb_key_order(checkpoint)
+
+        def stream_phase(phase, archive_path=None, transform=None, skip_keys=()):
+            """Read one page of a node at a time; archive each child unless a checkpoint covers it.
+
+            Children are always re-read on resume so the in-memory counters and lookups are
+            rebuilt, but only children past the checkpoint are written again.
+            """
+            progress["phase"] = phase
+            for key, value in iter_node_children(school_ref(school_code).child(phase)):
+                if key in skip_keys:
                     continue
-                parent_user_id = first_non_empty(parent_node.get("userId"))
-                if parent_user_id:
-                    deactivated_user_ids.add(parent_user_id)
-                parent_node["isActive"] = False
-
-                for user_id, user_node in (users or {}).items():
-                    if str((user_node or {}).get("parentId") or "").strip() == str(parent_id or "").strip():
-                        deactivated_user_ids.add(str(user_id))
+                archived = transform(key, value) if transform else value
+                if archive_path is None or archived is None or already_written(phase, key):
+                    continue
+                queue_write(f"{archive_path}/{key}", archived, phase, key)
+            completed_phases[phase] = True
 
-        root_updates[f"{history_root}/Parents"] = parents_history
-        root_updates[f"{history_root}/ClassMarks"] = clone_json(class_marks)
+        try:
+            if not resumed:
+                # A fresh run replaces any earlier archive of these nodes, as the one-shot rollover did.
+                queue_write(f"{history_root}/Parents", None)
+                queue_write(f"{history_root}/ClassMarks", None)
+                queue_write(f"{history_root}/LessonPlans", None)
+                flush_batch()
+
+            # Users are scanned once into id lookups instead of once per student and parent.
+            user_ids_by_student_id = {}
+            user_ids_by_parent_id = {}
+
+            def index_user(user_id, user_node):
+                user = user_node if isinstance(user_node, dict) else {}
+                student_id = str(user.get("studentId") or "").strip()
+                parent_id = str(user.get("parentId") or "").strip()
+                if student_id:
+                    user_ids_by_student_id.setdefault(student_id, []).append(str(user_id))
+                if parent_id:
+                    user_ids_by_parent_id.setdefault(parent_id, []).append(str(user_id))
+                return None
 
-        lesson_plans_history = clone_json(lesson_plans)
-        if isinstance(lesson_plans_history, dict):
-            lesson_plans_history.pop("StudentWhatLearn", None)
-        root_updates[f"{history_root}/LessonPlans"] = lesson_plans_history
+            stream_phase("Users", transform=index_user)
 
-        for student_id, node in (students or {}).items():
-            student = node or {}
-            student_year = extract_student_year(student)
-            if student_year != normalized_current_year:
-                continue
+            courses = school_ref(school_code).child("Courses").get() or {}
+            subject_by_course_id = {
+                str(course_id): first_non_empty((row or {}).get("subject"), (row or {}).get("name"), (row or {}).get("courseId"), course_id)
+                for course_id, row in (courses.items() if isinstance(courses, dict) else [])
+            }
+            courses = None
 
-            student_user_id = first_non_empty(
-                student.get("userId"),
-                ((student.get("systemAccountInformation") or {}).get("userId")),
-            )
-            if student_user_id:
-                deactivated_user_ids.add(student_user_id)
-            else:
-                for user_id, user_node in (users or {}).items():
-                    if str((user_node or {}).get("studentId") or "").strip() == str(student_id).strip():
-                        deactivated_user_ids.add(str(user_id))
+            student_results_map = {}
 
-            linked_parents = student.get("parents") or {}
-            if isinstance(linked_parents, dict):
-                for parent_link in linked_parents.values():
-                    parent_user_id = first_non_empty((parent_link or {}).get("userId"))
-                    if parent_user_id:
-                        deactivated_user_ids.add(parent_user_id)
+            def collect_class_marks(course_id, roster):
+                if not isinstance(roster, dict):
+                    return roster
+                subject_name = subject_by_course_id.get(course_id) or course_id
+                for student_id, mark_node in roster.items():
+                    final_score = extract_final_score(mark_node)
+                    if final_score is None:
+                        continue
+                    student_bucket = student_results_map.setdefault(str(student_id), {})
+                    student_bucket.setdefault(subject_name, []).append(final_score)
+                return roster
 
-            basic = student.get("basicStudentInformation") or {}
-            current_grade_text = first_non_empty(student.get("grade"), basic.get("grade"))
-            current_section = first_non_empty(student.get("section"), basic.get("section")).upper()
-            current_status = summarize_status(student.get("status") or basic.get("status") or "active")
-            current_grade_num = None
-            try:
-                current_grade_num = int(str(current_grade_text).strip())
-            except Exception:
-                current_grade_num = None
+            stream_phase("ClassMarks", f"{history_root}/ClassMarks", collect_class_marks)
 
-            raw_results = student_results_map.get(str(student_id), {})
-            final_results = {}
-            for subject_name, scores in raw_results.items():
-                usable_scores = [safe_number(score) for score in (scores or [])]
-                usable_scores = [score for score in usable_scores if score is not None]
-                if not usable_scores:
-                    continue
-                final_results[subject_name] = normalize_score(sum(usable_scores) / len(usable_scores))
+            student_attendance_map = {}
 
-            attendance_summary = {
-                "present": int((student_attendance_map.get(str(student_id)) or {}).get("present") or 0),
-                "absent": int((student_attendance_map.get(str(student_id)) or {}).get("absent") or 0),
-                "late": int((student_attendance_map.get(str(student_id)) or {}).get("late") or 0),
-            }
+            def collect_attendance(_, dates_node):
+                if not isinstance(dates_node, dict):
+                    return None
+                for attendance_by_student in dates_node.values():
+                    if not isinstance(attendance_by_student, dict):
+                        continue
+                    for student_id, raw_status in attendance_by_student.items():
+                        status_text = str(raw_status or "").strip().lower()
+                        if not status_text:
+                            continue
+                        bucket = student_attendance_map.setdefault(str(student_id), {
+                            "present": 0,
+                            "absent": 0,
+                            "late": 0,
+                        })
+                        if status_text.startswith("present"):
+                            bucket["present"] += 1
+                        elif status_text.startswith("late"):
+                            bucket["late"] += 1
+                        elif status_text.startswith("absent"):
+                            bucket["absent"] += 1
+                return None
 
-            score_values = [safe_number(score) for score in final_results.values()]
-            score_values = [score for score in score_values if score is not None]
-            average_score = (sum(score_values) / len(score_values)) if score_values else None
-            passed = average_score is None or average_score >= promotion_pass_mark
-
-            archive_status = current_status
-            promoted_to = current_grade_text
-            next_grade = current_grade_text
-
-            if current_status == "withdrawn":
-                archive_status = "withdrawn"
-                withdrawn += 1
-            elif current_status == "graduated":
-                archive_status = "graduated"
-                graduated += 1
-            elif current_grade_num is None:
-                archive_status = "repeated"
-                repeated += 1
-            elif passed and current_grade_num >= max_grade:
-                archive_status = "graduated"
-                graduated += 1
-            elif passed:
-                archive_status = "promoted"
-                promoted += 1
-                promoted_to = str(current_grade_num + 1)
-                next_grade = promoted_to
-            else:
-                archive_status = "repeated"
-                repeated += 1
-
-            history_basic = {
-                **basic,
-                "academicYear": normalized_current_year,
-                "grade": current_grade_text,
-                "section": current_section,
-                "status": archive_status,
-                "studentId": student.get("studentId") or basic.get("studentId") or student_id,
-                "name": student.get("name") or basic.get("name") or "Student",
-            }
+            stream_phase("Attendance", transform=collect_attendance)
+            stream_phase("LessonPlans", f"{history_root}/LessonPlans", skip_keys={"StudentWhatLearn"})
 
-            history_records = {
-                **(student.get("records") if isinstance(student.get("records"), dict) else {}),
-                normalized_current_year: {
-                    **((student.get("records") or {}).get(normalized_current_year) or {}),
+            def archive_parent(parent_id, parent_node):
+                nonlocal parents_archived
+                parents_archived += 1
+                if not isinstance(parent_node, dict):
+                    return parent_node
+                parent_user_id = first_non_empty(parent_node.get("userId"))
+                if parent_user_id:
+                    deactivated_user_ids.add(parent_user_id)
+                deactivated_user_ids.update(user_ids_by_parent_id.get(str(parent_id or "").strip(), []))
+                parent_node["isActive"] = False
+                return parent_node
+
+            stream_phase("Parents", f"{history_root}/Parents", archive_parent)
+
+            def archive_student(student_id, node):
+                nonlocal promoted, repeated, graduated, withdrawn, students_archived
+                student = node if isinstance(node, dict) else {}
+                student_year = extract_student_year(student)
+                if student_year != normalized_current_year:
+                    return None
+
+                student_user_id = first_non_empty(
+                    student.get("userId"),
+                    ((student.get("systemAccountInformation") or {}).get("userId")),
+                )
+                if student_user_id:
+                    deactivated_user_ids.add(student_user_id)
+                else:
+                    deactivated_user_ids.update(user_ids_by_student_id.get(str(student_id).strip(), []))
+
+                linked_parents = student.get("parents") or {}
+                if isinstance(linked_parents, dict):
+                    for parent_link in linked_parents.values():
+                        parent_user_id = first_non_empty((parent_link or {}).get("userId"))
+                        if parent_user_id:
+                            deactivated_user_ids.add(parent_user_id)
+
+                basic = student.get("basicStudentInformation") or {}
+                current_grade_text = first_non_empty(student.get("grade"), basic.get("grade"))
+                current_section = first_non_empty(student.get("section"), basic.get("section")).upper()
+                current_status = summarize_status(student.get("status") or basic.get("status") or "active")
+                current_grade_num = None
+                try:
+                    current_grade_num = int(str(current_grade_text).strip())
+                except Exception:
+                    current_grade_num = None
+
+                raw_results = student_results_map.get(str(student_id), {})
+                final_results = {}
+                for subject_name, scores in raw_results.items():
+                    usable_scores = [safe_number(score) for score in (scores or [])]
+                    usable_scores = [score for score in usable_scores if score is not None]
+                    if not usable_scores:
+                        continue
+                    final_results[subject_name] = normalize_score(sum(usable_scores) / len(usable_scores))
+
+                attendance_summary = {
+                    "present": int((student_attendance_map.get(str(student_id)) or {}).get("present") or 0),
+                    "absent": int((student_attendance_map.get(str(student_id)) or {}).get("absent") or 0),
+                    "late": int((student_attendance_map.get(str(student_id)) or {}).get("late") or 0),
+                }
+
+                score_values = [safe_number(score) for score in final_results.values()]
+                score_values = [score for score in score_values if score is not None]
+                average_score = (sum(score_values) / len(score_values)) if score_values else None
+                passed = average_score is None or average_score >= promotion_pass_mark
+
+                archive_status = current_status
+                promoted_to = current_grade_text
+
+                if current_status == "withdrawn":
+                    archive_status = "withdrawn"
+                    withdrawn += 1
+                elif current_status == "graduated":
+                    archive_status = "graduated"
+                    graduated += 1
+                elif current_grade_num is None:
+                    archive_status = "repeated"
+                    repeated += 1
+                elif passed and current_grade_num >= max_grade:
+                    archive_status = "graduated"
+                    graduated += 1
+                elif passed:
+                    archive_status = "promoted"
+                    promoted += 1
+                    promoted_to = str(current_grade_num + 1)
+                else:
+                    archive_status = "repeated"
+                    repeated += 1
+
+                history_basic = {
+                    **basic,
                     "academicYear": normalized_current_year,
                     "grade": current_grade_text,
                     "section": current_section,
                     "status": archive_status,
-                    "rolledOverAt": now_iso,
+                    "studentId": student.get("studentId") or basic.get("studentId") or student_id,
+                    "name": student.get("name") or basic.get("name") or "Student",
+                }
+
+                history_records = {
+                    **(student.get("records") if isinstance(student.get("records"), dict) else {}),
+                    normalized_current_year: {
+                        **((student.get("records") or {}).get(normalized_current_year) or {}),
+                        "academicYear": normalized_current_year,
+                        "grade": current_grade_text,
+                        "section": current_section,
+                        "status": archive_status,
+                        "rolledOverAt": now_iso,
+                    },
+                }
+
+                # Each page is a fresh read, so the student payload can be edited in place.
+                history_system_account = student.get("systemAccountInformation") or {}
+                if isinstance(history_system_account, dict):
+                    history_system_account["isActive"] = False
+                    student["systemAccountInformation"] = history_system_account
+
+                history_parent_guardian = student.get("parentGuardianInformation") or {}
+                history_parent_rows = history_parent_guardian.get("parents")
+                if isinstance(history_parent_rows, list):
+                    for parent_row in history_parent_rows:
+                        if not isinstance(parent_row, dict):
+                            continue
+                        account_info = parent_row.get("systemAccountInformation") or {}
+                        if isinstance(account_info, dict):
+                            account_info["isActive"] = "false"
+                            parent_row["systemAccountInformation"] = account_info
+                student["parentGuardianInformation"] = history_parent_guardian
+
+                students_archived += 1
+                promoted_to_grade = normalize_score(promoted_to) if safe_number(promoted_to) is not None else promoted_to
+                return {
+                    **student,
+                    "academicYear": normalized_current_year,
+                    "grade": current_grade_text,
+                    "section": current_section,
+                    "status": archive_status,
+                    "updatedAt": now_iso,
+                    "basicStudentInformation": history_basic,
+                    "records": history_records,
+                    "rolloverSummary": {
+                        "fromAcademicYear": normalized_current_year,
+                        "toAcademicYear": target_year,
+                        "grade": current_grade_num if current_grade_num is not None else current_grade_text,
+                        "outcome": archive_status,
+                        "promotedToGrade": promoted_to_grade,
+                        "results": final_results,
+                        "attendance": attendance_summary,
+                        "rolledOverAt": now_iso,
+                    },
+                    "rollover": {
+                        "fromAcademicYear": normalized_current_year,
+                        "toAcademicYear": target_year,
+                        "rolledOverAt": now_iso,
+                        "outcome": archive_status,
+                        "promotedToGrade": promoted_to_grade,
+                    },
+                }
+
+            stream_phase("Students", f"{history_root}/Students", archive_student)
+            student_results_map = None
+            student_attendance_map = None
+            user_ids_by_student_id = None
+            user_ids_by_parent_id = None
+
+            # Accounts are only switched off once every archive batch has landed.
+            progress["phase"] = "DeactivateUsers"
+            # Same order the checkpoint comparison uses, so a resume never skips an unwritten id.
+            for user_id in sorted((user_id for user_id in deactivated_user_ids if user_id), key=rtdb_key_order):
+                if already_written("DeactivateUsers", user_id):
+                    continue
+                queue_write(f"Users/{user_id}/isActive", False, "DeactivateUsers", user_id)
+            completed_phases["DeactivateUsers"] = True
+            flush_batch()
+
+            target_year_existing = (years or {}).get(target_year) or {}
+            final_updates = {
+                f"AcademicYears/{normalized_current_year}": {
+                    **current_year_node,
+                    "yearKey": normalized_current_year,
+                    "label": current_year_label,
+                    "status": "completed",
+                    "isCurrent": False,
+                    "updatedAt": now_iso,
                 },
-            }
-
-            history_student_payload = clone_json(student)
-            history_system_account = history_student_payload.get("systemAccountInformation") or {}
-            if isinstance(history_system_account, dict):
-                history_system_account["isActive"] = False
-                history_student_payload["systemAccountInformation"] = history_system_account
-
-            history_parent_guardian = history_student_payload.get("parentGuardianInformation") or {}
-            history_parent_rows = history_parent_guardian.get("parents")
-            if isinstance(history_parent_rows, list):
-                for parent_row in history_parent_rows:
-                    if not isinstance(parent_row, dict):
-                        continue
-                    account_info = parent_row.get("systemAccountInformation") or {}
-                    if isinstance(account_info, dict):
-                        account_info["isActive"] = "false"
-                        parent_row["systemAccountInformation"] = account_info
-            history_student_payload["parentGuardianInformation"] = history_parent_guardian
-
-            history_student_root = f"{history_root}/Students/{student_id}"
-            root_updates[history_student_root] = {
-                **history_student_payload,
-                "academicYear": normalized_current_year,
-                "grade": current_grade_text,
-                "section": current_section,
-                "status": archive_status,
-                "updatedAt": now_iso,
-                "basicStudentInformation": history_basic,
-                "records": history_records,
-                "rolloverSummary": {
-                    "fromAcademicYear": normalized_current_year,
-                    "toAcademicYear": target_year,
-                    "grade": current_grade_num if current_grade_num is not None else current_grade_text,
-                    "outcome": archive_status,
-                    "promotedToGrade": normalize_score(promoted_to) if safe_number(promoted_to) is not None else promoted_to,
-                    "results": final_results,
-                    "attendance": attendance_summary,
-                    "rolledOverAt": now_iso,
+                f"AcademicYears/{target_year}": {
+                    **target_year_existing,
+                    "yearKey": target_year,
+                    "label": first_non_empty(target_year_existing.get("label"), year_label_from_key(target_year)),
+                    "status": "active",
+                    "isCurrent": True,
+                    "createdAt": target_year_existing.get("createdAt") or now_iso,
+                    "updatedAt": now_iso,
                 },
-                "rollover": {
+                "schoolInfo/currentAcademicYear": target_year,
+                f"schoolInfo/{ACADEMIC_YEAR_VERSION_FIELD}": academic_year_version(),
+                f"{history_root}/rolloverMeta": {
                     "fromAcademicYear": normalized_current_year,
                     "toAcademicYear": target_year,
+                    "promotionPassMark": normalize_score(promotion_pass_mark),
+                    "studentsArchived": students_archived,
+                    "movedStudents": students_archived,
+                    "movedParents": parents_archived,
+                    "promoted": promoted,
+                    "repeated": repeated,
+                    "graduated": graduated,
+                    "withdrawn": withdrawn,
+                    "resetYearlyData": reset_yearly_data,
                     "rolledOverAt": now_iso,
-                    "outcome": archive_status,
-                    "promotedToGrade": normalize_score(promoted_to) if safe_number(promoted_to) is not None else promoted_to,
                 },
+                "Students": {},
+                "Parents": {},
+                "ClassMarks": {},
+                "LessonPlans": {},
+                "AssesmentTemplates": {},
+                "AssessmentTemplates": {},
             }
-            students_archived += 1
-
-        root_updates[f"AcademicYears/{normalized_current_year}"] = {
-            **current_year_node,
-            "yearKey": normalized_current_year,
-            "label": current_year_label,
-            "status": "completed",
-            "isCurrent": False,
-            "updatedAt": now_iso,
-        }
-
-        target_year_existing = (years or {}).get(target_year) or {}
-        root_updates[f"AcademicYears/{target_year}"] = {
-            **target_year_existing,
-            "yearKey": target_year,
-            "label": first_non_empty(target_year_existing.get("label"), year_label_from_key(target_year)),
-            "status": "active",
-            "isCurrent": True,
-            "createdAt": target_year_existing.get("createdAt") or now_iso,
-            "updatedAt": now_iso,
-        }
-
-        for year_key, year_row in (years or {}).items():
-            if year_key in {normalized_current_year, target_year}:
-                continue
-            if (year_row or {}).get("isCurrent"):
-                root_updates[f"AcademicYears/{year_key}/isCurrent"] = False
-
-        root_updates["schoolInfo/currentAcademicYear"] = target_year
-        root_updates[f"{history_root}/rolloverMeta"] = {
-            "fromAcademicYear": normalized_current_year,
-            "toAcademicYear": target_year,
-            "promotionPassMark": normalize_score(promotion_pass_mark),
-            "studentsArchived": students_archived,
-            "movedStudents": students_archived,
-            "movedParents": len(parents or {}),
-            "promoted": promoted,
-            "repeated": repeated,
-            "graduated": graduated,
-            "withdrawn": withdrawn,
-            "resetYearlyData": reset_yearly_data,
-            "rolledOverAt": now_iso,
-        }
-
-        root_updates["Students"] = {}
-        root_updates["Parents"] = {}
-        root_updates["ClassMarks"] = {}
-        root_updates["LessonPlans"] = {}
-        root_updates["AssesmentTemplates"] = {}
-        root_updates["AssessmentTemplates"] = {}
-
-        for user_id in deactivated_user_ids:
-            if not user_id:
-                continue
-            root_updates[f"Users/{user_id}/isActive"] = False
-
-        school_ref(school_code).update(root_updates)
-
-        cleared_nodes = []
-        if reset_yearly_data:
-            grade_management_current = clone_json((school_node or {}).get("GradeManagement") or {})
-            grades_map = (grade_management_current or {}).get("grades")
-            if isinstance(grades_map, dict):
-                for grade_row in grades_map.values():
-                    if isinstance(grade_row, dict):
-                        grade_row["sectionSubjectTeachers"] = {}
-
-            school_exams_current = clone_json((school_node or {}).get("SchoolExams") or {})
-            if isinstance(school_exams_current, dict):
+            for year_key, year_row in (years or {}).items():
+                if year_key in {normalized_current_year, target_year}:
+                    continue
+                if (year_row or {}).get("isCurrent"):
+                    final_updates[f"AcademicYears/{year_key}/isCurrent"] = False
+
+            progress["phase"] = "completed"
+            batch["updates"] = final_updates
+            batch["bytes"] = len(json.dumps(final_updates))
+            flush_batch()
+
+            cleared_nodes = []
+            if reset_yearly_data:
+                reset_updates = {
+                    "Chats": {},
+                    "Attendance": {},
+                    "Employees_Attendance": {},
+                    "CalendarEvents": {},
+                    "StudentBookNotes": {},
+                    "Schedules": {},
+                }
                 for child_key in school_exam_reset_keys:
-                    school_exams_current[child_key] = {}
-
-            school_ref(school_code).update({
-                "Chats": {},
-                "Attendance": {},
-                "SchoolExams": school_exams_current,
-                "Employees_Attendance": {},
-                "CalendarEvents": {},
-                "StudentBookNotes": {},
-                "Schedules": {},
-                "GradeManagement": grade_management_current,
+                    reset_updates[f"SchoolExams/{child_key}"] = {}
+                grade_keys = school_ref(school_code).child("GradeManagement/grades").get(shallow=True) or {}
+                if isinstance(grade_keys, dict):
+                    for grade_key, grade_value in grade_keys.items():
+                        if grade_value is True:
+                            reset_updates[f"GradeManagement/grades/{grade_key}/sectionSubjectTeachers"] = {}
+                school_ref(school_code).update(reset_updates)
+                cleared_nodes = cleared_nodes_template
+        except Exception as exc:
+            history_entry_ref.child("progress").update({
+                "lastError": str(exc),
+                "failedAt": datetime.utcnow().isoformat(),
             })
-            cleared_nodes = cleared_nodes_template
+            raise
 
-        rollover_history_ref(school_code).child(request_id).update({
+        history_entry_ref.update({
             "status": "executed",
             "executedAt": now_iso,
             "result": {
@@ -2325,6 +3222,10 @@ def rollover_academic_year():
                 "withdrawn": withdrawn,
                 "studentsArchived": students_archived,
                 "deactivatedUsers": len(deactivated_user_ids),
+                "batchesWritten": progress["batchesWritten"],
+                "peakBatchBytes": progress["peakBatchBytes"],
+                "maxRssBytes": process_max_rss_bytes(),
+                "resumed": resumed,
             },
         })
         pending_rollover_ref(school_code).delete()
@@ -2344,6 +3245,14 @@ def rollover_academic_year():
                 "clearedNodes": cleared_nodes,
                 "archivePath": f"YearHistory/{normalized_current_year}",
             },
+            "progress": {
+                "resumed": resumed,
+                "batchesWritten": progress["batchesWritten"],
+                "pathsWritten": progress["pathsWritten"],
+                "bytesWritten": progress["bytesWritten"],
+                "peakBatchBytes": progress["peakBatchBytes"],
+                "maxRssBytes": process_max_rss_bytes(),
+            },
         }), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -0,0 +1,49 @@
+"""Build UsernameIndex and PhoneIndex for schools registered before the indexes existed.
+
+register_student and the other registration routes claim usernames and
+phone numbers through Schools/<code>/UsernameIndex/<USERNAME> and
+Schools/<code>/PhoneIndex/<phone> (value = userId) instead of scanning
+Users. A school without IndexMeta/uniqueness is backfilled lazily on its
+first registration; run this ahead of registration season instead:
+
+    python scripts/backfill_uniqueness_indexes.py --dry-run
+    python scripts/backfill_uniqueness_indexes.py --school-code ET-ORO-ADA-GMI
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from register_app import backfill_uniqueness_indexes, list_school_codes  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill UsernameIndex/PhoneIndex from each school's Users node.")
+    parser.add_argument("--school-code", help="Backfill one school instead of every school.")
+    parser.add_argument("--dry-run", action="store_true", help="Count entries without writing.")
+    args = parser.parse_args()
+
+    school_codes = [args.school_code] if args.school_code else list_school_codes()
+    if not school_codes:
+        print("No schools found under Platform1/Schools.")
+        return
+
+    total = 0
+    for school_code in school_codes:
+        entries = backfill_uniqueness_indexes(school_code, dry_run=args.dry_run)
+        action = "Would write" if args.dry_run else "Wrote"
+        print(f"{school_code}: {action} {entries} index entries")
+        total += entries
+    print(f"Done: {total} entries across {len(school_codes)} schools.")
+
+
+if __name__ == "__main__":
+    main()
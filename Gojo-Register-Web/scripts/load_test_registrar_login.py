@@ -0,0 +1,263 @@
+"""Load-test registrar login before and after the indexed lookup.
+
+Runs the legacy login (download Platform1/Schools, scan every user, walk
+Registerers) and the current /api/login route against synthetic platforms
+of 1, 10 and 50 schools. Firebase is replaced by an in-memory tree that
+counts reads and bytes and charges a simulated round trip plus transfer
+time per read, so the script runs offline:
+
+    python scripts/load_test_registrar_login.py --schools 1 10 50 --users 400
+    python scripts/load_test_registrar_login.py --rtt-ms 40 --mbps 20 --concurrency 8
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import statistics
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+class MemoryRTDB:
+    def __init__(self, tree, rtt_ms=0.0, mbps=0.0):
+        self.tree = tree
+        self.rtt_seconds = rtt_ms / 1000.0
+        self.bytes_per_second = mbps * 1024 * 1024 / 8 if mbps > 0 else 0
+        self.reads = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._push_seq = 0
+
+    def reset_counters(self):
+        with self._lock:
+            self.reads = 0
+            self.bytes = 0
+
+    def charge(self, payload_bytes):
+        with self._lock:
+            self.reads += 1
+            self.bytes += payload_bytes
+        delay = self.rtt_seconds
+        if self.bytes_per_second:
+            delay += payload_bytes / self.bytes_per_second
+        if delay:
+            time.sleep(delay)
+
+    def reference(self, path="", **_kwargs):
+        return MemoryRef(self, path)
+
+
+class MemoryRef:
+    def __init__(self, store, path, query=None):
+        self._store = store
+        self._parts = [part for part in str(path or "").strip("/").split("/") if part]
+        self._query = dict(query or {})
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    def _with(self, **changes):
+        return MemoryRef(self._store, "/".join(self._parts), {**self._query, **changes})
+
+    def _node(self):
+        node = self._store.tree
+        for part in self._parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def child(self, path):
+        return MemoryRef(self._store, "/".join(self._parts + [str(path).strip("/")]))
+
+    def order_by_child(self, field):
+        return self._with(order_by=field)
+
+    def equal_to(self, value):
+        return self._with(equal_to=value)
+
+    def limit_to_first(self, limit):
+        return self._with(limit_first=limit)
+
+    def get(self, shallow=False):
+        value = self._node()
+        if "equal_to" in self._query and isinstance(value, dict):
+            field = self._query.get("order_by")
+            value = {
+                key: row for key, row in value.items()
+                if isinstance(row, dict) and row.get(field) == self._query["equal_to"]
+            }
+            value = dict(sorted(value.items())[: self._query.get("limit_first", len(value))])
+        if shallow and isinstance(value, dict):
+            value = {key: True for key in value}
+        self._store.charge(len(json.dumps(value)) if value is not None else 0)
+        return copy.deepcopy(value)
+
+    def set(self, value):
+        node = self._store.tree
+        for part in self._parts[:-1]:
+            node = node.setdefault(part, {})
+        node[self._parts[-1]] = copy.deepcopy(value)
+
+    def push(self, value=None):
+        self._store._push_seq += 1
+        ref = self.child(f"-N{self._store._push_seq:012d}")
+        if value is not None:
+            ref.set(value)
+        return ref
+
+
+def build_platform(school_count, users_per_school):
+    schools = {}
+    code_index = {}
+    for school_number in range(1, school_count + 1):
+        short_name = "S" + "".join(chr(ord("A") + int(digit)) for digit in f"{school_number:02d}")
+        school_code = f"ET-SYN-{school_number:03d}-{short_name}"
+        code_index[short_name] = school_code
+
+        users = {}
+        registerers = {}
+        for user_number in range(users_per_school):
+            user_id = f"-U{school_number:03d}{user_number:05d}"
+            if user_number < 2:
+                # One school-prefixed id and one platform-wide GSR_ id (no school hint).
+                username = f"{short_name}R_0001_26" if user_number == 0 else f"GSR_{school_number:04d}_26"
+                registerers[username] = {"registererId": username, "userId": user_id, "status": "active"}
+                role = "registerer"
+            else:
+                username = f"{short_name}S_{user_number:04d}_26"
+                role = "student"
+            users[user_id] = {
+                "userId": user_id,
+                "username": username,
+                "password": "secret",
+                "name": f"User {school_number}-{user_number}",
+                "role": role,
+                "schoolCode": school_code,
+                "profileImage": "https://example.invalid/profile.png",
+            }
+
+        schools[school_code] = {
+            "schoolInfo": {"shortName": short_name},
+            "Users": users,
+            "Registerers": registerers,
+            "Students": {f"{short_name}S_{index:04d}_26": {"notes": "x" * 400} for index in range(users_per_school)},
+            "Posts": {f"-P{index:05d}": {"message": "y" * 300} for index in range(100)},
+        }
+
+    return {"Platform1": {"Schools": schools, "schoolCodeIndex": code_index}}
+
+
+def load_app(store):
+    fake_config = types.ModuleType("firebase_config")
+    fake_config.FIREBASE_CREDENTIALS = __file__
+    fake_config.get_firebase_options = lambda *args, **kwargs: {}
+    fake_config.require_firebase_credentials = lambda *args, **kwargs: __file__
+    sys.modules["firebase_config"] = fake_config
+
+    for patcher in (
+        mock.patch("firebase_admin.credentials.Certificate", lambda *args, **kwargs: object()),
+        mock.patch("firebase_admin.initialize_app", lambda *args, **kwargs: None),
+        mock.patch("firebase_admin.storage.bucket", lambda *args, **kwargs: None),
+        mock.patch("firebase_admin.db.reference", lambda *args, **kwargs: store.reference(*args, **kwargs)),
+    ):
+        patcher.start()
+
+    import register_app  # noqa: E402
+
+    return register_app
+
+
+def legacy_login(app_module, username, password):
+    """The pre-index login_registrar lookup, kept here as the baseline."""
+    all_schools = app_module.schools_data()
+    for school_code, school_node in all_schools.items():
+        for uid, user in ((school_node or {}).get("Users") or {}).items():
+            row = user or {}
+            if str(row.get("username") or "").strip().lower() == username.lower() and str(row.get("password")) == password:
+                for rid, reg in ((school_node or {}).get("Registerers") or {}).items():
+                    if str(rid).strip().upper() == username.upper() or (reg or {}).get("userId") == uid:
+                        return school_code
+                return None
+    return None
+
+
+def current_login(client, username, password):
+    response = client.post("/api/login", json={"username": username, "password": password})
+    return (response.get_json() or {}).get("schoolCode") if response.status_code == 200 else None
+
+
+def run(store, label, login_fn, usernames, concurrency):
+    store.reset_counters()
+    latencies = []
+
+    def timed(username):
+        started = time.perf_counter()
+        ok = bool(login_fn(username))
+        latencies.append((time.perf_counter() - started) * 1000)
+        return ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        successes = sum(executor.map(timed, usernames))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"  {label:<8} p50 {statistics.median(latencies):>9.1f} ms  p95 {p95:>9.1f} ms  "
+        f"{len(usernames) / wall:>7.1f} logins/s  {store.reads / len(usernames):>6.1f} reads  "
+        f"{store.bytes / len(usernames) / 1024:>9.1f} KiB/login  ok={successes}/{len(usernames)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schools", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--users", type=int, default=400, help="users per school")
+    parser.add_argument("--logins", type=int, default=40, help="logins per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="simulated round trip per read")
+    parser.add_argument("--mbps", type=float, default=50.0, help="simulated bandwidth; 0 disables")
+    args = parser.parse_args()
+
+    store = MemoryRTDB({}, rtt_ms=args.rtt_ms, mbps=args.mbps)
+    app_module = load_app(store)
+    client = app_module.app.test_client()
+
+    for school_count in args.schools:
+        store.tree = build_platform(school_count, args.users)
+        registerer_ids = [
+            registerer_id
+            for school in store.tree["Platform1"]["Schools"].values()
+            for registerer_id in school["Registerers"]
+        ]
+        hinted = sorted(name for name in registerer_ids if not name.startswith("GSR_"))
+        unhinted = sorted(name for name in registerer_ids if name.startswith("GSR_"))
+        usernames = [hinted[index % len(hinted)] for index in range(args.logins)]
+        gsr_usernames = [unhinted[index % len(unhinted)] for index in range(args.logins)]
+
+        print(f"{school_count} schools x {args.users} users, {args.logins} logins, concurrency {args.concurrency}")
+        run(store, "before", lambda name: legacy_login(app_module, name, "secret"), usernames, args.concurrency)
+        run(store, "after", lambda name: current_login(client, name, "secret"), usernames, args.concurrency)
+        run(store, "after*", lambda name: current_login(client, name, "secret"), gsr_usernames, args.concurrency)
+
+    print("after* = GSR_ ids with no school prefix: one indexed Users query per school, in parallel")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
+import hashlib
 import json
 import logging
 import os
 import re
 import secrets
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from time import time
+from time import perf_counter, time
 from urllib.parse import unquote, urlparse
 from flask import Flask, g, jsonify, render_template, request, session, has_request_context
 from flask_cors import CORS
@@ -35,6 +38,12 @@ def _pc_set(key: str, data):
 def _pc_invalidate(key: str):
     with _POSTS_CACHE_LOCK:
         _POSTS_CACHE.pop(key, None)
+
+def _pc_invalidate_prefix(prefix: str):
+    with _POSTS_CACHE_LOCK:
+        for key in list(_POSTS_CACHE.keys()):
+            if str(key).startswith(prefix):
+                _POSTS_CACHE.pop(key, None)
 # -----------------------------------------------------------------------
 
 APP_ENV = str(os.getenv("APP_ENV") or os.getenv("FLASK_ENV") or "development").strip().lower()
@@ -174,6 +183,14 @@ SCOPED_ROOTS = {
     "Schedules",
 }
 
+# Server-side indexes: school_reference scopes them like SCOPED_ROOTS, but the
+# RTDB proxy (which only serves SCOPED_ROOTS) never exposes them.
+SERVER_SCOPED_ROOTS = {
+    "UsernameIndex",
+    "TeacherCourseIndex",
+    "IdCounters",
+}
+
 TEACHER_PROXY_WRITE_PREFIXES = (
     "Chats",
     "Chat_Summaries",
@@ -188,6 +205,75 @@ CALENDAR_PROXY_WRITE_PREFIXES = (
     "CalendarEventsByMonth",
 )
 
+_PROXY_TRIE_ACCESS = None
+
+
+def _compile_proxy_prefix_trie(rules):
+    """Segment trie over proxy path prefixes; the deepest matching prefix decides access."""
+    trie = {}
+    for prefixes, access in rules:
+        for prefix in prefixes:
+            node = trie
+            for segment in str(prefix).strip("/").split("/"):
+                node = node.setdefault(segment, {})
+            node[_PROXY_TRIE_ACCESS] = access
+    return trie
+
+
+# Later rules win on equal prefixes: every scoped root is readable, a subset is writable.
+TEACHER_PROXY_PATH_TRIE = _compile_proxy_prefix_trie((
+    (SCOPED_ROOTS, "read"),
+    (("AcademicYears",), "academic_year"),
+    (TEACHER_PROXY_WRITE_PREFIXES, "write"),
+    (CALENDAR_PROXY_WRITE_PREFIXES, "calendar"),
+))
+
+RTDB_PROXY_QUERY_PARAMS = ("orderBy", "startAt", "endAt", "equalTo", "limitToFirst", "limitToLast")
+RTDB_PROXY_CACHE_DEFAULT_TTL_SECONDS = 30
+# Per-root TTLs for proxied reads; 0 keeps the root uncached (ETags still apply).
+RTDB_PROXY_CACHE_TTL_BY_ROOT = {
+    "Chats": 0,
+    "Chat_Summaries": 0,
+    "Presence": 0,
+    "Posts": 15,
+    "TeacherPosts": 15,
+    "ClassMarks": 30,
+    "Students": 120,
+    "Parents": 120,
+    "Users": 120,
+    "Teachers": 300,
+    "School_Admins": 300,
+    "Courses": 300,
+    "TeacherAssignments": 300,
+    "AcademicYears": 300,
+    "GradeManagement": 300,
+    "Schedules": 300,
+    "CalendarEvents": 300,
+    "CalendarEventsByMonth": 300,
+    "Curriculum": 600,
+    "AssessmentTemplates": 600,
+    "AssesmentTemplates": 600,
+    "schoolCodeIndex": 600,
+}
+RTDB_PROXY_CACHE_MAX_ENTRIES = 512
+# Roots each direct-write route touches; only those proxied reads are dropped after it succeeds.
+# Login/verify-password only rewrite password fields, which no proxied view depends on.
+RTDB_PROXY_INVALIDATION_ROOTS_BY_ENDPOINT = {
+    "upload_user_profile_image": ("Teachers", "Users"),
+    "register_student": ("Students", "Users"),
+    "register_teacher": ("Courses", "TeacherAssignments", "Teachers", "Users", "counters"),
+    "register_parent": ("Parents", "Students", "Users"),
+    "change_teacher_password": ("Users",),
+    "update_course_marks": ("ClassMarks",),
+    "mark_teacher_post_seen": ("TeacherPosts",),
+    "like_post": ("Posts",),
+    "save_week_lesson_plan": ("LessonPlans",),
+    "save_annual_lesson_plan": ("LessonPlans",),
+    "migrate_lesson_plans": ("LessonPlans", "LessonPlanSubmissions"),
+    "submit_daily_lesson_plan": ("LessonPlanSubmissions",),
+}
+RTDB_PROXY_CACHE_MAX_ENTRY_BYTES = 1024 * 1024
+
 CALENDAR_MANAGER_ROLES = {
     "admin",
     "director",
@@ -199,9 +285,69 @@ CALENDAR_MANAGER_ROLES = {
 
 COURSE_STUDENTS_CACHE_TTL_SECONDS = 5 * 60
 STUDENT_ROSTER_CACHE_TTL_SECONDS = 60 * 60
+AUTHOR_PROFILE_CACHE_TTL_SECONDS = 10 * 60
+TEACHER_CONTEXT_CACHE_TTL_SECONDS = 2 * 60
+TEACHER_ROLE_CACHE_TTL_SECONDS = 5 * 60
+# After this long a cached academic year is revalidated against schoolInfo/academicYearVersion.
+ACADEMIC_YEAR_CACHE_TTL_SECONDS = 60
+# LessonPlans/<teacher>/<year>/schemaVersion; at this version reads skip legacy-shape migration.
+LESSON_PLAN_SCHEMA_FIELD = "schemaVersion"
+LESSON_PLAN_SCHEMA_VERSION = 3
+# A year found unmigrated is not re-read for this long, so legacy years cost one marker read per window.
+LESSON_PLAN_LEGACY_SCHEMA_CACHE_TTL_SECONDS = 60
+AUTHOR_PROFILE_FETCH_WORKERS = 8
 MIN_TEACHER_PASSWORD_LENGTH = 8
+USERNAME_INDEX_NODE = "UsernameIndex"
+TEACHER_COURSE_INDEX_NODE = "TeacherCourseIndex"
+TEACHER_COURSE_INDEX_CACHE_TTL_SECONDS = 10 * 60
+TEACHER_COURSE_INDEX_USE_RTDB = _env_flag("TEACHER_COURSE_INDEX_USE_RTDB", False)
+# IdCounters/<PREFIX>_<YY> holds the last sequence handed out; shared with Register and Finance.
+ID_COUNTERS_NODE = "IdCounters"
+ID_ALLOCATION_MAX_BLOCK = 500
+# Pre-IdCounters student counters (not per year); only used to seed GES_<YY>.
+LEGACY_STUDENT_COUNTER_PATHS = ("Users_counters/students", "counters/students")
+_USERNAME_INDEX_UNSAFE_CHARS = re.compile(r"[.$#\[\]/]")
+teacher_login_path_counts = {"fast": 0, "indexed": 0, "medium": 0, "slow": 0, "miss": 0}
+_teacher_login_path_lock = threading.Lock()
+# Roster rows only need display fields; never cache credentials alongside them.
+USER_PROFILE_PROJECTION_FIELDS = (
+    "name",
+    "username",
+    "profileImage",
+    "profile",
+    "avatar",
+    "email",
+    "phone",
+    "gender",
+    "dob",
+    "birthDate",
+    "age",
+    "city",
+    "citizenship",
+    "address",
+    "parentName",
+    "parentPhone",
+)
 student_grade_cache = {}
+user_profile_cache = {}
+class_marks_cache = {}
+teacher_course_index_cache = {}
+rtdb_proxy_cache = OrderedDict()
+rtdb_proxy_cache_stats = {}
+_rtdb_proxy_cache_lock = threading.Lock()
 parent_lookup_cache = {}
+author_profile_cache = {}
+teacher_context_cache = {}
+teacher_role_cache = {}
+teacher_auth_timing = {"requests": 0, "totalMs": 0.0, "maxMs": 0.0, "roleReads": 0}
+_teacher_auth_timing_lock = threading.Lock()
+academic_year_cache = {}
+lesson_plan_current_schemas = set()
+lesson_plan_legacy_schemas = {}
+_author_profile_executor = ThreadPoolExecutor(
+    max_workers=AUTHOR_PROFILE_FETCH_WORKERS,
+    thread_name_prefix="author-profile",
+)
 
 
 def _utc_now():
@@ -489,7 +635,7 @@ def school_reference(path, school_code=None):
         if mapped_school:
             resolved_school = mapped_school
 
-    if root in SCOPED_ROOTS and resolved_school:
+    if (root in SCOPED_ROOTS or root in SERVER_SCOPED_ROOTS) and resolved_school:
         normalized = f"Platform1/Schools/{resolved_school}/{normalized}"
 
     return _raw_db_reference(normalized)
@@ -523,6 +669,14 @@ def require_teacher_api_session():
     if _is_public_api_request(request.path):
         return None
 
+    started_at = perf_counter()
+    try:
+        return _check_teacher_api_session()
+    finally:
+        _record_teacher_auth_timing(started_at)
+
+
+def _check_teacher_api_session():
     teacher_session = _get_teacher_session()
     if not teacher_session:
         return jsonify({
@@ -545,6 +699,40 @@ def require_teacher_api_session():
     return None
 
 
+@app.after_request
+def invalidate_rtdb_proxy_cache_after_write(response):
+    # Runs once the write has landed. Proxy writes drop their own path prefix;
+    # other routes drop the roots listed in RTDB_PROXY_INVALIDATION_ROOTS_BY_ENDPOINT.
+    if request.method not in {"POST", "PUT", "PATCH", "DELETE"} or response.status_code >= 400:
+        return response
+
+    if request.endpoint == "rtdb_proxy":
+        proxy_path = _normalize_rtdb_proxy_path((request.view_args or {}).get("node_path"))
+        if proxy_path:
+            _invalidate_rtdb_proxy_cache(_rtdb_proxy_cache_path(proxy_path))
+        return response
+
+    written_roots = RTDB_PROXY_INVALIDATION_ROOTS_BY_ENDPOINT.get(request.endpoint) or ()
+    school_code = _resolve_requested_school_code() if written_roots else ""
+    for root in written_roots if school_code else ():
+        _invalidate_rtdb_proxy_cache(f"Platform1/Schools/{school_code}/{root}")
+    return response
+
+
+@app.after_request
+def report_teacher_auth_timing(response):
+    auth_ms = getattr(g, "teacher_auth_ms", None)
+    if auth_ms is None:
+        return response
+
+    response.headers.add("Server-Timing", f"auth;dur={auth_ms:.2f}")
+    with _teacher_auth_timing_lock:
+        teacher_auth_timing["requests"] += 1
+        teacher_auth_timing["totalMs"] += auth_ms
+        teacher_auth_timing["maxMs"] = max(teacher_auth_timing["maxMs"], auth_ms)
+    return response
+
+
 @app.after_request
 def apply_fcm_no_cache_headers(response):
     if request.path.startswith("/api/fcm"):
@@ -666,6 +854,66 @@ def _get_cached_student_grade_sections(school_code):
     return _cache_set(student_grade_cache, cache_key, grade_section_index)
 
 
+def _project_user_profile(user_record):
+    if not isinstance(user_record, dict):
+        return {}
+
+    return {
+        field_name: user_record.get(field_name)
+        for field_name in USER_PROFILE_PROJECTION_FIELDS
+        if user_record.get(field_name) is not None
+    }
+
+
+def _get_cached_user_profiles(school_code):
+    """Return {userId: projected profile} for the school, built from one Users read."""
+    cache_key = _build_student_roster_cache_key(school_code)
+    cached_value = _cache_get(user_profile_cache, cache_key, STUDENT_ROSTER_CACHE_TTL_SECONDS)
+    if isinstance(cached_value, dict):
+        return cached_value
+
+    users_node = school_reference("Users", school_code=school_code).get() or {}
+    if not isinstance(users_node, dict):
+        users_node = {}
+
+    profiles = {
+        str(user_key or "").strip(): _project_user_profile(user_record)
+        for user_key, user_record in users_node.items()
+        if isinstance(user_record, dict)
+    }
+    return _cache_set(user_profile_cache, cache_key, profiles)
+
+
+def _load_user_profiles(school_code, user_ids):
+    """Resolve user ids to cached projections, point-reading only users created since the last bulk fill."""
+    profiles = _get_cached_user_profiles(school_code)
+    for user_id in user_ids:
+        if user_id in profiles:
+            continue
+
+        user_record = school_reference(f"Users/{user_id}", school_code=school_code).get() or {}
+        profiles[user_id] = _project_user_profile(user_record)
+
+    return {user_id: profiles.get(user_id) or {} for user_id in user_ids}
+
+
+def _remember_user_profile(school_code, user_id, user_record):
+    """Keep the projection in step with a Users write made by this app."""
+    normalized_user_id = str(user_id or "").strip()
+    cache_entry = user_profile_cache.get(_build_student_roster_cache_key(school_code))
+    if not normalized_user_id or not cache_entry:
+        return
+
+    profiles = cache_entry.get("value")
+    if not isinstance(profiles, dict):
+        return
+
+    profiles[normalized_user_id] = {
+        **(profiles.get(normalized_user_id) or {}),
+        **_project_user_profile(user_record),
+    }
+
+
 def _load_students_for_grade_sections(school_code, allowed_grade_sections, include_inactive=False):
     normalized_allowed = {
         str(value or "").strip()
@@ -676,7 +924,6 @@ def _load_students_for_grade_sections(school_code, allowed_grade_sections, inclu
         return []
 
     grade_section_index = _get_cached_student_grade_sections(school_code)
-    user_cache = {}
     rows = []
     seen_student_keys = set()
 
@@ -696,26 +943,182 @@ def _load_students_for_grade_sections(school_code, allowed_grade_sections, inclu
             if not include_inactive and not _is_active_record(student_record):
                 continue
 
-            student_section = _read_student_section(student_record)
-
-            if student_user_id not in user_cache:
-                user_record = school_reference(f"Users/{student_user_id}", school_code=school_code).get() or {}
-                user_cache[student_user_id] = user_record if isinstance(user_record, dict) else {}
-
             seen_student_keys.add(normalized_student_key)
             rows.append({
                 "studentKey": normalized_student_key,
                 "studentId": str(student_record.get("studentId") or student_key or "").strip(),
                 "userId": student_user_id,
                 "grade": _read_student_grade(student_record),
-                "section": student_section,
+                "section": _read_student_section(student_record),
                 "raw": student_record,
-                "user": user_cache.get(student_user_id) or {},
             })
 
+    user_profiles = _load_user_profiles(school_code, {row["userId"] for row in rows})
+    for row in rows:
+        row["user"] = user_profiles.get(row["userId"]) or {}
+
     return rows
 
 
+def _build_class_marks_cache_key(school_code, course_id):
+    return f"{_build_student_roster_cache_key(school_code)}::{str(course_id or '').strip()}"
+
+
+def _get_cached_class_marks(school_code, course_id):
+    """Return ClassMarks/<course_id> as {studentId: marks}, read once per cache window."""
+    cache_key = _build_class_marks_cache_key(school_code, course_id)
+    cached_value = _cache_get(class_marks_cache, cache_key, COURSE_STUDENTS_CACHE_TTL_SECONDS)
+    if isinstance(cached_value, dict):
+        return cached_value
+
+    course_marks = school_reference(f"ClassMarks/{course_id}", school_code=school_code).get() or {}
+    if not isinstance(course_marks, dict):
+        course_marks = {}
+
+    return _cache_set(class_marks_cache, cache_key, course_marks)
+
+
+def _clear_class_marks_cache(school_code, course_id):
+    class_marks_cache.pop(_build_class_marks_cache_key(school_code, course_id), None)
+
+
+def _build_author_profile_cache_key(school_code, actor_id):
+    return f"{_build_student_roster_cache_key(school_code)}::{str(actor_id or '').strip()}"
+
+
+def _fetch_post_author_profile(school_code, actor_id):
+    """Resolve a post author (School_Admins key, Users key or userId) to a small profile."""
+    users_ref = school_reference("Users", school_code=school_code)
+    school_admins_ref = school_reference("School_Admins", school_code=school_code)
+
+    school_admin_key = None
+    school_admin_record = school_admins_ref.child(actor_id).get() or {}
+    if isinstance(school_admin_record, dict) and school_admin_record:
+        school_admin_key = actor_id
+    else:
+        school_admin_record = {}
+
+    user = users_ref.child(actor_id).get() or {}
+    if (not isinstance(user, dict) or not user) and school_admin_record.get("userId"):
+        user = users_ref.child(str(school_admin_record.get("userId")).strip()).get() or {}
+
+    if not isinstance(user, dict) or not user:
+        try:
+            _, user = _first_snapshot_record(
+                users_ref.order_by_child("userId").equal_to(actor_id).limit_to_first(1).get() or {}
+            )
+        except Exception:
+            user = {}
+
+    if not school_admin_record:
+        try:
+            school_admin_key, school_admin_record = _first_snapshot_record(
+                school_admins_ref.order_by_child("userId").equal_to(actor_id).limit_to_first(1).get() or {}
+            )
+        except Exception:
+            school_admin_key, school_admin_record = None, {}
+
+    user = user if isinstance(user, dict) else {}
+    school_admin_record = school_admin_record if isinstance(school_admin_record, dict) else {}
+    return {
+        "adminKey": school_admin_key or "",
+        "userId": str(user.get("userId") or school_admin_record.get("userId") or "").strip(),
+        "name": user.get("name") or school_admin_record.get("name") or "",
+        "profileImage": user.get("profileImage") or school_admin_record.get("profileImage") or "",
+    }
+
+
+def _load_post_author_profiles(school_code, actor_ids):
+    """Author profiles for a feed: cached per school, misses fetched in parallel."""
+    profiles = {}
+    missing_actor_ids = []
+    for actor_id in {str(value or "").strip() for value in (actor_ids or [])}:
+        if not actor_id:
+            continue
+        cached_profile = _cache_get(
+            author_profile_cache,
+            _build_author_profile_cache_key(school_code, actor_id),
+            AUTHOR_PROFILE_CACHE_TTL_SECONDS,
+        )
+        if isinstance(cached_profile, dict):
+            profiles[actor_id] = cached_profile
+        else:
+            missing_actor_ids.append(actor_id)
+
+    if missing_actor_ids:
+        fetched_profiles = _author_profile_executor.map(
+            lambda actor_id: _fetch_post_author_profile(school_code, actor_id),
+            missing_actor_ids,
+        )
+        for actor_id, profile in zip(missing_actor_ids, fetched_profiles):
+            profiles[actor_id] = _cache_set(
+                author_profile_cache,
+                _build_author_profile_cache_key(school_code, actor_id),
+                profile,
+            )
+
+    return profiles
+
+
+def _invalidate_author_profiles(school_code, user_id):
+    """Drop cached author profiles (and assembled feeds) that point at user_id."""
+    normalized_user_id = str(user_id or "").strip()
+    cache_prefix = f"{_build_student_roster_cache_key(school_code)}::"
+    for cache_key, cache_entry in list(author_profile_cache.items()):
+        if not cache_key.startswith(cache_prefix):
+            continue
+        profile = (cache_entry or {}).get("value") or {}
+        if cache_key == f"{cache_prefix}{normalized_user_id}" or profile.get("userId") == normalized_user_id:
+            author_profile_cache.pop(cache_key, None)
+    _pc_invalidate_prefix(f"posts_feed:{_build_student_roster_cache_key(school_code)}:")
+
+
+def _build_teacher_context_cache_key(school_code, teacher_key):
+    return f"{_build_student_roster_cache_key(school_code)}::{str(teacher_key or '').strip()}"
+
+
+def _invalidate_teacher_context(school_code, teacher_key):
+    teacher_context_cache.pop(_build_teacher_context_cache_key(school_code, teacher_key), None)
+
+
+def _load_teacher_context(school_code, teacher_key):
+    """Return {"teacher", "body", "etag"} for one teacher from two point reads, cached briefly."""
+    cache_key = _build_teacher_context_cache_key(school_code, teacher_key)
+    cached_value = _cache_get(teacher_context_cache, cache_key, TEACHER_CONTEXT_CACHE_TTL_SECONDS)
+    if isinstance(cached_value, dict):
+        return cached_value
+
+    teacher_data = school_reference(f"Teachers/{teacher_key}", school_code).get()
+    if not isinstance(teacher_data, dict):
+        return None
+
+    teacher_user_id = str(teacher_data.get("userId") or "").strip()
+    teacher_user = school_reference(f"Users/{teacher_user_id}", school_code).get() if teacher_user_id else None
+    if teacher_user_id and not isinstance(teacher_user, dict):
+        # Older rows may be keyed differently from their userId field; query by the indexed field.
+        _, teacher_user = _first_snapshot_record(
+            school_reference("Users", school_code).order_by_child("userId").equal_to(teacher_user_id).limit_to_first(1).get()
+        )
+    teacher_user = teacher_user if isinstance(teacher_user, dict) else {}
+
+    teacher_teacher_id = str(teacher_data.get("teacherId") or teacher_key or "").strip()
+    teacher = {
+        "teacherId": teacher_teacher_id,
+        "teacherKey": teacher_key,
+        "userId": teacher_user_id,
+        "name": teacher_user.get("name") or teacher_data.get("name"),
+        "username": teacher_user.get("username") or teacher_teacher_id,
+        "profileImage": teacher_user.get("profileImage") or teacher_data.get("profileImage") or "/default-profile.png",
+        "schoolCode": school_code,
+    }
+    body = app.json.dumps({"success": True, "teacher": teacher})
+    return _cache_set(teacher_context_cache, cache_key, {
+        "teacher": teacher,
+        "body": body,
+        "etag": hashlib.sha1(body.encode("utf-8")).hexdigest(),
+    })
+
+
 def _load_parent_record_by_identifier(school_code, parent_identifier):
     normalized_identifier = str(parent_identifier or "").strip()
     if not school_code or not normalized_identifier:
@@ -849,7 +1252,7 @@ def _is_allowed_teacher_proxy_path(node_path, teacher_session):
         return False
 
     if request.method == "GET":
-        return relative_path.split("/", 1)[0] in SCOPED_ROOTS
+        return _match_teacher_proxy_prefix(relative_path.split("/")) is not None
 
     return _is_allowed_teacher_proxy_write_path(relative_path, teacher_session)
 
@@ -882,26 +1285,60 @@ def _path_matches_prefix(path_value, prefix):
     return normalized_path == normalized_prefix or normalized_path.startswith(f"{normalized_prefix}/")
 
 
+def _match_teacher_proxy_prefix(path_segments):
+    node = TEACHER_PROXY_PATH_TRIE
+    access = None
+    for segment in path_segments:
+        if not segment:
+            continue
+        node = node.get(segment)
+        if node is None:
+            break
+        access = node.get(_PROXY_TRIE_ACCESS, access)
+    return access
+
+
+def _normalize_teacher_role(value):
+    role_value = _normalize_session_identifier(value).lower()
+    return "school_admin" if role_value == "school_admins" else role_value
+
+
+def _build_teacher_role_cache_key(school_code, user_id):
+    return f"{_build_student_roster_cache_key(school_code)}::{user_id}"
+
+
+def _invalidate_teacher_role(school_code, user_id):
+    teacher_role_cache.pop(_build_teacher_role_cache_key(school_code, user_id), None)
+
+
 def _read_teacher_session_role(teacher_session):
-    role_value = _normalize_session_identifier((teacher_session or {}).get("role")).lower()
+    role_value = _normalize_teacher_role((teacher_session or {}).get("role"))
     if role_value:
-        return "school_admin" if role_value == "school_admins" else role_value
+        return role_value
 
     school_code = _resolve_requested_school_code((teacher_session or {}).get("schoolCode"))
     user_id = _normalize_session_identifier((teacher_session or {}).get("userId"))
     if not school_code or not user_id:
         return ""
 
-    try:
-        user_record = school_reference(f"Users/{user_id}", school_code=school_code).get() or {}
-    except Exception:
-        return ""
+    cache_key = _build_teacher_role_cache_key(school_code, user_id)
+    resolved_role = _cache_get(teacher_role_cache, cache_key, TEACHER_ROLE_CACHE_TTL_SECONDS)
+    if resolved_role is None:
+        try:
+            user_record = school_reference(f"Users/{user_id}", school_code=school_code).get() or {}
+        except Exception:
+            return ""
 
-    if not isinstance(user_record, dict):
-        return ""
+        with _teacher_auth_timing_lock:
+            teacher_auth_timing["roleReads"] += 1
+        resolved_role = _normalize_teacher_role(user_record.get("role")) if isinstance(user_record, dict) else ""
+        _cache_set(teacher_role_cache, cache_key, resolved_role)
+
+    # Sessions from before the role was stored at login pick it up here, once.
+    if resolved_role and teacher_session is _get_teacher_session():
+        _write_teacher_session({**teacher_session, "role": resolved_role})
 
-    resolved_role = _normalize_session_identifier(user_record.get("role")).lower()
-    return "school_admin" if resolved_role == "school_admins" else resolved_role
+    return resolved_role
 
 
 def _teacher_can_manage_calendar(teacher_session):
@@ -909,22 +1346,133 @@ def _teacher_can_manage_calendar(teacher_session):
 
 
 def _is_allowed_teacher_proxy_write_path(relative_path, teacher_session=None):
-    normalized_relative_path = _normalize_rtdb_proxy_path(relative_path)
-    if not normalized_relative_path:
-        return False
+    path_segments = _normalize_rtdb_proxy_path(relative_path).split("/")
+    access = _match_teacher_proxy_prefix(path_segments)
 
-    if any(_path_matches_prefix(normalized_relative_path, prefix) for prefix in TEACHER_PROXY_WRITE_PREFIXES):
+    if access == "write":
         return True
 
-    if any(_path_matches_prefix(normalized_relative_path, prefix) for prefix in CALENDAR_PROXY_WRITE_PREFIXES):
+    if access == "calendar":
         return _teacher_can_manage_calendar(teacher_session)
 
-    if _path_matches_prefix(normalized_relative_path, "AcademicYears"):
-        return "/LessonPlans/" in f"/{normalized_relative_path}/"
+    if access == "academic_year":
+        return "LessonPlans" in path_segments[1:]
 
     return False
 
 
+def _record_teacher_auth_timing(started_at):
+    if has_request_context():
+        g.teacher_auth_ms = getattr(g, "teacher_auth_ms", 0.0) + (perf_counter() - started_at) * 1000
+
+
+def _rtdb_proxy_cache_path(normalized_path):
+    """Mirror school_reference so relative and Platform1/Schools/<code>/ paths share cache entries."""
+    if normalized_path.startswith("Platform1/"):
+        return normalized_path
+
+    root = normalized_path.split("/", 1)[0]
+    school_code = _resolve_requested_school_code()
+    if root in SCOPED_ROOTS and school_code:
+        return f"Platform1/Schools/{school_code}/{normalized_path}"
+
+    return normalized_path
+
+
+def _rtdb_proxy_cache_root(cache_path):
+    segments = cache_path.split("/")
+    if len(segments) >= 4 and segments[0] == "Platform1" and segments[1] == "Schools":
+        return segments[3]
+    if len(segments) >= 2 and segments[0] == "Platform1":
+        return segments[1]
+    return segments[0]
+
+
+def _rtdb_proxy_query_key():
+    return tuple(
+        (param_name, str(request.args.get(param_name)).strip())
+        for param_name in RTDB_PROXY_QUERY_PARAMS
+        if request.args.get(param_name) is not None
+    )
+
+
+def _record_rtdb_proxy_cache_event(root, event_name):
+    with _rtdb_proxy_cache_lock:
+        root_stats = rtdb_proxy_cache_stats.setdefault(root, {"hits": 0, "misses": 0, "notModified": 0, "uncached": 0})
+        root_stats[event_name] = root_stats.get(event_name, 0) + 1
+
+
+def _rtdb_proxy_cache_get(cache_key, ttl_seconds):
+    with _rtdb_proxy_cache_lock:
+        cache_entry = rtdb_proxy_cache.get(cache_key)
+        if not cache_entry:
+            return None
+        if time() - cache_entry["cached_at"] > ttl_seconds:
+            rtdb_proxy_cache.pop(cache_key, None)
+            return None
+        rtdb_proxy_cache.move_to_end(cache_key)
+        return cache_entry
+
+
+def _rtdb_proxy_cache_set(cache_key, body, etag):
+    with _rtdb_proxy_cache_lock:
+        rtdb_proxy_cache[cache_key] = {"body": body, "etag": etag, "cached_at": time()}
+        rtdb_proxy_cache.move_to_end(cache_key)
+        while len(rtdb_proxy_cache) > RTDB_PROXY_CACHE_MAX_ENTRIES:
+            rtdb_proxy_cache.popitem(last=False)
+
+
+def _invalidate_rtdb_proxy_cache(cache_path):
+    """Drop cached reads of cache_path, its ancestors (which embed it) and its descendants."""
+    with _rtdb_proxy_cache_lock:
+        for cache_key in list(rtdb_proxy_cache.keys()):
+            cached_path = cache_key[0]
+            if _path_matches_prefix(cached_path, cache_path) or _path_matches_prefix(cache_path, cached_path):
+                rtdb_proxy_cache.pop(cache_key, None)
+
+
+def _rtdb_proxy_json_response(body, etag, cache_root):
+    if request.if_none_match.contains(etag):
+        _record_rtdb_proxy_cache_event(cache_root, "notModified")
+
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
+def _rtdb_proxy_cached_get(reference, normalized_path):
+    cache_path = _rtdb_proxy_cache_path(normalized_path)
+    cache_root = _rtdb_proxy_cache_root(cache_path)
+    cache_key = (cache_path, _rtdb_proxy_query_key())
+    ttl_seconds = RTDB_PROXY_CACHE_TTL_BY_ROOT.get(cache_root, RTDB_PROXY_CACHE_DEFAULT_TTL_SECONDS)
+
+    cache_entry = _rtdb_proxy_cache_get(cache_key, ttl_seconds) if ttl_seconds > 0 else None
+    if cache_entry:
+        _record_rtdb_proxy_cache_event(cache_root, "hits")
+        return _rtdb_proxy_json_response(cache_entry["body"], cache_entry["etag"], cache_root)
+
+    body = app.json.dumps(_apply_rtdb_proxy_query(reference).get())
+    etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    if ttl_seconds > 0 and len(body) <= RTDB_PROXY_CACHE_MAX_ENTRY_BYTES:
+        _record_rtdb_proxy_cache_event(cache_root, "misses")
+        _rtdb_proxy_cache_set(cache_key, body, etag)
+    else:
+        _record_rtdb_proxy_cache_event(cache_root, "uncached")
+
+    return _rtdb_proxy_json_response(body, etag, cache_root)
+
+
+@app.route("/api/rtdb-proxy-stats", methods=["GET"])
+def rtdb_proxy_cache_metrics():
+    with _rtdb_proxy_cache_lock:
+        return jsonify({
+            "success": True,
+            "entries": len(rtdb_proxy_cache),
+            "roots": {root: dict(root_stats) for root, root_stats in rtdb_proxy_cache_stats.items()},
+        })
+
+
 @app.route("/api/rtdb-proxy/<path:node_path>", methods=["GET", "PUT", "PATCH", "POST", "DELETE"])
 def rtdb_proxy(node_path):
     normalized_path = _normalize_rtdb_proxy_path(node_path)
@@ -932,7 +1480,10 @@ def rtdb_proxy(node_path):
         return jsonify({"success": False, "message": "RTDB path is required"}), 400
 
     teacher_session = _get_teacher_session()
-    if not _is_allowed_teacher_proxy_path(normalized_path, teacher_session):
+    started_at = perf_counter()
+    path_allowed = _is_allowed_teacher_proxy_path(normalized_path, teacher_session)
+    _record_teacher_auth_timing(started_at)
+    if not path_allowed:
         return jsonify({
             "success": False,
             "message": "This RTDB path is not available for the current teacher session.",
@@ -943,8 +1494,7 @@ def rtdb_proxy(node_path):
         raw_body = request.get_data(cache=True, as_text=True)
 
         if request.method == "GET":
-            queried_reference = _apply_rtdb_proxy_query(reference)
-            return jsonify(queried_reference.get())
+            return _rtdb_proxy_cached_get(reference, normalized_path)
 
         if request.method == "DELETE":
             reference.delete()
@@ -1085,47 +1635,47 @@ def _lesson_plan_normalize_course_node(course_node, teacher_id, course_id, acade
     return normalized
 
 
-def _lesson_plan_migrate_course_node(course_ref, course_node, teacher_id, course_id, academic_year):
-    normalized = _lesson_plan_normalize_course_node(course_node, teacher_id, course_id, academic_year)
-    mutated = False
+def _rtdb_stored_form(value):
+    """Drop what RTDB never stores (None, empty maps/lists) so comparisons with a read-back converge."""
+    if isinstance(value, dict):
+        cleaned = {key: _rtdb_stored_form(item) for key, item in value.items()}
+        return {key: item for key, item in cleaned.items() if item not in (None, {}, [])}
+    if isinstance(value, list):
+        return [_rtdb_stored_form(item) for item in value]
+    return value
 
+
+def _lesson_plan_course_migration_updates(course_node, teacher_id, course_id, academic_year):
+    """Return (normalized course, relative-path updates); the updates are {} once the node is current."""
+    normalized = _lesson_plan_normalize_course_node(course_node, teacher_id, course_id, academic_year)
     if not isinstance(course_node, dict):
         course_node = {}
 
-    stored_weeks = course_node.get('weeks') if isinstance(course_node.get('weeks'), dict) else {}
-    normalized_weeks = normalized.get('weeks') or {}
-    if normalized_weeks and stored_weeks != normalized_weeks:
-        course_ref.child('weeks').set(normalized_weeks)
-        mutated = True
+    updates = {}
+    for section_key in ('weeks', 'annual', 'meta'):
+        stored_section = course_node.get(section_key) if isinstance(course_node.get(section_key), dict) else {}
+        normalized_section = _rtdb_stored_form(normalized.get(section_key) or {})
+        if normalized_section and stored_section != normalized_section:
+            updates[section_key] = normalized_section
 
-    stored_annual = course_node.get('annual') if isinstance(course_node.get('annual'), dict) else {}
-    normalized_annual = normalized.get('annual') or {}
-    if normalized_annual and stored_annual != normalized_annual:
-        course_ref.child('annual').set(normalized_annual)
-        mutated = True
+    for key, value in course_node.items():
+        if str(key).startswith('week_') and isinstance(value, dict):
+            updates[key] = None
+    if 'annualRows' in course_node:
+        updates['annualRows'] = None
 
-    stored_meta = course_node.get('meta') if isinstance(course_node.get('meta'), dict) else {}
-    normalized_meta = normalized.get('meta') or {}
-    if normalized_meta and stored_meta != normalized_meta:
-        course_ref.child('meta').set(normalized_meta)
-        mutated = True
+    return normalized, updates
 
-    legacy_week_keys = [
-        key for key, value in course_node.items()
-        if str(key).startswith('week_') and isinstance(value, dict)
-    ] if isinstance(course_node, dict) else []
-    for legacy_week_key in legacy_week_keys:
-        course_ref.child(legacy_week_key).delete()
-        mutated = True
 
-    if isinstance(course_node, dict) and 'annualRows' in course_node:
-        course_ref.child('annualRows').delete()
-        mutated = True
-
-    return normalized, mutated
+def _lesson_plan_migrate_course_node(course_ref, course_node, teacher_id, course_id, academic_year):
+    normalized, updates = _lesson_plan_course_migration_updates(course_node, teacher_id, course_id, academic_year)
+    if updates:
+        course_ref.update(updates)
+    return normalized, bool(updates)
 
 
-def _lesson_plan_migrate_submission_entries(base_ref, raw_data, teacher_id, course_id, academic_year):
+def _lesson_plan_submission_migration_updates(raw_data, teacher_id, course_id, academic_year):
+    """Return (entries, relative-path updates) for one LessonPlanSubmissions course node."""
     if not isinstance(raw_data, dict):
         raw_data = {}
 
@@ -1139,11 +1689,10 @@ def _lesson_plan_migrate_submission_entries(base_ref, raw_data, teacher_id, cour
     }
 
     normalized_entries = entries_node or legacy_entries
-    mutated = False
+    updates = {}
 
     if normalized_entries and entries_node != normalized_entries:
-        base_ref.child('entries').set(normalized_entries)
-        mutated = True
+        updates['entries'] = normalized_entries
 
     normalized_meta = {
         **meta_node,
@@ -1153,14 +1702,156 @@ def _lesson_plan_migrate_submission_entries(base_ref, raw_data, teacher_id, cour
         'updatedAt': meta_node.get('updatedAt') or _utc_now_isoformat(),
     }
     if normalized_entries and meta_node != normalized_meta:
-        base_ref.child('meta').set(normalized_meta)
-        mutated = True
+        updates['meta'] = normalized_meta
 
     for legacy_key in legacy_entries.keys():
-        base_ref.child(legacy_key).delete()
-        mutated = True
+        updates[legacy_key] = None
+
+    return normalized_entries, updates
+
+
+def _lesson_plan_migrate_submission_entries(base_ref, raw_data, teacher_id, course_id, academic_year):
+    normalized_entries, updates = _lesson_plan_submission_migration_updates(raw_data, teacher_id, course_id, academic_year)
+    if updates:
+        base_ref.update(updates)
+    return normalized_entries, bool(updates)
+
+
+def _lesson_plan_course_view(course_node, teacher_id, course_id, academic_year):
+    """Response for a course node already in the current schema: no legacy fallbacks, no write-back."""
+    if not isinstance(course_node, dict):
+        course_node = {}
+
+    meta = course_node.get('meta') if isinstance(course_node.get('meta'), dict) else {}
+    annual = course_node.get('annual') if isinstance(course_node.get('annual'), dict) else {}
+    weeks = course_node.get('weeks') if isinstance(course_node.get('weeks'), dict) else {}
+    annual_rows = _lesson_plan_normalize_annual_rows(annual.get('rows'))
+
+    view = {
+        'teacherId': meta.get('teacherId') or teacher_id,
+        'courseId': meta.get('courseId') or course_id,
+        'academicYear': meta.get('academicYear') or academic_year,
+        'updatedAt': meta.get('updatedAt'),
+        'meta': meta,
+        'annual': {**annual, 'rows': annual_rows, 'annualRows': annual_rows, 'rowCount': len(annual_rows)},
+        'annualRows': annual_rows,
+        'weeks': weeks,
+    }
+    view.update(weeks)
+    return view
+
+
+def _lesson_plan_week_summary(week_node):
+    days = week_node.get('days')
+    day_count = week_node.get('dayCount')
+    if not isinstance(day_count, int):
+        day_count = len(days) if isinstance(days, (list, dict)) else 0
+    return {
+        'week': week_node.get('week'),
+        'weekTopic': week_node.get('weekTopic'),
+        'dayCount': day_count,
+        'updatedAt': week_node.get('updatedAt'),
+    }
+
+
+def _lesson_plan_course_summary(course_node, course_id):
+    """Planner-grid entry for LessonPlans/<teacher>/<year>/summary/<courseId>: week topics, no day content."""
+    if not isinstance(course_node, dict):
+        course_node = {}
+
+    meta = course_node.get('meta') if isinstance(course_node.get('meta'), dict) else {}
+    annual = course_node.get('annual') if isinstance(course_node.get('annual'), dict) else {}
+    weeks = course_node.get('weeks') if isinstance(course_node.get('weeks'), dict) else {}
+    annual_rows = annual.get('rows') if isinstance(annual.get('rows'), list) else []
+
+    return {
+        'courseId': course_id,
+        'weeks': {
+            week_key: _lesson_plan_week_summary(week_node)
+            for week_key, week_node in weeks.items()
+            if isinstance(week_node, dict)
+        },
+        'annualRowCount': annual.get('rowCount') if isinstance(annual.get('rowCount'), int) else len(annual_rows),
+        'annualUpdatedAt': annual.get('updatedAt'),
+        'lastUpdatedWeek': meta.get('lastUpdatedWeek'),
+        'updatedAt': meta.get('updatedAt'),
+    }
+
+
+def _lesson_plan_summary_updates(stored_summaries, normalized_courses):
+    """Map courseId -> summary for each normalized course whose stored summary is missing or stale."""
+    if not isinstance(stored_summaries, dict):
+        stored_summaries = {}
+    updates = {}
+    for course_id, normalized in normalized_courses.items():
+        summary = _rtdb_stored_form(_lesson_plan_course_summary(normalized, course_id))
+        if stored_summaries.get(course_id) != summary:
+            updates[course_id] = summary
+    return updates
+
+
+def _lesson_plan_schema_cache_key(school_code, teacher_id, academic_year):
+    return f"{_build_student_roster_cache_key(school_code)}::{teacher_id}::{academic_year}"
+
+
+def _lesson_plan_schema_is_current(teacher_id, academic_year, school_code=None):
+    """True once LessonPlans/<teacher>/<year>/schemaVersion is current.
+
+    The positive answer is cached for good; a negative one only briefly, since
+    the migration script may stamp the year at any time.
+    """
+    resolved_school = _resolve_requested_school_code(school_code)
+    cache_key = _lesson_plan_schema_cache_key(resolved_school, teacher_id, academic_year)
+    if cache_key in lesson_plan_current_schemas:
+        return True
+    if _cache_get(lesson_plan_legacy_schemas, cache_key, LESSON_PLAN_LEGACY_SCHEMA_CACHE_TTL_SECONDS):
+        return False
 
-    return normalized_entries, mutated
+    stored_version = (
+        school_reference('LessonPlans', resolved_school)
+        .child(str(teacher_id)).child(str(academic_year)).child(LESSON_PLAN_SCHEMA_FIELD).get()
+    )
+    try:
+        is_current = int(stored_version or 0) >= LESSON_PLAN_SCHEMA_VERSION
+    except (TypeError, ValueError):
+        is_current = False
+
+    if is_current:
+        lesson_plan_current_schemas.add(cache_key)
+    else:
+        _cache_set(lesson_plan_legacy_schemas, cache_key, True)
+    return is_current
+
+
+def _remember_lesson_plan_schema_current(teacher_id, academic_year, school_code=None):
+    cache_key = _lesson_plan_schema_cache_key(_resolve_requested_school_code(school_code), teacher_id, academic_year)
+    lesson_plan_current_schemas.add(cache_key)
+    lesson_plan_legacy_schemas.pop(cache_key, None)
+
+
+def _mark_lesson_plan_schema_current(teacher_id, academic_year, school_code=None):
+    resolved_school = _resolve_requested_school_code(school_code)
+    school_reference('LessonPlans', resolved_school).child(str(teacher_id)).child(str(academic_year)).child(
+        LESSON_PLAN_SCHEMA_FIELD
+    ).set(LESSON_PLAN_SCHEMA_VERSION)
+    _remember_lesson_plan_schema_current(teacher_id, academic_year, resolved_school)
+
+
+def _lesson_plan_new_year_schema_updates(teacher_id, academic_year, school_code=None):
+    """Marker update for a save that creates the teacher's year node, which then has nothing to migrate.
+
+    Returns {} when the year is already current or holds plans or submissions
+    written before this save.
+    """
+    if _lesson_plan_schema_is_current(teacher_id, academic_year, school_code):
+        return {}
+
+    resolved_school = _resolve_requested_school_code(school_code)
+    for root in ('LessonPlans', 'LessonPlanSubmissions'):
+        existing = school_reference(root, resolved_school).child(str(teacher_id)).child(str(academic_year)).get(shallow=True)
+        if existing:
+            return {}
+    return {LESSON_PLAN_SCHEMA_FIELD: LESSON_PLAN_SCHEMA_VERSION}
 
 
 def _build_virtual_course_id(grade, section, subject):
@@ -1214,30 +1905,18 @@ def _resolve_course_id_from_grade_assignment(courses, grade, section, subject):
     return fallback_id
 
 
-def _resolve_teacher_course_entries(school_code, teacher_identifiers=None, teacher_record_key=None):
-    resolved_school = str(school_code or "").strip()
-    if not resolved_school:
-        return []
-
-    normalized_identifiers = {
-        _normalize_teacher_ref(value)
-        for value in (teacher_identifiers or [])
-        if str(value or "").strip()
-    }
-    if teacher_record_key:
-        normalized_identifiers.add(_normalize_teacher_ref(teacher_record_key))
-
-    courses = school_reference("Courses", resolved_school).get() or {}
-    assignments = school_reference("TeacherAssignments", resolved_school).get() or {}
-    entries = []
-    seen = set()
+def _build_teacher_course_index(courses, assignments, grade_management):
+    """Map every normalized teacher reference to {courseId: entry} in resolution order.
 
-    def add_entry(course_id, assignment=None):
-        if not course_id or course_id in seen:
-            return
-        seen.add(course_id)
+    Each entry carries an "order" so entries gathered through several references
+    (teacher key, teacherId, userId) merge back into the original scan order.
+    """
+    courses = courses if isinstance(courses, dict) else {}
+    index = {}
+    order = 0
 
-        course_data = courses.get(course_id) if isinstance(courses, dict) else None
+    def build_entry(course_id, assignment=None):
+        course_data = courses.get(course_id)
         if isinstance(course_data, dict):
             merged = {
                 "courseId": course_id,
@@ -1260,21 +1939,30 @@ def _resolve_teacher_course_entries(school_code, teacher_identifiers=None, teach
 
         if assignment:
             merged["teacherId"] = assignment.get("teacherId") or assignment.get("teacherRecordKey")
-        entries.append(merged)
+        return merged
 
-    for assignment in assignments.values():
+    def add_entry(teacher_refs, course_id, assignment=None):
+        nonlocal order
+        if not course_id:
+            return
+        order += 1
+        entry = None
+        for teacher_ref in teacher_refs:
+            if not teacher_ref:
+                continue
+            teacher_courses = index.setdefault(teacher_ref, {})
+            if course_id in teacher_courses:
+                continue
+            entry = entry or {**build_entry(course_id, assignment), "order": order}
+            teacher_courses[course_id] = entry
+
+    for assignment in (assignments or {}).values():
         if not isinstance(assignment, dict):
             continue
-        assignment_teacher = _normalize_teacher_ref(assignment.get("teacherId"))
-        if assignment_teacher in normalized_identifiers:
-            course_id = str(assignment.get("courseId") or "").strip()
-            add_entry(course_id, assignment)
-
-    grade_management = _raw_db_reference(
-        f"Platform1/Schools/{resolved_school}/GradeManagement/grades"
-    ).get() or {}
+        course_id = str(assignment.get("courseId") or "").strip()
+        add_entry({_normalize_teacher_ref(assignment.get("teacherId"))}, course_id, assignment)
 
-    for grade_key, grade_data in grade_management.items():
+    for grade_key, grade_data in (grade_management or {}).items():
         section_subject_teachers = (grade_data or {}).get("sectionSubjectTeachers") or {}
         for section_key, subject_map in section_subject_teachers.items():
             for subject_key, assignment in (subject_map or {}).items():
@@ -1287,24 +1975,97 @@ def _resolve_teacher_course_entries(school_code, teacher_identifiers=None, teach
                     _normalize_teacher_ref(assignment.get("teacherUserId")),
                     _normalize_teacher_ref(assignment.get("userId")),
                 }
-
-                if not assignment_refs.intersection(normalized_identifiers):
-                    continue
-
                 course_id = _resolve_course_id_from_grade_assignment(
                     courses,
                     grade_key,
                     assignment.get("section") or section_key,
                     assignment.get("subject") or subject_key,
                 )
-                add_entry(course_id, {
+                add_entry(assignment_refs, course_id, {
                     **assignment,
                     "grade": grade_key,
                     "section": assignment.get("section") or section_key,
                     "subject": assignment.get("subject") or subject_key,
                 })
 
-    return entries
+    return index
+
+
+def _get_teacher_course_index(school_code):
+    cache_key = _build_student_roster_cache_key(school_code)
+    cached_value = _cache_get(teacher_course_index_cache, cache_key, TEACHER_COURSE_INDEX_CACHE_TTL_SECONDS)
+    if isinstance(cached_value, dict):
+        return cached_value
+
+    index = _build_teacher_course_index(
+        school_reference("Courses", school_code).get() or {},
+        school_reference("TeacherAssignments", school_code).get() or {},
+        _raw_db_reference(f"Platform1/Schools/{school_code}/GradeManagement/grades").get() or {},
+    )
+    return _cache_set(teacher_course_index_cache, cache_key, index)
+
+
+def _read_materialized_teacher_courses(school_code, teacher_record_key):
+    """One read of TeacherCourseIndex/<teacher> as written by scripts/sync_teacher_assignments.py."""
+    teacher_ref = _normalize_teacher_ref(teacher_record_key)
+    if not TEACHER_COURSE_INDEX_USE_RTDB or not teacher_ref:
+        return None
+
+    try:
+        teacher_courses = school_reference(f"{TEACHER_COURSE_INDEX_NODE}/{teacher_ref}", school_code).get()
+    except Exception:
+        logger.exception("Failed to read %s for teacher %s", TEACHER_COURSE_INDEX_NODE, teacher_ref)
+        return None
+
+    return teacher_courses if isinstance(teacher_courses, dict) else None
+
+
+def _invalidate_teacher_course_index(school_code):
+    teacher_course_index_cache.pop(_build_student_roster_cache_key(school_code), None)
+
+
+def _resolve_teacher_course_entries(school_code, teacher_identifiers=None, teacher_record_key=None):
+    resolved_school = str(school_code or "").strip()
+    if not resolved_school:
+        return []
+
+    normalized_identifiers = {
+        _normalize_teacher_ref(value)
+        for value in (teacher_identifiers or [])
+        if str(value or "").strip()
+    }
+    if teacher_record_key:
+        normalized_identifiers.add(_normalize_teacher_ref(teacher_record_key))
+
+    merged_courses = {}
+    cached_index = _cache_get(
+        teacher_course_index_cache,
+        _build_student_roster_cache_key(resolved_school),
+        TEACHER_COURSE_INDEX_CACHE_TTL_SECONDS,
+    )
+    materialized_courses = None if isinstance(cached_index, dict) else _read_materialized_teacher_courses(
+        resolved_school,
+        teacher_record_key,
+    )
+
+    if materialized_courses is not None:
+        merged_courses = materialized_courses
+    else:
+        index = cached_index if isinstance(cached_index, dict) else _get_teacher_course_index(resolved_school)
+        for teacher_ref in normalized_identifiers:
+            for course_id, entry in (index.get(teacher_ref) or {}).items():
+                current = merged_courses.get(course_id)
+                if current is None or int(entry.get("order") or 0) < int(current.get("order") or 0):
+                    merged_courses[course_id] = entry
+
+    entries = sorted(
+        (entry for entry in merged_courses.values() if isinstance(entry, dict)),
+        key=lambda entry: int(entry.get("order") or 0),
+    )
+    return [
+        {key: value for key, value in entry.items() if key != "order"}
+        for entry in entries
+    ]
 
 
 def _resolve_teacher_course_ids(school_code, teacher_identifiers=None, teacher_record_key=None):
@@ -1436,27 +2197,52 @@ def _resolve_school_short_name(school_code):
     return fallback or "SCH"
 
 
-def _get_default_academic_year(school_code=None):
-    resolved_school = str(school_code or _read_school_code_from_request() or "").strip()
-    if not resolved_school:
-        return "default"
-
+def _resolve_default_academic_year(resolved_school):
+    """Return (academic year, schoolInfo.academicYearVersion) from schoolInfo, else AcademicYears."""
     school_info = _raw_db_reference(f"Platform1/Schools/{resolved_school}/schoolInfo").get() or {}
+    version = school_info.get("academicYearVersion")
     current_year = str(school_info.get("currentAcademicYear") or "").strip()
     if current_year:
-        return current_year
+        return current_year, version
 
     years = _raw_db_reference(f"Platform1/Schools/{resolved_school}/AcademicYears").get() or {}
     if isinstance(years, dict):
         for year_key, year_data in years.items():
             if isinstance(year_data, dict) and year_data.get("isCurrent"):
-                return str(year_key).strip()
+                return str(year_key).strip(), version
 
         sorted_keys = sorted(str(key).strip() for key in years.keys() if str(key).strip())
         if sorted_keys:
-            return sorted_keys[-1]
+            return sorted_keys[-1], version
+
+    return "default", version
+
+
+def _get_default_academic_year(school_code=None):
+    """
+    Per-school cached academic year. Within ACADEMIC_YEAR_CACHE_TTL_SECONDS no RTDB read is made;
+    after that a single read of schoolInfo/academicYearVersion (bumped by Register, Admin and
+    Company whenever the year changes) decides whether the cached value still holds.
+    """
+    resolved_school = str(school_code or _read_school_code_from_request() or "").strip()
+    if not resolved_school:
+        return "default"
 
-    return "default"
+    cache_entry = academic_year_cache.get(resolved_school)
+    if cache_entry:
+        if time() - cache_entry["checked_at"] <= ACADEMIC_YEAR_CACHE_TTL_SECONDS:
+            return cache_entry["year"]
+
+        # Schools never stamped by a newer portal have no version to compare; re-resolve them.
+        if cache_entry["version"] is not None:
+            version = _raw_db_reference(f"Platform1/Schools/{resolved_school}/schoolInfo/academicYearVersion").get()
+            if version == cache_entry["version"]:
+                cache_entry["checked_at"] = time()
+                return cache_entry["year"]
+
+    academic_year, version = _resolve_default_academic_year(resolved_school)
+    academic_year_cache[resolved_school] = {"year": academic_year, "version": version, "checked_at": time()}
+    return academic_year
 
 
 bucket = storage.bucket()
@@ -1592,6 +2378,17 @@ def get_school_grades(school_code):
         return jsonify({"success": False, "message": str(e), "grades": []}), 500
 
 
+def _teacher_auth_timing_summary():
+    with _teacher_auth_timing_lock:
+        requests_timed = teacher_auth_timing["requests"]
+        return {
+            "requests": requests_timed,
+            "avgMs": round(teacher_auth_timing["totalMs"] / requests_timed, 3) if requests_timed else 0.0,
+            "maxMs": round(teacher_auth_timing["maxMs"], 3),
+            "roleReads": teacher_auth_timing["roleReads"],
+        }
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
@@ -1599,6 +2396,8 @@ def health_check():
         "status": "ok",
         "environment": APP_ENV,
         "timestamp": _utc_now_isoformat(),
+        "teacherLoginPaths": dict(teacher_login_path_counts),
+        "teacherAuthTiming": _teacher_auth_timing_summary(),
     })
 
 
@@ -1659,6 +2458,10 @@ def upload_user_profile_image(user_id):
         if isinstance(teacher_matches, dict):
             for teacher_key in teacher_matches.keys():
                 school_reference('Teachers').child(teacher_key).update({'profileImage': profile_url})
+                _invalidate_teacher_context(_resolve_requested_school_code(), teacher_key)
+
+        _remember_user_profile(_resolve_requested_school_code(), user_node_key, {'profileImage': profile_url})
+        _invalidate_author_profiles(_resolve_requested_school_code(), teacher_user_id)
 
         if previous_profile_url and previous_profile_url != profile_url:
             _delete_storage_object_by_public_url(previous_profile_url)
@@ -1671,65 +2474,67 @@ def upload_user_profile_image(user_id):
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
-# New endpoint: reserve & return the next studentId
-@app.route("/generate/student_id", methods=["GET"])
-def generate_student_id():
-    """
-    Atomically increment the students counter and return a studentId in format:
-      GES_<zero-padded-4+>_<YY>  e.g. GES_0001_26
-    This reserves that sequence number.
-    """
-    try:
-        counters_ref = school_reference("Users_counters/students")
-        students_ref = school_reference("Students")
+def _max_scoped_sequence(node_name, prefix, year_suffix, legacy_counter_paths=()):
+    node = school_reference(node_name).get(shallow=True) or {}
+    max_seq = 0
 
-        # Defensive: bring counter up to existing max (one-time migration)
-        existing_students = students_ref.get() or {}
-        max_found = 0
-        for s in existing_students.values():
-            sid = (s.get("studentId") or "")
-            if sid and sid.startswith("GES_"):
-                parts = sid.split("_")
-                if len(parts) >= 3:
-                    try:
-                        num = int(parts[1].lstrip("0") or "0")
-                        if num > max_found:
-                            max_found = num
-                    except Exception:
-                        continue
+    if isinstance(node, dict):
+        for key in node.keys():
+            parts = str(key or "").split("_")
+            if len(parts) == 3 and parts[0] == prefix and parts[2] == year_suffix:
+                try:
+                    max_seq = max(max_seq, int(parts[1]))
+                except Exception:
+                    continue
 
+    for counter_path in legacy_counter_paths:
         try:
-            current_counter = counters_ref.get() or 0
-            if current_counter < max_found:
-                counters_ref.set(max_found)
+            max_seq = max(max_seq, int(school_reference(counter_path).get() or 0))
         except Exception:
-            pass
+            continue
 
-        def tx_inc(curr):
-            return (curr or 0) + 1
+    return max_seq
 
-        new_seq = counters_ref.transaction(tx_inc)
-        if not isinstance(new_seq, int):
-            new_seq = int(new_seq)
 
-        year = _utc_now().year
-        year_suffix = str(year)[-2:]
-        seq_padded = str(new_seq).zfill(4)
-        student_id = f"GES_{seq_padded}_{year_suffix}"
+def _allocate_scoped_ids(node_name, prefix, count=1, legacy_counter_paths=()):
+    """
+    Reserve `count` consecutive <prefix>_<seq>_<YY> ids from IdCounters/<prefix>_<YY>
+    in a single transaction. The counter is seeded from a shallow key scan the first
+    time it is used, so allocation never downloads the node it numbers.
+    """
+    year_suffix = str(_utc_now().year)[-2:]
+    counter_ref = school_reference(f"{ID_COUNTERS_NODE}/{prefix}_{year_suffix}")
+    seed = {}
 
-        # Extremely unlikely collision check (increment until unique)
-        attempts = 0
-        while students_ref.child(student_id).get():
-            new_seq += 1
-            seq_padded = str(new_seq).zfill(4)
-            student_id = f"GES_{seq_padded}_{year_suffix}"
-            attempts += 1
-            if attempts > 1000:
-                # fallback to timestamp-based id
-                student_id = f"GES_{str(_utc_timestamp())[-6:]}_{year_suffix}"
-                break
+    def reserve(current):
+        if current is None:
+            if "value" not in seed:
+                seed["value"] = _max_scoped_sequence(node_name, prefix, year_suffix, legacy_counter_paths)
+            current = seed["value"]
+        return int(current) + count
+
+    last_seq = int(counter_ref.transaction(reserve))
+    return [f"{prefix}_{str(seq).zfill(4)}_{year_suffix}" for seq in range(last_seq - count + 1, last_seq + 1)]
+
+
+# New endpoint: reserve & return the next studentId
+@app.route("/generate/student_id", methods=["GET"])
+def generate_student_id():
+    """
+    Reserve and return the next studentId in format:
+      GES_<zero-padded-4+>_<YY>  e.g. GES_0001_26
+    Pass ?count=N to reserve a block of N ids (returned as studentIds).
+    """
+    try:
+        count = int(request.args.get("count") or 1)
+    except (TypeError, ValueError):
+        count = 0
+    if count < 1 or count > ID_ALLOCATION_MAX_BLOCK:
+        return jsonify({"success": False, "message": f"count must be between 1 and {ID_ALLOCATION_MAX_BLOCK}"}), 400
 
-        return jsonify({"success": True, "studentId": student_id})
+    try:
+        student_ids = _allocate_scoped_ids("Students", "GES", count, LEGACY_STUDENT_COUNTER_PATHS)
+        return jsonify({"success": True, "studentId": student_ids[0], "studentIds": student_ids})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
@@ -1766,7 +2571,6 @@ def register_student():
 
     users_ref = school_reference('Users')
     students_ref = school_reference('Students')
-    counters_ref = school_reference('counters/students')
 
     # ---------- upload profile image (optional) ----------
     profile_url = "/default-profile.png"
@@ -1778,73 +2582,12 @@ def register_student():
         profile_url = blob.public_url
 
     # ========== Generate studentId atomically ==========
+    year = _utc_now().year
     try:
-        # Defensive: compute numeric max already present (if any)
-        existing_students = students_ref.get() or {}
-        max_found = 0
-        for s in existing_students.values():
-            sid = (s.get('studentId') or "")
-            if sid and sid.startswith("GES_"):
-                parts = sid.split('_')
-                if len(parts) >= 3:
-                    try:
-                        num = int(parts[1].lstrip('0') or '0')
-                        if num > max_found:
-                            max_found = num
-                    except Exception:
-                        continue
-
-        # ensure counter isn't behind
-        try:
-            current_counter = counters_ref.get() or 0
-            if current_counter < max_found:
-                counters_ref.set(max_found)
-        except Exception:
-            pass
-
-        # transaction to allocate next sequence number
-        def tx_increment(curr):
-            return (curr or 0) + 1
-
-        new_seq = counters_ref.transaction(tx_increment)
-        if not isinstance(new_seq, int):
-            new_seq = int(new_seq)
-
-        year = _utc_now().year
-        year_suffix = str(year)[-2:]
-        seq_padded = str(new_seq).zfill(4)
-        student_id = f"GES_{seq_padded}_{year_suffix}"
-
-        # ensure student_id and username will be unique; if conflict, bump counter
-        attempts = 0
-        while True:
-            # check student key existence and username collision
-            student_exists = bool(students_ref.child(student_id).get())
-            # check username collision (if provided_username present we handle below; here we plan to use student_id as username)
-            user_collision = False
-            all_users = users_ref.get() or {}
-            for u in all_users.values():
-                if u.get('username') == student_id:
-                    user_collision = True
-                    break
-
-            if not student_exists and not user_collision:
-                break
-
-            # collision -> increment counter and try next
-            new_seq += 1
-            seq_padded = str(new_seq).zfill(4)
-            student_id = f"GES_{seq_padded}_{year_suffix}"
-            attempts += 1
-            if attempts > 1000:
-                # fallback
-                student_id = f"GES_{str(_utc_timestamp())[-6:]}_{year_suffix}"
-                break
-    except Exception as e:
+        student_id = _allocate_scoped_ids("Students", "GES", 1, LEGACY_STUDENT_COUNTER_PATHS)[0]
+    except Exception:
         # fallback if transaction fails
-        year = _utc_now().year
-        year_suffix = str(year)[-2:]
-        student_id = f"GES_{str(_utc_timestamp())[-6:]}_{year_suffix}"
+        student_id = f"GES_{str(_utc_timestamp())[-6:]}_{str(year)[-2:]}"
 
     # If frontend supplied an explicit username, use it (but check uniqueness). Otherwise set username = student_id
     username = provided_username or student_id
@@ -1896,6 +2639,8 @@ def register_student():
     }
     students_ref.child(student_id).set(student_data)
     _clear_student_roster_cache(_resolve_requested_school_code())
+    _remember_user_profile(_resolve_requested_school_code(), new_user_ref.key, user_data)
+    _index_username(_resolve_requested_school_code(), user_data.get('username'), new_user_ref.key)
 
     return jsonify({
         'success': True,
@@ -2046,6 +2791,8 @@ def register_teacher():
         'teacherId': teacher_id
     }
     new_user_ref.set(user_data)
+    _remember_user_profile(_resolve_requested_school_code(), new_user_ref.key, user_data)
+    _index_username(_resolve_requested_school_code(), username, new_user_ref.key)
 
     # create Teachers entry keyed by teacherId
     teacher_data = {
@@ -2058,22 +2805,36 @@ def register_teacher():
     teachers_ref.child(teacher_id).set(teacher_data)
 
     # assign courses (use teacher_id as identifier)
+    registered_courses = {}
+    registered_assignments = {}
     for course in courses:
         grade = course.get('grade')
         section = course.get('section')
         subject = course.get('subject')
         course_id = f"course_{subject.lower()}_{grade}{section.upper()}"
-        if not courses_ref.child(course_id).get():
-            courses_ref.child(course_id).set({
+        course_data = courses_ref.child(course_id).get()
+        if not course_data:
+            course_data = {
                 'name': subject,
                 'subject': subject,
                 'grade': grade,
                 'section': section
-            })
-        assignments_ref.push().set({
+            }
+            courses_ref.child(course_id).set(course_data)
+        assignment_ref = assignments_ref.push()
+        assignment_ref.set({
             'teacherId': teacher_id,
             'courseId': course_id
         })
+        registered_courses[course_id] = course_data
+        registered_assignments[assignment_ref.key] = {'teacherId': teacher_id, 'courseId': course_id}
+
+    if registered_assignments:
+        _invalidate_teacher_course_index(school_code)
+        if TEACHER_COURSE_INDEX_USE_RTDB:
+            teacher_ref = _normalize_teacher_ref(teacher_id)
+            new_entries = _build_teacher_course_index(registered_courses, registered_assignments, {}).get(teacher_ref) or {}
+            school_reference(f'{TEACHER_COURSE_INDEX_NODE}/{teacher_ref}', school_code).update(new_entries)
 
     return jsonify({
         'success': True,
@@ -2083,6 +2844,95 @@ def register_teacher():
         'profileImage': profile_url
     })
 
+def _username_index_key(username):
+    normalized_username = str(username or "").strip().upper()
+    return _USERNAME_INDEX_UNSAFE_CHARS.sub("_", normalized_username)
+
+
+def _index_username(school_code, username, user_id):
+    """Point UsernameIndex/<USERNAME> at a Users key so logins never scan Users.
+
+    UsernameIndex is shared with Register, which claims entries with a
+    transaction before it writes the Users row. Only an empty entry, or one
+    already pointing at user_id, is written here, so such a claim is never
+    overwritten.
+    """
+    index_key = _username_index_key(username)
+    normalized_user_id = str(user_id or "").strip()
+    if not school_code or not index_key or not normalized_user_id:
+        return
+
+    def claim(current):
+        return normalized_user_id if current in (None, "", normalized_user_id) else current
+
+    try:
+        school_reference(f"{USERNAME_INDEX_NODE}/{index_key}", school_code).transaction(claim)
+    except Exception:
+        logger.exception("Failed to index username %s for school %s", index_key, school_code)
+
+
+def _record_teacher_login_path(path_name):
+    with _teacher_login_path_lock:
+        teacher_login_path_counts[path_name] = teacher_login_path_counts.get(path_name, 0) + 1
+
+
+def _find_teacher_user_by_username(school_code, username):
+    """Resolve a teacher username via UsernameIndex, then an indexed Users query.
+
+    Returns (user_id, user_record, query_ok). query_ok is False only when the
+    indexed query itself failed (e.g. the username rule index is missing), in
+    which case the caller may still fall back to scanning Users.
+    """
+    users_ref = school_reference("Users", school_code)
+    index_ref = school_reference(f"{USERNAME_INDEX_NODE}/{_username_index_key(username)}", school_code)
+    normalized_username = str(username or "").strip().upper()
+
+    indexed_user_id = str(index_ref.get() or "").strip()
+    if indexed_user_id:
+        indexed_user = users_ref.child(indexed_user_id).get() or {}
+        indexed_username = str((indexed_user or {}).get("username") or "").strip().upper()
+        if indexed_username == normalized_username and _is_teacher_user_record(indexed_user):
+            return indexed_user_id, indexed_user, True
+        if indexed_user and indexed_username != normalized_username:
+            # The holder was renamed; drop the entry unless someone re-claimed it meanwhile.
+            # A missing holder row may be another portal's in-flight claim, so it is left alone.
+            try:
+                index_ref.transaction(lambda current: None if current == indexed_user_id else current)
+            except Exception:
+                logger.exception("Failed to drop stale username index entry for school %s", school_code)
+
+    for candidate_username in dict.fromkeys([str(username or "").strip(), normalized_username, normalized_username.lower()]):
+        try:
+            matches = users_ref.order_by_child("username").equal_to(candidate_username).limit_to_first(5).get() or {}
+        except Exception:
+            logger.warning("Indexed username query failed for school %s; falling back to full reads", school_code)
+            return "", {}, False
+
+        for user_key, user_record in matches.items():
+            if _is_teacher_user_record(user_record):
+                _index_username(school_code, user_record.get("username"), user_key)
+                return str(user_key or "").strip(), user_record, True
+
+    return "", {}, True
+
+
+def _find_teacher_record_for_user(school_code, user_id, user_record):
+    teachers_ref = school_reference("Teachers", school_code)
+
+    linked_teacher_id = str((user_record or {}).get("teacherId") or "").strip()
+    if linked_teacher_id:
+        linked_teacher = teachers_ref.child(linked_teacher_id).get()
+        if isinstance(linked_teacher, dict) and str(linked_teacher.get("userId") or "").strip() == user_id:
+            return linked_teacher_id, linked_teacher
+
+    try:
+        matches = teachers_ref.order_by_child("userId").equal_to(user_id).limit_to_first(1).get() or {}
+    except Exception:
+        return "", {}
+
+    return _first_snapshot_record(matches)
+
+
 # ===================== TEACHER LOGIN =====================
 @app.route("/api/teacher_login", methods=["POST"])
 def teacher_login():
@@ -2146,11 +2996,29 @@ def teacher_login():
                 teacher_user_id = direct_user_id
                 school_code = candidate_school_code
                 all_teachers = {direct_teacher_key: direct_teacher}
+                _record_teacher_login_path("fast")
                 break
 
         if teacher_key and teacher_user:
             break
 
+        # Indexed path: UsernameIndex or an order_by_child('username') query, then Teachers by userId.
+        indexed_user_id, indexed_user, username_query_ok = _find_teacher_user_by_username(candidate_school_code, username)
+        if indexed_user_id:
+            indexed_teacher_key, indexed_teacher = _find_teacher_record_for_user(
+                candidate_school_code,
+                indexed_user_id,
+                indexed_user,
+            )
+            if indexed_teacher_key:
+                teacher_user = indexed_user
+                teacher_key = indexed_teacher_key
+                teacher_user_id = indexed_user_id
+                school_code = candidate_school_code
+                all_teachers = {indexed_teacher_key: indexed_teacher}
+                _record_teacher_login_path("indexed")
+                break
+
         # Medium path: walk Teachers first, then fetch linked user directly by userId.
         candidate_teachers = teachers_ref.get() or {}
         for tkey, tdata in candidate_teachers.items():
@@ -2183,11 +3051,17 @@ def teacher_login():
             teacher_user_id = linked_user_id
             school_code = candidate_school_code
             all_teachers = candidate_teachers
+            _index_username(school_code, linked_user.get("username") or username, linked_user_id)
+            _record_teacher_login_path("medium")
             break
 
         if teacher_key and teacher_user:
             break
 
+        # A working username query already covered custom usernames; only scan Users without it.
+        if username_query_ok:
+            continue
+
         # Slow fallback: support custom usernames by scanning Users only when needed.
         all_users = users_ref.get() or {}
         found_user_key = None
@@ -2214,11 +3088,14 @@ def teacher_login():
             school_code = candidate_school_code
             all_teachers = candidate_teachers
             teacher_user_id = str(teacher_user.get("userId") or found_user_key or "").strip()
+            _index_username(school_code, teacher_user.get("username"), found_user_key)
+            _record_teacher_login_path("slow")
             break
 
         teacher_user = None
 
     if not teacher_user or not teacher_key:
+        _record_teacher_login_path("miss")
         return jsonify({"success": False, "message": "Teacher not found for the detected school"}), 404
 
     users_ref = school_reference("Users", school_code)
@@ -2256,6 +3133,11 @@ def teacher_login():
     }
 
     _write_teacher_session(teacher_payload)
+    _cache_set(
+        teacher_role_cache,
+        _build_teacher_role_cache_key(school_code, teacher_user_id),
+        _normalize_teacher_role(teacher_payload["role"]),
+    )
 
     return jsonify({
         "success": True,
@@ -2265,6 +3147,9 @@ def teacher_login():
 
 @app.route("/api/teacher/logout", methods=["POST"])
 def teacher_logout():
+    teacher_session = _get_teacher_session()
+    if teacher_session:
+        _invalidate_teacher_role(teacher_session.get("schoolCode"), teacher_session.get("userId"))
     _clear_teacher_session()
     return jsonify({"success": True})
 
@@ -2371,40 +3256,17 @@ def teacher_context():
     if user_id and not _teacher_session_matches(teacher_session, user_id=user_id):
         return jsonify({"success": False, "message": "Teacher context is limited to the signed-in teacher."}), 403
 
-    search_codes = [_resolve_requested_school_code(teacher_session.get("schoolCode"))]
-
-    for school_code in search_codes:
-        teachers = school_reference("Teachers", school_code).get() or {}
-        users = school_reference("Users", school_code).get() or {}
-
-        for teacher_key, teacher_data in teachers.items():
-            teacher_user_id = str(teacher_data.get("userId") or "").strip()
-            teacher_teacher_id = str(teacher_data.get("teacherId") or teacher_key or "").strip()
-
-            if teacher_id and teacher_teacher_id != teacher_id:
-                continue
-            if user_id and teacher_user_id != user_id:
-                continue
-
-            teacher_user = users.get(teacher_user_id) or next(
-                (user for user in users.values() if str(user.get("userId") or "").strip() == teacher_user_id),
-                {},
-            )
-
-            return jsonify({
-                "success": True,
-                "teacher": {
-                    "teacherId": teacher_teacher_id,
-                    "teacherKey": teacher_key,
-                    "userId": teacher_user_id,
-                    "name": teacher_user.get("name") or teacher_data.get("name"),
-                    "username": teacher_user.get("username") or teacher_teacher_id,
-                    "profileImage": teacher_user.get("profileImage") or teacher_data.get("profileImage") or "/default-profile.png",
-                    "schoolCode": school_code,
-                }
-            })
+    # Both ids must belong to the signed-in teacher, so the session's teacherKey names the record.
+    teacher_key = teacher_session.get("teacherKey")
+    school_code = _resolve_requested_school_code(teacher_session.get("schoolCode"))
+    context = _load_teacher_context(school_code, teacher_key) if teacher_key else None
+    if not context or (user_id and context["teacher"]["userId"] != user_id):
+        return jsonify({"success": False, "message": "Teacher context not found"}), 404
 
-    return jsonify({"success": False, "message": "Teacher context not found"}), 404
+    response = app.response_class(context["body"], mimetype="application/json")
+    response.set_etag(context["etag"])
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
 
 
 # ===================== GET TEACHER COURSES =====================
@@ -2444,11 +3306,9 @@ def get_teacher_students(user_id):
     if not _teacher_session_matches(_get_teacher_session(), user_id=user_id):
         return jsonify({"success": False, "message": "Student access is limited to the signed-in teacher."}), 403
 
+    resolved_school_code = _resolve_requested_school_code()
     teachers_ref = school_reference("Teachers")
     courses_ref = school_reference("Courses")
-    students_ref = school_reference("Students")
-    users_ref = school_reference("Users")
-    marks_ref = school_reference("ClassMarks")
 
     # 1️⃣ Get the teacher key from Teachers node using user_id
     teacher_key = None
@@ -2479,26 +3339,31 @@ def get_teacher_students(user_id):
 
         # 3️⃣ Fetch students in this grade + section
         students_list = []
-        all_students = students_ref.get() or {}
-        for student_id, student in all_students.items():
-            if student.get("grade") == grade and student.get("section") == section:
-                user_data = users_ref.child(student.get("userId")).get()
-                if not user_data:
-                    continue
+        course_marks = _get_cached_class_marks(resolved_school_code, course_id)
+        for row in _load_students_for_grade_sections(
+            resolved_school_code,
+            {f"{str(grade).strip()}|{str(section).strip().upper()}"},
+            include_inactive=True,
+        ):
+            user_data = row.get("user") or {}
+            if not user_data:
+                continue
 
-                # Get marks for this course
-                student_marks = marks_ref.child(course_id).child(student_id).get() or {}
-
-                students_list.append({
-                    "studentId": student_id,
-                    "name": user_data.get("name"),
-                    "username": user_data.get("username"),
-                    "marks": {
-                        "mark20": student_marks.get("mark20", 0),
-                        "mark30": student_marks.get("mark30", 0),
-                        "mark50": student_marks.get("mark50", 0)
-                    }
-                })
+            student_id = row.get("studentKey")
+
+            # Get marks for this course
+            student_marks = course_marks.get(student_id) or {}
+
+            students_list.append({
+                "studentId": student_id,
+                "name": user_data.get("name"),
+                "username": user_data.get("username"),
+                "marks": {
+                    "mark20": student_marks.get("mark20", 0),
+                    "mark30": student_marks.get("mark30", 0),
+                    "mark50": student_marks.get("mark50", 0)
+                }
+            })
 
         course_students.append({
             "subject": subject,
@@ -2571,6 +3436,7 @@ def get_course_students(course_id):
 
     grade_section_key = f'{grade}|{section}'
     course_students = []
+    course_marks = _get_cached_class_marks(resolved_school_code, course_id) if include_marks else {}
 
     for row in _load_students_for_grade_sections(
         resolved_school_code,
@@ -2603,7 +3469,7 @@ def get_course_students(course_id):
         }
 
         if include_marks:
-            student_marks = school_reference(f'ClassMarks/{course_id}/{student_id}', school_code=resolved_school_code).get() or {}
+            student_marks = course_marks.get(student_id) or {}
             course_student['marks'] = {
                 'mark20': student_marks.get('mark20', 0),
                 'mark30': student_marks.get('mark30', 0),
@@ -2630,16 +3496,24 @@ def get_course_students(course_id):
 def update_course_marks(course_id):
     data = request.json
     updates = data.get('updates', [])
-    marks_ref = school_reference('ClassMarks')
+    resolved_school_code = _resolve_requested_school_code()
 
+    # One multi-path update replaces each student's marks node in a single round trip.
+    marks_payload = {}
     for update in updates:
-        student_id = update.get('studentId')
+        student_id = str(update.get('studentId') or '').strip()
+        if not student_id:
+            continue
         marks = update.get('marks', {})
-        marks_ref.child(course_id).child(student_id).set({
+        marks_payload[student_id] = {
             'mark20': marks.get('mark20', 0),
             'mark30': marks.get('mark30', 0),
             'mark50': marks.get('mark50', 0)
-        })
+        }
+
+    if marks_payload:
+        school_reference(f'ClassMarks/{course_id}', school_code=resolved_school_code).update(marks_payload)
+        _clear_class_marks_cache(resolved_school_code, course_id)
 
     return jsonify({'success': True, 'message': 'Marks updated successfully!'})
 
@@ -2706,106 +3580,44 @@ def get_posts():
             return {}
         return posts_snapshot
 
-    def _first_query_result(snapshot):
-        if isinstance(snapshot, dict):
-            for item_key, item_value in snapshot.items():
-                if isinstance(item_value, dict):
-                    return item_key, item_value
-        return None, None
-
-    def _load_actor_record(raw_actor_id):
-        normalized_actor_id = str(raw_actor_id or "").strip()
-        if not normalized_actor_id:
-            return None, {}, {}
-
-        school_admin_key = None
-        school_admin_record = school_admin_cache.get(normalized_actor_id)
-        if school_admin_record is None:
-            school_admin_record = school_admins_ref.child(normalized_actor_id).get() or {}
-            if isinstance(school_admin_record, dict) and school_admin_record:
-                school_admin_cache[normalized_actor_id] = school_admin_record
-            else:
-                school_admin_cache[normalized_actor_id] = {}
-
-        if isinstance(school_admin_record, dict) and school_admin_record:
-            school_admin_key = normalized_actor_id
-
-        user = users_cache.get(normalized_actor_id)
-        if user is None:
-            user = users_ref.child(normalized_actor_id).get() or {}
-            users_cache[normalized_actor_id] = user if isinstance(user, dict) else {}
-
-        if (not isinstance(user, dict) or not user) and isinstance(school_admin_record, dict):
-            admin_user_id = str(school_admin_record.get("userId") or "").strip()
-            if admin_user_id:
-                user = users_cache.get(admin_user_id)
-                if user is None:
-                    user = users_ref.child(admin_user_id).get() or {}
-                    users_cache[admin_user_id] = user if isinstance(user, dict) else {}
-
-        if not isinstance(user, dict) or not user:
-            user_query_key = f"userId:{normalized_actor_id}"
-            user = users_cache.get(user_query_key)
-            if user is None:
-                try:
-                    _, user = _first_query_result(
-                        users_ref.order_by_child("userId").equal_to(normalized_actor_id).limit_to_first(1).get()
-                    )
-                except Exception:
-                    user = {}
-                users_cache[user_query_key] = user if isinstance(user, dict) else {}
-
-        if not isinstance(school_admin_record, dict) or not school_admin_record:
-            admin_query_key = f"userId:{normalized_actor_id}"
-            cached_admin_query = school_admin_cache.get(admin_query_key)
-            if cached_admin_query is None:
-                try:
-                    school_admin_key, school_admin_record = _first_query_result(
-                        school_admins_ref.order_by_child("userId").equal_to(normalized_actor_id).limit_to_first(1).get()
-                    )
-                except Exception:
-                    school_admin_key, school_admin_record = None, {}
-                school_admin_cache[admin_query_key] = {
-                    "key": school_admin_key,
-                    "record": school_admin_record if isinstance(school_admin_record, dict) else {},
-                }
-            else:
-                school_admin_key = cached_admin_query.get("key")
-                school_admin_record = cached_admin_query.get("record") or {}
-
-        return school_admin_key, user if isinstance(user, dict) else {}, school_admin_record if isinstance(school_admin_record, dict) else {}
+    school_code = _resolve_requested_school_code()
+    feed_cache_key = f"posts_feed:{_build_student_roster_cache_key(school_code)}:{viewer_role}:{posts_limit}"
+    cached_feed = _pc_get(feed_cache_key)
+    if cached_feed is not None:
+        return jsonify(cached_feed)
 
-    posts_ref = school_reference("Posts")
-    users_ref = school_reference("Users")
-    school_admins_ref = school_reference("School_Admins")
+    posts_ref = school_reference("Posts", school_code=school_code)
 
-    _cache_key = f"posts:{_read_school_code_from_request()}"
+    _cache_key = f"posts:{school_code}:{posts_limit}"
     all_posts = _pc_get(_cache_key)
     if all_posts is None:
         all_posts = _limited_posts_snapshot(posts_ref)
         _pc_set(_cache_key, all_posts)
-    users_cache = {}
-    school_admin_cache = {}
 
-    result = []
+    visible_posts = [
+        (post_id, post)
+        for post_id, post in all_posts.items()
+        if isinstance(post, dict) and _is_visible_to_viewer(post)
+    ]
+    author_profiles = _load_post_author_profiles(
+        school_code,
+        [post.get("adminId") for _, post in visible_posts],
+    )
 
-    for post_id, post in all_posts.items():
-        if not isinstance(post, dict):
-            continue
-        if not _is_visible_to_viewer(post):
-            continue
+    result = []
 
+    for post_id, post in visible_posts:
         raw_admin_id = post.get("adminId")
-        school_admin_key, user, school_admin_record = _load_actor_record(raw_admin_id)
+        author = author_profiles.get(str(raw_admin_id or "").strip()) or {}
 
-        admin_user_id = str(user.get("userId") or (school_admin_record or {}).get("userId") or raw_admin_id or "").strip()
+        admin_user_id = str(author.get("userId") or raw_admin_id or "").strip()
 
         result.append({
             "postId": post_id,
-            "adminId": school_admin_key or raw_admin_id,
+            "adminId": author.get("adminKey") or raw_admin_id,
             "adminUserId": admin_user_id,
-            "adminName": user.get("name") or (school_admin_record or {}).get("name") or "Admin",
-            "adminProfile": user.get("profileImage") or (school_admin_record or {}).get("profileImage") or "/default-profile.png",
+            "adminName": author.get("name") or "Admin",
+            "adminProfile": author.get("profileImage") or "/default-profile.png",
             "message": post.get("message", ""),
             "postUrl": post.get("postUrl"),
             "timestamp": post.get("time", ""),
@@ -2817,6 +3629,7 @@ def get_posts():
         })
 
     result.sort(key=lambda x: x["timestamp"], reverse=True)
+    _pc_set(feed_cache_key, result)
     return jsonify(result)
 
 
@@ -2916,6 +3729,13 @@ def register_parent():
         "profileImage": profile_url,
         "isActive": True
     })
+    _index_username(_resolve_requested_school_code(), username, parent_user_id)
+    _remember_user_profile(_resolve_requested_school_code(), parent_user_id, {
+        "name": name,
+        "username": username,
+        "phone": phone,
+        "profileImage": profile_url,
+    })
 
     # 2️⃣ Create PARENT node (new parentId)
     parent_ref = parents_ref.push()
@@ -2991,6 +3811,9 @@ def like_post():
         "likes": likes,
         "likeCount": len(likes)
     })
+    school_code = _resolve_requested_school_code()
+    _pc_invalidate_prefix(f"posts:{school_code}:")
+    _pc_invalidate_prefix(f"posts_feed:{_build_student_roster_cache_key(school_code)}:")
 
     return jsonify({"success": True, "likeCount": len(likes), "liked": teacherId in likes})
 
@@ -3025,9 +3848,6 @@ def save_week_lesson_plan():
         week_key = _lesson_plan_week_key(week)
 
         # Save under a clean course-centric structure: courses/<course_id>/weeks/<week_key>
-        course_ref = school_reference('LessonPlans').child(teacher_id).child(academic_year).child('courses').child(course_id)
-        lesson_ref = course_ref.child('weeks').child(week_key)
-
         # Structure to save
         obj = {
             'teacherId': teacher_id,
@@ -3041,14 +3861,24 @@ def save_week_lesson_plan():
             'updatedAt': _utc_now_isoformat()
         }
 
-        lesson_ref.set(obj)
-        course_ref.child('meta').update({
-            'teacherId': teacher_id,
-            'courseId': course_id,
-            'academicYear': academic_year,
-            'lastUpdatedWeek': week,
-            'updatedAt': obj['updatedAt'],
+        # Detail, course meta and the planner summary land in one multi-path update.
+        schema_updates = _lesson_plan_new_year_schema_updates(teacher_id, academic_year)
+        year_ref = school_reference('LessonPlans').child(teacher_id).child(academic_year)
+        year_ref.update({
+            **schema_updates,
+            f'courses/{course_id}/weeks/{week_key}': obj,
+            f'courses/{course_id}/meta/teacherId': teacher_id,
+            f'courses/{course_id}/meta/courseId': course_id,
+            f'courses/{course_id}/meta/academicYear': academic_year,
+            f'courses/{course_id}/meta/lastUpdatedWeek': week,
+            f'courses/{course_id}/meta/updatedAt': obj['updatedAt'],
+            f'summary/{course_id}/courseId': course_id,
+            f'summary/{course_id}/weeks/{week_key}': _lesson_plan_week_summary(obj),
+            f'summary/{course_id}/lastUpdatedWeek': week,
+            f'summary/{course_id}/updatedAt': obj['updatedAt'],
         })
+        if schema_updates:
+            _remember_lesson_plan_schema_current(teacher_id, academic_year)
 
         return jsonify({'success': True, 'message': 'Week plan saved', 'data': obj}), 200
     except Exception as e:
@@ -3080,7 +3910,8 @@ def save_annual_lesson_plan():
             return jsonify({'success': False, 'message': 'courseId is required'}), 400
 
         # Save under a clean course-centric structure: courses/<course_id>/annual
-        lesson_ref = school_reference('LessonPlans').child(teacher_id).child(academic_year).child('courses').child(course_id)
+        schema_updates = _lesson_plan_new_year_schema_updates(teacher_id, academic_year)
+        year_ref = school_reference('LessonPlans').child(teacher_id).child(academic_year)
 
         obj = {
             'teacherId': teacher_id,
@@ -3092,13 +3923,20 @@ def save_annual_lesson_plan():
             'updatedAt': _utc_now_isoformat()
         }
 
-        lesson_ref.child('annual').set(obj)
-        lesson_ref.child('meta').update({
-            'teacherId': teacher_id,
-            'courseId': course_id,
-            'academicYear': academic_year,
-            'updatedAt': obj['updatedAt'],
+        year_ref.update({
+            **schema_updates,
+            f'courses/{course_id}/annual': obj,
+            f'courses/{course_id}/meta/teacherId': teacher_id,
+            f'courses/{course_id}/meta/courseId': course_id,
+            f'courses/{course_id}/meta/academicYear': academic_year,
+            f'courses/{course_id}/meta/updatedAt': obj['updatedAt'],
+            f'summary/{course_id}/courseId': course_id,
+            f'summary/{course_id}/annualRowCount': obj['rowCount'],
+            f'summary/{course_id}/annualUpdatedAt': obj['updatedAt'],
+            f'summary/{course_id}/updatedAt': obj['updatedAt'],
         })
+        if schema_updates:
+            _remember_lesson_plan_schema_current(teacher_id, academic_year)
 
         return jsonify({'success': True, 'message': 'Annual plan saved', 'data': obj}), 200
     except Exception as e:
@@ -3121,16 +3959,52 @@ def get_lesson_plans(teacher_id):
         lesson_ref = school_reference('LessonPlans').child(teacher_id).child(academic_year)
 
         course_id = request.args.get('courseId')
+        week = request.args.get('week')
+        schema_current = _lesson_plan_schema_is_current(teacher_id, academic_year)
+
+        if course_id and week and schema_current:
+            # Lazy week detail for the planner grid.
+            week_node = lesson_ref.child('courses').child(course_id).child('weeks').child(_lesson_plan_week_key(week)).get()
+            return jsonify({'success': True, 'data': week_node or {}}), 200
+
         if course_id:
             course_node = lesson_ref.child('courses').child(course_id).get() or {}
-            course_ref = lesson_ref.child('courses').child(course_id)
-            normalized, _ = _lesson_plan_migrate_course_node(course_ref, course_node, teacher_id, course_id, academic_year)
+            if schema_current:
+                normalized = _lesson_plan_course_view(course_node, teacher_id, course_id, academic_year)
+            else:
+                course_ref = lesson_ref.child('courses').child(course_id)
+                normalized, _ = _lesson_plan_migrate_course_node(course_ref, course_node, teacher_id, course_id, academic_year)
 
+            if week:
+                return jsonify({'success': True, 'data': normalized['weeks'].get(_lesson_plan_week_key(week)) or {}}), 200
             return jsonify({'success': True, 'data': normalized}), 200
 
-        # If no courseId provided, return entire academic year tree
-        data = lesson_ref.get() or {}
-        return jsonify({'success': True, 'data': data}), 200
+        if request.args.get('view') == 'full':
+            data = lesson_ref.get() or {}
+            return jsonify({'success': True, 'data': data}), 200
+
+        # Summary-first: week topics and counts per course; day content is fetched per week.
+        if schema_current:
+            summaries = lesson_ref.child('summary').get() or {}
+        else:
+            courses_node = lesson_ref.child('courses').get() or {}
+            summaries = {
+                current_course_id: _lesson_plan_course_summary(
+                    _lesson_plan_normalize_course_node(course_node, teacher_id, current_course_id, academic_year),
+                    current_course_id,
+                )
+                for current_course_id, course_node in (courses_node.items() if isinstance(courses_node, dict) else [])
+                if isinstance(course_node, dict)
+            }
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'teacherId': teacher_id,
+                'academicYear': academic_year,
+                'courses': summaries if isinstance(summaries, dict) else {},
+            },
+        }), 200
     except Exception as e:
         logger.exception("Failed to fetch lesson plans")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -3157,11 +4031,12 @@ def migrate_lesson_plans():
         lesson_ref = school_reference('LessonPlans').child(teacher_id).child(academic_year)
         migrated_courses = []
         migrated_submissions = []
+        normalized_courses = {}
 
         if course_id:
             course_ref = lesson_ref.child('courses').child(course_id)
             course_node = course_ref.get() or {}
-            _, course_changed = _lesson_plan_migrate_course_node(course_ref, course_node, teacher_id, course_id, academic_year)
+            normalized_courses[course_id], course_changed = _lesson_plan_migrate_course_node(course_ref, course_node, teacher_id, course_id, academic_year)
             if course_changed:
                 migrated_courses.append(course_id)
 
@@ -3177,7 +4052,7 @@ def migrate_lesson_plans():
                     if not isinstance(course_node, dict):
                         continue
                     course_ref = lesson_ref.child('courses').child(current_course_id)
-                    _, course_changed = _lesson_plan_migrate_course_node(course_ref, course_node, teacher_id, current_course_id, academic_year)
+                    normalized_courses[current_course_id], course_changed = _lesson_plan_migrate_course_node(course_ref, course_node, teacher_id, current_course_id, academic_year)
                     if course_changed:
                         migrated_courses.append(current_course_id)
 
@@ -3187,6 +4062,26 @@ def migrate_lesson_plans():
                     if submissions_changed:
                         migrated_submissions.append(current_course_id)
 
+            # Submissions can exist for courses that never got a plan; the marker covers them too.
+            submissions_root = school_reference('LessonPlanSubmissions').child(teacher_id).child(academic_year)
+            submission_course_ids = submissions_root.get(shallow=True) or {}
+            planned_course_ids = set(courses_node.keys()) if isinstance(courses_node, dict) else set()
+            for current_course_id in submission_course_ids:
+                if current_course_id in planned_course_ids:
+                    continue
+                submissions_ref = submissions_root.child(current_course_id)
+                submission_node = submissions_ref.get() or {}
+                _, submissions_changed = _lesson_plan_migrate_submission_entries(submissions_ref, submission_node, teacher_id, current_course_id, academic_year)
+                if submissions_changed:
+                    migrated_submissions.append(current_course_id)
+
+        summary_updates = _lesson_plan_summary_updates(lesson_ref.child('summary').get(), normalized_courses)
+        if summary_updates:
+            lesson_ref.child('summary').update(summary_updates)
+
+        if not course_id:
+            _mark_lesson_plan_schema_current(teacher_id, academic_year)
+
         return jsonify({
             'success': True,
             'message': 'Lesson plan migration completed',
@@ -3222,9 +4117,12 @@ def get_lesson_plan_submissions():
             return scope_error
 
         ref = school_reference('LessonPlanSubmissions').child(teacher_id).child(academic_year).child(course_id)
-        raw_data = ref.get() or {}
-        data, _ = _lesson_plan_migrate_submission_entries(ref, raw_data, teacher_id, course_id, academic_year)
-        data = data or {}
+        if _lesson_plan_schema_is_current(teacher_id, academic_year):
+            data = ref.child('entries').get() or {}
+        else:
+            raw_data = ref.get() or {}
+            data, _ = _lesson_plan_migrate_submission_entries(ref, raw_data, teacher_id, course_id, academic_year)
+            data = data or {}
 
         results = []
         for child_key, val in (data.items() if isinstance(data, dict) else []):
@@ -3265,8 +4163,9 @@ def submit_daily_lesson_plan():
         child = re.sub(r'[^A-Za-z0-9_\-]', '_', str(key))
 
         base_ref = school_reference('LessonPlanSubmissions').child(teacher_id).child(academic_year).child(course_id)
-        existing_root = base_ref.get() or {}
-        _lesson_plan_migrate_submission_entries(base_ref, existing_root, teacher_id, course_id, academic_year)
+        if not _lesson_plan_schema_is_current(teacher_id, academic_year):
+            existing_root = base_ref.get() or {}
+            _lesson_plan_migrate_submission_entries(base_ref, existing_root, teacher_id, course_id, academic_year)
         ref = base_ref.child('entries').child(child)
 
         existing = ref.get()
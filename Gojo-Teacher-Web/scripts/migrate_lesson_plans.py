@@ -0,0 +1,190 @@
+"""Rewrite legacy LessonPlans/LessonPlanSubmissions nodes and stamp their schema version.
+
+get_lesson_plans, get_lesson_plan_submissions and submit_daily used to
+normalize legacy shapes (top-level week_* keys, annualRows, flat
+submission entries) on every request and write the result back during the
+GET. Once LessonPlans/<teacher>/<year>/schemaVersion is current they read
+the stored nodes as-is and the planner reads the per-course summary node
+(LessonPlans/<teacher>/<year>/summary), so run this once per deploy that
+changes the shape:
+
+    python scripts/migrate_lesson_plans.py --dry-run
+    python scripts/migrate_lesson_plans.py --school-code ET-ORO-ADA-GMI --chunk-size 200
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+from firebase_admin import db
+
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app import (  # noqa: E402
+    LESSON_PLAN_SCHEMA_FIELD,
+    LESSON_PLAN_SCHEMA_VERSION,
+    _lesson_plan_course_migration_updates,
+    _lesson_plan_submission_migration_updates,
+    _lesson_plan_summary_updates,
+)
+
+
+PLATFORM_ROOT = "Platform1"
+UPDATE_CHUNK_SIZE = 400
+# Frontend-managed trees that share the LessonPlans root but are not teacher keys.
+# StudentWhatLearn is LessonPlans/StudentWhatLearn/<studentId>/<entry>; Register skips it too.
+NON_TEACHER_KEYS = {"TeachersLessonPlans", "LessonSubmissions", "LessonDailyLogs", "StudentWhatLearn"}
+# Year keys look like 2025_2026 (or "default" before a school sets its year).
+YEAR_KEY_PATTERN = re.compile(r"\d{4}[_-]\d{2,4}|default")
+YEAR_CHILD_KEYS = {"courses", "summary", LESSON_PLAN_SCHEMA_FIELD}
+
+
+def platform_ref(path=""):
+    clean = str(path or "").strip("/")
+    return db.reference(f"{PLATFORM_ROOT}/{clean}" if clean else PLATFORM_ROOT)
+
+
+def list_school_codes():
+    schools = platform_ref("Schools").get(shallow=True) or {}
+    return sorted(str(code).strip() for code in schools.keys() if str(code).strip())
+
+
+def shallow_keys(path):
+    node = platform_ref(path).get(shallow=True)
+    return sorted(node.keys()) if isinstance(node, dict) else []
+
+
+def is_current(version):
+    try:
+        return int(version or 0) >= LESSON_PLAN_SCHEMA_VERSION
+    except (TypeError, ValueError):
+        return False
+
+
+def is_year_key(school_code, teacher_id, key):
+    """Only year-shaped keys, or nodes that already hold courses/summary, are migrated."""
+    if YEAR_KEY_PATTERN.fullmatch(str(key)):
+        return True
+    return bool(YEAR_CHILD_KEYS.intersection(shallow_keys(f"Schools/{school_code}/LessonPlans/{teacher_id}/{key}")))
+
+
+def build_teacher_year_updates(school_code, teacher_id, academic_year):
+    """Return (school-relative multi-path updates, courses touched) for one teacher/year."""
+    plans_path = f"LessonPlans/{teacher_id}/{academic_year}"
+    submissions_path = f"LessonPlanSubmissions/{teacher_id}/{academic_year}"
+
+    courses = platform_ref(f"Schools/{school_code}/{plans_path}/courses").get() or {}
+    summaries = platform_ref(f"Schools/{school_code}/{plans_path}/summary").get() or {}
+    submissions = platform_ref(f"Schools/{school_code}/{submissions_path}").get() or {}
+    courses = courses if isinstance(courses, dict) else {}
+    submissions = submissions if isinstance(submissions, dict) else {}
+
+    updates = {}
+    touched = set()
+    normalized_courses = {}
+    for course_id, course_node in courses.items():
+        if not isinstance(course_node, dict):
+            continue
+        normalized_courses[course_id], course_updates = _lesson_plan_course_migration_updates(course_node, teacher_id, course_id, academic_year)
+        for key, value in course_updates.items():
+            updates[f"{plans_path}/courses/{course_id}/{key}"] = value
+        if course_updates:
+            touched.add(course_id)
+
+    for course_id, summary in _lesson_plan_summary_updates(summaries, normalized_courses).items():
+        updates[f"{plans_path}/summary/{course_id}"] = summary
+        touched.add(course_id)
+
+    for course_id, submission_node in submissions.items():
+        if not isinstance(submission_node, dict):
+            continue
+        _, submission_updates = _lesson_plan_submission_migration_updates(submission_node, teacher_id, course_id, academic_year)
+        for key, value in submission_updates.items():
+            updates[f"{submissions_path}/{course_id}/{key}"] = value
+        if submission_updates:
+            touched.add(course_id)
+
+    return updates, len(touched)
+
+
+def apply_updates(school_code, updates, chunk_size=UPDATE_CHUNK_SIZE):
+    """Write normalized nodes first, then delete the legacy keys."""
+    writes = [(path, value) for path, value in updates.items() if value is not None]
+    deletes = [(path, value) for path, value in updates.items() if value is None]
+    school_ref = platform_ref(f"Schools/{school_code}")
+
+    for batch_source in (writes, deletes):
+        for start in range(0, len(batch_source), chunk_size):
+            school_ref.update(dict(batch_source[start:start + chunk_size]))
+
+
+def migrate_school(school_code, stats, dry_run=False, chunk_size=UPDATE_CHUNK_SIZE):
+    teacher_ids = set(shallow_keys(f"Schools/{school_code}/LessonPlans"))
+    teacher_ids.update(shallow_keys(f"Schools/{school_code}/LessonPlanSubmissions"))
+    teacher_ids -= NON_TEACHER_KEYS
+
+    school_paths = 0
+    school_courses = 0
+    for teacher_id in sorted(teacher_ids):
+        academic_years = set(shallow_keys(f"Schools/{school_code}/LessonPlans/{teacher_id}"))
+        academic_years.update(shallow_keys(f"Schools/{school_code}/LessonPlanSubmissions/{teacher_id}"))
+        year_keys = {key for key in academic_years if is_year_key(school_code, teacher_id, key)}
+        stats["ignored"] += len(academic_years - year_keys)
+
+        for academic_year in sorted(year_keys):
+            stats["teacher_years"] += 1
+            marker_path = f"LessonPlans/{teacher_id}/{academic_year}/{LESSON_PLAN_SCHEMA_FIELD}"
+            if is_current(platform_ref(f"Schools/{school_code}/{marker_path}").get()):
+                stats["skipped"] += 1
+                continue
+
+            updates, course_count = build_teacher_year_updates(school_code, teacher_id, academic_year)
+            school_paths += len(updates)
+            school_courses += course_count
+            if dry_run:
+                continue
+
+            apply_updates(school_code, updates, chunk_size)
+            # Stamped only after every chunk landed, so an interrupted run is picked up again.
+            platform_ref(f"Schools/{school_code}/{marker_path}").set(LESSON_PLAN_SCHEMA_VERSION)
+
+    stats["paths"] += school_paths
+    stats["courses"] += school_courses
+    action = "Would rewrite" if dry_run else "Rewrote"
+    print(f"{school_code}: {action} {school_courses} courses for {len(teacher_ids)} teachers ({school_paths} paths)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate legacy lesson plan nodes and stamp schemaVersion.")
+    parser.add_argument("--school-code", help="Migrate one school instead of every school.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+    parser.add_argument("--chunk-size", type=int, default=UPDATE_CHUNK_SIZE, help="Paths per multi-path update.")
+    args = parser.parse_args()
+
+    school_codes = [args.school_code] if args.school_code else list_school_codes()
+    if not school_codes:
+        print("No schools found under Platform1/Schools.")
+        return
+
+    stats = {"teacher_years": 0, "skipped": 0, "ignored": 0, "courses": 0, "paths": 0}
+    started = time.perf_counter()
+    for school_code in school_codes:
+        migrate_school(school_code, stats, dry_run=args.dry_run, chunk_size=max(1, args.chunk_size))
+    elapsed = max(time.perf_counter() - started, 1e-9)
+
+    print(
+        f"Done: {stats['courses']} courses, {stats['paths']} paths across {len(school_codes)} schools; "
+        f"{stats['teacher_years']} teacher-years ({stats['skipped']} already current, "
+        f"{stats['ignored']} non-year keys left alone) in {elapsed:.1f}s "
+        f"= {stats['teacher_years'] / elapsed:.1f} teacher-years/s, {stats['paths'] / elapsed:.1f} paths/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@ from firebase_config import FIREBASE_CREDENTIALS, get_firebase_options, require_
 
 
 DEFAULT_CREDENTIALS = FIREBASE_CREDENTIALS
+TEACHER_COURSE_INDEX_NODE = "TeacherCourseIndex"
 
 
 def normalize_course_fragment(value):
@@ -52,6 +53,38 @@ def resolve_course_id(courses, grade, section, subject):
     return fallback_id
 
 
+def load_teacher_app():
+    """Import app.py only after init_firebase, so it reuses the Firebase app built from --credentials."""
+    import app
+
+    return app
+
+
+def build_teacher_course_index(courses, assignments, grade_management, teachers):
+    """Build TeacherCourseIndex/<teacher> = {courseId: entry} with app._build_teacher_course_index.
+
+    Entries found under a teacher's teacherId or userId are folded into the
+    Teachers record key as well, so the app can resolve a teacher with one read.
+    """
+    teacher_app = load_teacher_app()
+    normalize_teacher_ref = teacher_app._normalize_teacher_ref
+    by_ref = teacher_app._build_teacher_course_index(courses, assignments, grade_management)
+
+    index = dict(by_ref)
+    for teacher_key, teacher in teachers.items():
+        if not isinstance(teacher, dict):
+            continue
+        merged = {}
+        for teacher_ref in {normalize_teacher_ref(teacher_key), normalize_teacher_ref(teacher.get("teacherId")), normalize_teacher_ref(teacher.get("userId"))}:
+            for course_id, entry in (by_ref.get(teacher_ref) or {}).items():
+                if course_id not in merged or entry["order"] < merged[course_id]["order"]:
+                    merged[course_id] = entry
+        if merged:
+            index[normalize_teacher_ref(teacher_key)] = merged
+
+    return index
+
+
 def init_firebase(credentials_path):
     resolved_credentials = credentials_path or require_firebase_credentials()
     if not os.path.exists(resolved_credentials):
@@ -122,14 +155,22 @@ def build_assignment_updates(school_code, school_root, create_missing_courses=Fa
         for course_id, course_data in missing_courses.items():
             course_updates[f"Platform1/Schools/{school_code}/Courses/{course_id}"] = course_data
 
-    return assignment_updates, course_updates, desired_assignments, missing_courses
+    teacher_course_index = build_teacher_course_index(
+        courses,
+        dict(sorted({**existing_assignments, **desired_assignments}.items())),
+        grade_management,
+        school_root.child("Teachers").get() or {},
+    )
+
+    return assignment_updates, course_updates, desired_assignments, missing_courses, teacher_course_index
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Sync TeacherAssignments from GradeManagement sectionSubjectTeachers.")
+    parser = argparse.ArgumentParser(description="Sync TeacherAssignments and TeacherCourseIndex from GradeManagement sectionSubjectTeachers.")
     parser.add_argument("--school-code", help="Only process a single school code.")
     parser.add_argument("--apply", action="store_true", help="Write changes to Firebase. Dry-run by default.")
     parser.add_argument("--create-missing-courses", action="store_true", help="Create missing Courses entries for GradeManagement assignments.")
+    parser.add_argument("--skip-course-index", action="store_true", help=f"Do not rebuild {TEACHER_COURSE_INDEX_NODE}.")
     parser.add_argument("--credentials", default=os.getenv("FIREBASE_CREDENTIALS") or DEFAULT_CREDENTIALS)
     args = parser.parse_args()
 
@@ -141,7 +182,7 @@ def main():
 
     for school_code in collect_school_codes(root, args.school_code):
         school_root = root.child("Platform1").child("Schools").child(school_code)
-        assignment_updates, course_updates, desired_assignments, missing_courses = build_assignment_updates(
+        assignment_updates, course_updates, desired_assignments, missing_courses, teacher_course_index = build_assignment_updates(
             school_code,
             school_root,
             create_missing_courses=args.create_missing_courses,
@@ -149,6 +190,8 @@ def main():
 
         combined_updates.update(assignment_updates)
         combined_updates.update(course_updates)
+        if not args.skip_course_index:
+            combined_updates[f"Platform1/Schools/{school_code}/{TEACHER_COURSE_INDEX_NODE}"] = teacher_course_index or None
 
         report.append(
             {
@@ -157,6 +200,7 @@ def main():
                 "assignmentWrites": len(assignment_updates),
                 "missingCourses": sorted(missing_courses.keys()),
                 "courseWrites": len(course_updates),
+                "teacherCourseIndexTeachers": len(teacher_course_index),
             }
         )
 